@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from typing import Callable, Iterable, Optional
+
+try:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError: # Windows
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class IdAllocator:
+    """
+    Monotonic FaceID allocator ("User_ID:001", "User_ID:002", ...), O(1) per ID.
+
+    The counter ({"next": N}) lives in a small file next to the gallery. Allocation
+    reserves ranges of `block_size` IDs under an exclusive file lock, so processes sharing
+    one counter file never hand out the same ID; within a range, IDs come from memory without
+    touching the file. A larger `block_size` (or `reserve`) allocates without a counter write
+    per face. Unused IDs of a reserved range are skipped, never reused.
+    Only the counter is process-safe: the LocalGalleryStore that owns it has a single writer.
+
+    Without a path the counter is in-memory (single process).
+    The first reservation on a missing/empty counter starts after `seed()`, the highest
+    number already in use (a one-time scan of the existing gallery).
+    """
+    COUNTER_FILE = "id_counter.json"
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "User_ID:", width: int = 3,
+                 block_size: int = 1, seed: Optional[Callable[[], int]] = None):
+        if block_size < 1:
+            raise ValueError("block_size must be >= 1")
+        self.path = path
+        self.prefix = prefix
+        self.width = width
+        self.block_size = block_size
+        self._seed = seed
+        self._lock = threading.Lock()
+        self._next_memory: Optional[int] = None
+        self._cursor = 0
+        self._end = 0
+
+    def format(self, number: int) -> str:
+        return f"{self.prefix}{number:0{self.width}d}"
+
+    def max_index(self, face_ids: Iterable[str]) -> int:
+        """Highest number among FaceIDs with this prefix (0 if none); tracking IDs like TRK_004 are ignored."""
+        best = 0
+        for face_id in face_ids:
+            if face_id.startswith(self.prefix):
+                suffix = face_id[len(self.prefix):]
+                if suffix.isdigit():
+                    best = max(best, int(suffix))
+        return best
+
+    def _start(self) -> int:
+        return (self._seed() if self._seed is not None else 0) + 1
+
+    def reserve(self, count: int) -> range:
+        """Reserves `count` consecutive numbers for this process (one locked read-modify-write)."""
+        with self._lock:
+            if self.path is None:
+                start = self._next_memory if self._next_memory is not None else self._start()
+                self._next_memory = start + count
+                return range(start, start + count)
+
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+            with os.fdopen(fd, "r+", encoding="utf-8") as f:
+                _lock_file(f)
+                try:
+                    f.seek(0)
+                    raw = f.read().strip()
+                    start = json.loads(raw)["next"] if raw else self._start()
+                    f.seek(0)
+                    f.truncate()
+                    json.dump({"next": start + count}, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    _unlock_file(f)
+            return range(start, start + count)
+
+    def allocate(self) -> str:
+        """Next FaceID; refills the local range from the shared counter when it runs out."""
+        with self._lock:
+            if self._cursor < self._end:
+                number = self._cursor
+                self._cursor += 1
+                return self.format(number)
+        block = self.reserve(self.block_size)
+        with self._lock:
+            self._cursor, self._end = block.start + 1, block.stop
+        return self.format(block.start)
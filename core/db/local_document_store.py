@@ -0,0 +1,161 @@
+import copy
+import datetime
+import operator
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+class _Snapshot:
+    """Minimal DocumentSnapshot: id, exists, to_dict()."""
+    def __init__(self, doc_id: str, data: Optional[dict]):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+class _DocumentRef:
+    def __init__(self, store: "LocalDocumentStore", collection: str, doc_id: str):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, data: dict, merge: bool = False):
+        self._store._write(self._collection, self.id, data, merge=merge)
+
+    def update(self, data: dict):
+        if not self._store._exists(self._collection, self.id):
+            raise KeyError(f"No document to update: {self._collection}/{self.id}")
+        self._store._write(self._collection, self.id, data, merge=True)
+
+    def delete(self):
+        self._store._delete(self._collection, self.id)
+
+    def get(self) -> _Snapshot:
+        return _Snapshot(self.id, self._store._read(self._collection, self.id))
+
+class _Query:
+    _OPS = {"<": operator.lt, "<=": operator.le, "==": operator.eq, ">": operator.gt, ">=": operator.ge, "!=": operator.ne}
+
+    def __init__(self, store: "LocalDocumentStore", collection: str, filters=None, order=None, limit=None):
+        self._store = store
+        self._collection = collection
+        self._filters = filters or []
+        self._order = order
+        self._limit = limit
+
+    def where(self, field: str, op: str, value: Any) -> "_Query":
+        return _Query(self._store, self._collection, self._filters + [(field, self._OPS[op], value)], self._order, self._limit)
+
+    def order_by(self, field: str) -> "_Query":
+        return _Query(self._store, self._collection, self._filters, field, self._limit)
+
+    def limit(self, count: int) -> "_Query":
+        return _Query(self._store, self._collection, self._filters, self._order, count)
+
+    def stream(self) -> Iterator[_Snapshot]:
+        docs = []
+        for doc_id, data in self._store._scan(self._collection):
+            if all(field in data and data[field] is not None and op(data[field], value)
+                   for field, op, value in self._filters):
+                docs.append(_Snapshot(doc_id, data))
+        if self._order:
+            docs.sort(key=lambda snap: snap._data.get(self._order))
+        self._store.reads += len(docs[:self._limit] if self._limit else docs)
+        return iter(docs[:self._limit] if self._limit else docs)
+
+class _CollectionRef(_Query):
+    def document(self, doc_id: str) -> _DocumentRef:
+        return _DocumentRef(self._store, self._collection, doc_id)
+
+class _WriteBatch:
+    """Buffered writes applied atomically on commit()."""
+    def __init__(self, store: "LocalDocumentStore"):
+        self._store = store
+        self._ops: List[tuple] = []
+
+    def set(self, ref: _DocumentRef, data: dict, merge: bool = False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref: _DocumentRef, data: dict):
+        self._ops.append(("update", ref, data, True))
+
+    def delete(self, ref: _DocumentRef):
+        self._ops.append(("delete", ref, None, False))
+
+    def commit(self):
+        with self._store._lock:
+            if self._store.fail_writes:
+                raise ConnectionError("LocalDocumentStore: simulated network failure")
+            for kind, ref, data, merge in self._ops:
+                if kind == "delete":
+                    ref.delete()
+                elif kind == "update":
+                    ref.update(data)
+                else:
+                    ref.set(data, merge=merge)
+            self._store.commits += 1
+        self._ops = []
+
+class LocalDocumentStore:
+    """
+    In-process stand-in for the subset of the Cloud Firestore client used by FirestoreVectorStore
+    (collection/document set/update/get/delete, where/order_by/stream, batch).
+    Backs MemoryVectorStore, so the Firestore code path runs offline and in tests without credentials.
+
+    SERVER_TIMESTAMP / DELETE_FIELD are this store's own sentinels; FirestoreVectorStore picks
+    them up from the client it is given.
+    """
+    SERVER_TIMESTAMP = object()
+    DELETE_FIELD = object()
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.RLock()
+        self.fail_writes = False # Simulates an offline network for write paths
+        self.reads = 0
+        self.commits = 0
+
+    def collection(self, name: str) -> _CollectionRef:
+        return _CollectionRef(self, name)
+
+    def batch(self) -> _WriteBatch:
+        return _WriteBatch(self)
+
+    def _resolve(self, data: dict) -> dict:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        resolved = {}
+        for k, v in data.items():
+            if v is self.SERVER_TIMESTAMP:
+                resolved[k] = now
+            elif v is self.DELETE_FIELD:
+                resolved[k] = v
+            else:
+                resolved[k] = copy.deepcopy(v)
+        return resolved
+
+    def _write(self, collection: str, doc_id: str, data: dict, merge: bool):
+        with self._lock:
+            if self.fail_writes:
+                raise ConnectionError("LocalDocumentStore: simulated network failure")
+            docs = self._collections.setdefault(collection, {})
+            current = docs.get(doc_id, {}) if merge else {}
+            current.update(self._resolve(data))
+            docs[doc_id] = {k: v for k, v in current.items() if v is not self.DELETE_FIELD}
+
+    def _exists(self, collection: str, doc_id: str) -> bool:
+        with self._lock:
+            return doc_id in self._collections.get(collection, {})
+
+    def _read(self, collection: str, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def _delete(self, collection: str, doc_id: str):
+        with self._lock:
+            self._collections.get(collection, {}).pop(doc_id, None)
+
+    def _scan(self, collection: str):
+        with self._lock:
+            return [(doc_id, copy.deepcopy(data)) for doc_id, data in self._collections.get(collection, {}).items()]
@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from core.db.id_allocator import IdAllocator
+from core.utils.logger import get_logger
+
+logger = get_logger("LocalGalleryStore")
+
+class LocalGalleryStore:
+    """
+    Offline gallery backend for FaceReID.
+
+    Layout of the store directory:
+    - embeddings.f32: raw float32 rows (N x dim), memory-mapped, append-only
+    - records.bin: fixed-width sidecar records (face_id, created_at, last_seen, deleted), memory-mapped
+    - meta.json: dim / id width
+    - id_counter.json: FaceID allocation counter (see IdAllocator), shared by all processes using the store
+
+    Opening only maps the files (O(1) regardless of size). New identities are appended
+    without rewriting existing data, updates and deletes are written in place
+    (deletes are tombstones) and a background thread compacts the files once
+    tombstones exceed `compact_ratio`.
+
+    Single writer: one process at a time may open a store directory for writing. Appends use
+    the process-local row count and compaction swaps the files, so concurrent writers would
+    overwrite or drop each other's rows; only id_counter.json is locked across processes.
+    """
+    EMBEDDINGS_FILE = "embeddings.f32"
+    RECORDS_FILE = "records.bin"
+    META_FILE = "meta.json"
+
+    def __init__(self, path: str, dim: int = 128, id_bytes: int = 32, compact_ratio: float = 0.25,
+                 id_block_size: int = 1):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            dim, id_bytes = meta["dim"], meta["id_bytes"]
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": dim, "id_bytes": id_bytes, "version": 1}, f)
+
+        self.dim = dim
+        self.record_dtype = np.dtype([
+            ("face_id", f"S{id_bytes}"),
+            ("created_at", "<f8"),
+            ("last_seen", "<f8"),
+            ("deleted", "u1"),
+        ])
+        self._lock = threading.RLock()
+        self._rows: Optional[Dict[str, int]] = None # Built lazily on first lookup
+        self._vectors = None
+        self._records = None
+        self._compactor: Optional[threading.Thread] = None
+        self._dirty_rows: Optional[set] = None # Rows touched while a compaction is running
+
+        for name in (self.EMBEDDINGS_FILE, self.RECORDS_FILE):
+            open(os.path.join(path, name), "ab").close()
+        self._remap()
+        # New FaceIDs continue after the highest one stored (scanned once, when the counter is created)
+        self.id_allocator = IdAllocator(os.path.join(path, IdAllocator.COUNTER_FILE), block_size=id_block_size,
+                                        seed=lambda: self.id_allocator.max_index(self.ids()))
+
+    # --- File mapping -------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _remap(self):
+        """(Re)maps both files; cheap, so it is done after every append batch."""
+        # Vectors are appended before records, so a record always has its vector (crash-safe)
+        num_rows = min(os.path.getsize(self._file(self.RECORDS_FILE)) // self.record_dtype.itemsize,
+                       os.path.getsize(self._file(self.EMBEDDINGS_FILE)) // (4 * self.dim))
+        if num_rows == 0:
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            self._records = np.empty(0, dtype=self.record_dtype)
+            return
+        self._vectors = np.memmap(self._file(self.EMBEDDINGS_FILE), dtype=np.float32, mode="r+", shape=(num_rows, self.dim))
+        self._records = np.memmap(self._file(self.RECORDS_FILE), dtype=self.record_dtype, mode="r+", shape=(num_rows,))
+
+    def _row_map(self) -> Dict[str, int]:
+        if self._rows is None:
+            alive = np.flatnonzero(self._records["deleted"] == 0)
+            names = np.char.decode(self._records["face_id"][alive], "utf-8")
+            self._rows = dict(zip(names.tolist(), alive.tolist()))
+        return self._rows
+
+    def _encode_id(self, face_id: str) -> bytes:
+        raw = face_id.encode("utf-8")
+        if len(raw) > self.record_dtype["face_id"].itemsize:
+            raise ValueError(f"FaceID too long for store ({len(raw)} bytes): {face_id}")
+        return raw
+
+    def _mark_dirty(self, row: int):
+        if self._dirty_rows is not None:
+            self._dirty_rows.add(row)
+
+    # --- Public API ---------------------------------------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._row_map())
+
+    def __contains__(self, face_id: str) -> bool:
+        with self._lock:
+            return face_id in self._row_map()
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._row_map())
+
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._row_map().get(face_id)
+            return None if row is None else np.array(self._vectors[row])
+
+    def last_seen(self, face_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._row_map().get(face_id)
+            return None if row is None else float(self._records["last_seen"][row])
+
+    def items(self) -> Iterator[Tuple[str, np.ndarray, float]]:
+        """Yields (face_id, embedding, last_seen epoch seconds) for every live identity."""
+        with self._lock:
+            rows = sorted(self._row_map().items(), key=lambda item: item[1])
+            vectors, records = self._vectors, self._records
+        for face_id, row in rows:
+            yield face_id, np.array(vectors[row]), float(records["last_seen"][row])
+
+    def upsert(self, face_id: str, embedding: np.ndarray, timestamp: Optional[float] = None):
+        """Appends a new identity or overwrites an existing one in place."""
+        self.upsert_many([(face_id, embedding)], timestamp)
+
+    def upsert_many(self, entries: List[Tuple[str, np.ndarray]], timestamp: Optional[float] = None):
+        """Batched upsert: one append (and one remap) for all new identities."""
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            rows = self._row_map()
+            new_entries: Dict[str, np.ndarray] = {}
+            for face_id, embedding in entries:
+                vec = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+                row = rows.get(face_id)
+                if row is not None:
+                    self._vectors[row] = vec
+                    self._records["last_seen"][row] = now
+                    self._mark_dirty(row)
+                else:
+                    new_entries[face_id] = vec
+            if not new_entries:
+                return
+
+            new_ids, new_vecs = list(new_entries), list(new_entries.values())
+
+            records = np.zeros(len(new_ids), dtype=self.record_dtype)
+            records["face_id"] = [self._encode_id(fid) for fid in new_ids]
+            records["created_at"] = now
+            records["last_seen"] = now
+            # Write at the end of the last complete row (drops any torn tail left by a crash)
+            start = len(self._records)
+            for name, offset, payload in ((self.EMBEDDINGS_FILE, start * 4 * self.dim, np.stack(new_vecs).tobytes()),
+                                          (self.RECORDS_FILE, start * self.record_dtype.itemsize, records.tobytes())):
+                with open(self._file(name), "r+b") as f:
+                    f.seek(offset)
+                    f.write(payload)
+                    f.truncate()
+            self._remap()
+            for offset, face_id in enumerate(new_ids):
+                rows[face_id] = start + offset
+
+    def touch(self, face_id: str, timestamp: Optional[float] = None):
+        """Updates last_seen in place."""
+        with self._lock:
+            row = self._row_map().get(face_id)
+            if row is not None:
+                self._records["last_seen"][row] = time.time() if timestamp is None else timestamp
+                self._mark_dirty(row)
+
+    def remove(self, face_id: str) -> bool:
+        """Tombstones an identity; triggers background compaction when worthwhile."""
+        with self._lock:
+            row = self._row_map().pop(face_id, None)
+            if row is None:
+                return False
+            self._records["deleted"][row] = 1
+            self._mark_dirty(row)
+            num_deleted = len(self._records) - len(self._rows)
+            if num_deleted > self.compact_ratio * len(self._records):
+                self.compact(background=True)
+            return True
+
+    def flush(self):
+        """Forces memory-mapped writes to disk."""
+        with self._lock:
+            for mm in (self._vectors, self._records):
+                if isinstance(mm, np.memmap):
+                    mm.flush()
+
+    # --- Compaction ---------------------------------------------------------
+
+    def compact(self, background: bool = False):
+        """Rewrites the files without tombstones (optionally in a background thread)."""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if background:
+                self._compactor = threading.Thread(target=self._compact, name="GalleryCompactor", daemon=True)
+                self._compactor.start()
+                return
+        self._compact()
+
+    def wait_for_compaction(self, timeout: Optional[float] = None):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(timeout)
+
+    def _compact(self):
+        try:
+            # 1. Snapshot the live rows and start tracking concurrent modifications
+            with self._lock:
+                self.flush()
+                snapshot_len = len(self._records)
+                alive = np.flatnonzero(self._records["deleted"] == 0)
+                vectors, records = self._vectors, self._records
+                self._dirty_rows = set()
+
+            # 2. Copy the snapshot outside the lock (frame loop keeps running)
+            tmp_vec, tmp_rec = self._file(self.EMBEDDINGS_FILE + ".tmp"), self._file(self.RECORDS_FILE + ".tmp")
+            with open(tmp_vec, "wb") as f:
+                f.write(np.ascontiguousarray(vectors[alive]).tobytes())
+            with open(tmp_rec, "wb") as f:
+                f.write(np.ascontiguousarray(records[alive]).tobytes())
+            del vectors, records
+
+            # 3. Replay changes made meanwhile and swap the files in
+            with self._lock:
+                new_row = {int(old): new for new, old in enumerate(alive)}
+                new_vectors = np.memmap(tmp_vec, dtype=np.float32, mode="r+", shape=(len(alive), self.dim)) if len(alive) else None
+                new_records = np.memmap(tmp_rec, dtype=self.record_dtype, mode="r+", shape=(len(alive),)) if len(alive) else None
+                for row in self._dirty_rows:
+                    if row in new_row:
+                        new_vectors[new_row[row]] = self._vectors[row]
+                        new_records[new_row[row]] = self._records[row]
+                for mm in (new_vectors, new_records):
+                    if mm is not None:
+                        mm.flush()
+                del new_vectors, new_records
+
+                appended_vec = np.ascontiguousarray(self._vectors[snapshot_len:]).tobytes()
+                appended_rec = np.ascontiguousarray(self._records[snapshot_len:]).tobytes()
+                with open(tmp_vec, "ab") as f:
+                    f.write(appended_vec)
+                with open(tmp_rec, "ab") as f:
+                    f.write(appended_rec)
+
+                self._vectors = self._records = None
+                os.replace(tmp_vec, self._file(self.EMBEDDINGS_FILE))
+                os.replace(tmp_rec, self._file(self.RECORDS_FILE))
+                self._dirty_rows = None
+                self._rows = None
+                self._remap()
+                logger.info(f"🗜️ LocalGalleryStore: Compacted {snapshot_len} -> {len(alive)} rows (+{len(self._records) - len(alive)} appended)")
+        except Exception as e:
+            with self._lock:
+                self._dirty_rows = None
+            logger.error(f"❌ Gallery compaction failed: {e}")
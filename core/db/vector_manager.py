@@ -1,88 +1,349 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import numpy as np
 import datetime
+import json
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from core.db.vector_store import VectorStore, create_vector_store
 
 class VectorManager:
     """
-    Manages 128-d face vector synchronization with Cloud Firestore.
+    Manages 128-d face vector synchronization with a VectorStore backend
+    (Cloud Firestore, local SQLite or in-memory; see core/db/vector_store.py).
+    Supports incremental (delta) sync: only documents whose `updated_at` is newer than the
+    stored watermark are pulled, and deletions arrive as tombstone documents.
+
+    Writes (push_vector / update_last_seen / delete_vector) are write-behind: they are
+    coalesced per FaceID in memory and committed in bulk batches by a background writer,
+    so callers on the frame loop never wait on the network. Failed batches are retried with
+    exponential backoff and spilled to a local journal that is replayed on the next start.
     """
-    def __init__(self, collection_name: str = "face_vectors"):
-        self.db = None
+    MAX_BATCH_SIZE = 500 # Firestore limit for writes per batch
+
+    def __init__(self, collection_name: str = "face_vectors", store: Optional[VectorStore] = None,
+                 backend: Optional[str] = None, store_params: Optional[dict] = None,
+                 state_path: Optional[str] = None, write_behind: bool = True, batch_size: int = 100,
+                 flush_interval: float = 2.0, max_backoff: float = 60.0, journal_path: Optional[str] = None):
+        """
+        Args:
+            collection_name: Firestore collection holding the vectors
+            store: Optional pre-built backend; otherwise one is created from `backend`
+            backend: "firestore", "sqlite" or "memory" (default: $VECTOR_STORE_BACKEND, then "firestore")
+            store_params: Extra constructor arguments for the backend (e.g. {"path": ...} for sqlite)
+            state_path: Optional JSON file persisting the sync watermark across restarts
+            write_behind: Queue writes for the background writer (False writes synchronously)
+            batch_size: Pending FaceIDs that trigger an immediate flush (and max writes per batch)
+            flush_interval: Seconds between time-triggered flushes
+            max_backoff: Upper bound in seconds for the retry delay after failed commits
+            journal_path: Optional JSON file holding unsent writes while offline
+        """
+        self.store = store
         self.collection_name = collection_name
+        self.state_path = state_path
+        self.watermark: Optional[datetime.datetime] = None
         self.is_ready = False
-        self._initialize_firebase()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._stop_sync = threading.Event()
+
+        # Write-behind queue: FaceID -> pending write ({"op", "vector", "metadata"})
+        self.write_behind = write_behind
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.journal_path = journal_path
+        self._pending: "OrderedDict[str, dict]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock() # One batch in flight keeps per-FaceID write order
+        self._closed = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._writer: Optional[threading.Thread] = None
+
+        if store is not None:
+            self.is_ready = True
+        else:
+            self._initialize_store(backend, store_params or {})
+        self._load_state()
+        self._load_journal()
 
-    def _initialize_firebase(self):
+    def _initialize_store(self, backend: Optional[str], params: dict):
         try:
-            # Set a shorter timeout for credential discovery to prevent hanging
-            # If we're not on GCP, this can take a long time to fail
-            os.environ["GRPC_ENABLE_FORK_SUPPORT"] = "false"
-            
-            if not firebase_admin._apps:
-                # Try initializing with default credentials
-                firebase_admin.initialize_app()
-            
-            self.db = firestore.client()
+            self.store = create_vector_store(backend, collection_name=self.collection_name, **params)
             self.is_ready = True
-            print("🚀 VectorManager: Connected to Cloud Firestore")
+            print(f"🚀 VectorManager: Connected to '{self.store.name}' vector store")
         except Exception as e:
-            print(f"⚠️ VectorManager: Firebase Cloud mode disabled (Local-only). Reason: {e}")
+            print(f"⚠️ VectorManager: Vector store disabled (Local-only). Reason: {e}")
             self.is_ready = False
 
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("watermark"):
+                self.watermark = datetime.datetime.fromisoformat(state["watermark"])
+        except Exception as e:
+            print(f"⚠️ VectorManager: Ignoring unreadable sync state ({e})")
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"watermark": self.watermark.isoformat() if self.watermark else None}, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"Error saving sync state: {e}")
+
     def sync_gallery_from_cloud(self) -> Dict[str, dict]:
         """Fetch all vectors from Firestore."""
         if not self.is_ready:
             return {}
-        
+
         gallery = {}
         try:
-            docs = self.db.collection(self.collection_name).stream()
-            for doc in docs:
-                data = doc.to_dict()
-                gallery[doc.id] = data
+            for face_id, data in self.store.stream():
+                if data.get("deleted"):
+                    continue
+                gallery[face_id] = data
             return gallery
         except Exception as e:
             print(f"Error fetching from cloud: {e}")
             return {}
 
+    def sync_gallery_delta(self) -> Tuple[Dict[str, dict], List[str], Optional[datetime.datetime]]:
+        """
+        Fetch only documents changed since the last committed sync.
+        The first call (no watermark) streams the whole collection.
+
+        Returns:
+            (upserts, deleted_ids, latest): changed documents by FaceID, FaceIDs tombstoned in the
+            cloud, and the candidate watermark. The watermark is not advanced here: call
+            commit_watermark(latest) once the delta has been applied, so a failed apply (or a
+            crash before it) re-fetches the same delta next time.
+        """
+        if not self.is_ready:
+            return {}, [], self.watermark
+
+        upserts, deleted = {}, []
+        try:
+            latest = self.watermark
+            for face_id, data in self.store.stream(since=self.watermark):
+                if data.get("deleted"):
+                    deleted.append(face_id)
+                    upserts.pop(face_id, None)
+                else:
+                    upserts[face_id] = data
+                updated_at = data.get("updated_at")
+                if updated_at is not None and (latest is None or updated_at > latest):
+                    latest = updated_at
+
+            return upserts, deleted, latest
+        except Exception as e:
+            print(f"Error fetching delta from cloud: {e}")
+            return {}, [], self.watermark
+
+    def commit_watermark(self, latest: Optional[datetime.datetime]):
+        """Advances (and persists) the sync watermark after a delta was applied successfully."""
+        if latest is None or (self.watermark is not None and latest <= self.watermark):
+            return
+        self.watermark = latest
+        self._save_state()
+
+    def start_background_sync(self, callback: Callable[[Dict[str, dict], List[str]], None], interval_seconds: float = 60.0):
+        """Periodically pulls deltas in a daemon thread and hands non-empty ones to `callback`."""
+        if not self.is_ready or (self._sync_thread is not None and self._sync_thread.is_alive()):
+            return
+        self._stop_sync.clear()
+
+        def _loop():
+            while not self._stop_sync.wait(interval_seconds):
+                upserts, deleted, latest = self.sync_gallery_delta()
+                if upserts or deleted:
+                    try:
+                        callback(upserts, deleted)
+                    except Exception as e:
+                        # Watermark stays put: the same delta is fetched again next round
+                        print(f"Error applying cloud delta: {e}")
+                        continue
+                self.commit_watermark(latest)
+
+        self._sync_thread = threading.Thread(target=_loop, name="VectorDeltaSync", daemon=True)
+        self._sync_thread.start()
+
+    def stop_background_sync(self, timeout: Optional[float] = None):
+        self._stop_sync.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join(timeout)
+            self._sync_thread = None
+
+    # --- Write-behind queue -------------------------------------------------
+
+    @staticmethod
+    def _merge(older: dict, newer: dict) -> dict:
+        """Coalesces two pending writes for the same FaceID (newer wins, upserts imply a touch)."""
+        if newer["op"] == "touch" and older["op"] != "touch":
+            return older
+        if newer["op"] == "upsert" and older["op"] == "upsert":
+            return {**newer, "metadata": {**older["metadata"], **newer["metadata"]}}
+        return newer
+
+    def _enqueue(self, face_id: str, entry: dict):
+        if not self.write_behind:
+            self.store.commit([(face_id, entry)])
+            return
+        with self._cond:
+            older = self._pending.pop(face_id, None)
+            self._pending[face_id] = entry if older is None else self._merge(older, entry)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+            self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is None and not self._closed:
+            self._writer = threading.Thread(target=self._writer_loop, name="VectorWriteBehind", daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self):
+        """Flushes when `batch_size` FaceIDs are pending or every `flush_interval` seconds."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                wait = self._retry_at - time.monotonic()
+                if wait > 0 and not self._closed:
+                    self._cond.wait_for(lambda: self._closed, timeout=wait)
+                if self._closed:
+                    return
+            self._flush_pending()
+
+    def _flush_pending(self) -> bool:
+        """Commits pending writes batch by batch. Returns False if a commit failed."""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    if not self._pending:
+                        self._remove_journal()
+                        return True
+                    items = [self._pending.popitem(last=False) for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    self.store.commit(items)
+                except Exception as e:
+                    with self._cond:
+                        # Put the batch back in front, under any writes queued meanwhile
+                        for face_id, entry in reversed(items):
+                            newer = self._pending.pop(face_id, None)
+                            self._pending[face_id] = entry if newer is None else self._merge(entry, newer)
+                            self._pending.move_to_end(face_id, last=False)
+                        self._failures += 1
+                        backoff = min(self.max_backoff, self.flush_interval * 2 ** (self._failures - 1))
+                        self._retry_at = time.monotonic() + backoff
+                        self._write_journal()
+                        pending = len(self._pending)
+                    print(f"⚠️ VectorManager: Cloud write failed ({e}); {pending} pending, retry in {backoff:.1f}s")
+                    return False
+                with self._cond:
+                    self._failures = 0
+                    self._retry_at = 0.0
+
+    def _write_journal(self):
+        if not self.journal_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self._pending.items()), f, default=str)
+            os.replace(tmp_path, self.journal_path)
+        except Exception as e:
+            print(f"Error writing cloud journal: {e}")
+
+    def _remove_journal(self):
+        if self.journal_path and os.path.exists(self.journal_path):
+            try:
+                os.remove(self.journal_path)
+            except OSError:
+                pass
+
+    def _load_journal(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            with self._cond:
+                for face_id, entry in entries:
+                    self._pending[face_id] = entry
+                if self._pending and self.is_ready:
+                    self._ensure_writer()
+            print(f"📒 VectorManager: Replaying {len(entries)} journaled cloud writes")
+        except Exception as e:
+            print(f"⚠️ VectorManager: Ignoring unreadable cloud journal ({e})")
+
+    def pending_writes(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self) -> bool:
+        """Synchronously commits every pending write. Returns False if the cloud is unreachable."""
+        if not self.is_ready:
+            return False
+        return self._flush_pending()
+
+    def close(self):
+        """Stops the background threads; unsent writes are flushed or left in the journal."""
+        self.stop_background_sync()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.join()
+        if self.is_ready and not self._flush_pending():
+            with self._cond:
+                self._write_journal()
+
+    # --- Writes ---------------------------------------------------------------
+
     def push_vector(self, face_id: str, embedding: np.ndarray, metadata: dict = None):
-        """Uplods a new face vector to Firestore."""
+        """Queues a new face vector for upload to Firestore."""
         if not self.is_ready:
             return
-        
+
         try:
-            doc_ref = self.db.collection(self.collection_name).document(face_id)
-            data = {
-                "vector": embedding.tolist(),
-                "last_seen": firestore.SERVER_TIMESTAMP,
-                "created_at": firestore.SERVER_TIMESTAMP
-            }
-            if metadata:
-                data.update(metadata)
-                
-            doc_ref.set(data, merge=True)
+            vector = np.asarray(embedding, dtype=np.float32).tolist()
+            self._enqueue(face_id, {"op": "upsert", "vector": vector, "metadata": dict(metadata or {})})
         except Exception as e:
             print(f"Error pushing to cloud: {e}")
 
+    def delete_vector(self, face_id: str):
+        """Tombstones a vector so delta syncs on other nodes remove it too."""
+        if not self.is_ready:
+            return
+        try:
+            self._enqueue(face_id, {"op": "delete", "vector": None, "metadata": {}})
+        except Exception as e:
+            print(f"Error deleting from cloud: {e}")
+
     def update_last_seen(self, face_id: str):
-        """Updates the timestamp in the cloud."""
+        """Queues a last_seen refresh; repeated sightings of one FaceID collapse into one write."""
         if not self.is_ready:
             return
         try:
-            self.db.collection(self.collection_name).document(face_id).update({
-                "last_seen": firestore.SERVER_TIMESTAMP
-            })
-        except:
-            pass
+            self._enqueue(face_id, {"op": "touch", "vector": None, "metadata": {}})
+        except Exception as e:
+            print(f"Error updating last_seen: {e}")
 
     def delete_stale_vectors(self, max_age_seconds: int = 86400):
         """Deletes vectors from cloud that haven't been seen for a long time (Big Data Cleanup)."""
         if not self.is_ready:
             return
-        
+
         # Implementation of cloud-side cleanup query
         # For prototype, we'll keep it simple
         pass
@@ -0,0 +1,192 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional, Tuple
+
+class VectorStore(ABC):
+    """
+    Backend interface for VectorManager.
+
+    Writes arrive as coalesced per-FaceID entries ({"op": "upsert" | "touch" | "delete",
+    "vector", "metadata"}); reads return Firestore-shaped documents
+    ({"vector", "last_seen", "created_at", "updated_at", "deleted", ...metadata}).
+    Backends stamp timestamps themselves so `updated_at` can serve as a sync watermark.
+    """
+    name = "base"
+
+    @abstractmethod
+    def commit(self, writes: List[Tuple[str, dict]]):
+        """Applies one batch of writes atomically. Raises on failure (the batch is retried)."""
+
+    @abstractmethod
+    def stream(self, since: Optional[datetime.datetime] = None) -> Iterator[Tuple[str, dict]]:
+        """Yields (face_id, document), all of them or only those with updated_at > since (ascending)."""
+
+    def close(self):
+        pass
+
+class FirestoreVectorStore(VectorStore):
+    """
+    Cloud Firestore backend. `firebase_admin` is imported here, on construction,
+    so offline deployments never pay for the import or the credential discovery.
+    Any client with the Firestore collection/batch API can be injected (e.g. LocalDocumentStore).
+    """
+    name = "firestore"
+
+    def __init__(self, collection_name: str = "face_vectors", client=None):
+        self.collection_name = collection_name
+        if client is None:
+            import firebase_admin
+            from firebase_admin import firestore
+            # Set a shorter timeout for credential discovery to prevent hanging
+            # If we're not on GCP, this can take a long time to fail
+            os.environ["GRPC_ENABLE_FORK_SUPPORT"] = "false"
+            if not firebase_admin._apps:
+                # Try initializing with default credentials
+                firebase_admin.initialize_app()
+            client = firestore.client()
+            self.SERVER_TIMESTAMP, self.DELETE_FIELD = firestore.SERVER_TIMESTAMP, firestore.DELETE_FIELD
+        else:
+            self.SERVER_TIMESTAMP, self.DELETE_FIELD = client.SERVER_TIMESTAMP, client.DELETE_FIELD
+        self.client = client
+
+    def _build_doc(self, entry: dict) -> dict:
+        if entry["op"] == "delete":
+            return {"vector": self.DELETE_FIELD, "deleted": True, "updated_at": self.SERVER_TIMESTAMP}
+        if entry["op"] == "touch":
+            return {"last_seen": self.SERVER_TIMESTAMP}
+        data = {
+            "vector": entry["vector"],
+            "last_seen": self.SERVER_TIMESTAMP,
+            "created_at": self.SERVER_TIMESTAMP,
+            "updated_at": self.SERVER_TIMESTAMP,
+            "deleted": False
+        }
+        data.update(entry["metadata"])
+        return data
+
+    def commit(self, writes: List[Tuple[str, dict]]):
+        # set(merge=True) so touches of not-yet-synced documents do not fail the batch
+        collection = self.client.collection(self.collection_name)
+        batch = self.client.batch()
+        for face_id, entry in writes:
+            batch.set(collection.document(face_id), self._build_doc(entry), merge=True)
+        batch.commit()
+
+    def stream(self, since: Optional[datetime.datetime] = None) -> Iterator[Tuple[str, dict]]:
+        query = self.client.collection(self.collection_name)
+        if since is not None:
+            query = query.where("updated_at", ">", since).order_by("updated_at")
+        for doc in query.stream():
+            yield doc.id, doc.to_dict()
+
+class MemoryVectorStore(FirestoreVectorStore):
+    """In-process backend (tests, demos): the Firestore code path over a LocalDocumentStore."""
+    name = "memory"
+
+    def __init__(self, collection_name: str = "face_vectors"):
+        from core.db.local_document_store import LocalDocumentStore
+        super().__init__(collection_name, client=LocalDocumentStore())
+
+class SQLiteVectorStore(VectorStore):
+    """
+    Local backend for offline sites: one SQLite table per collection, vectors stored as float32 blobs.
+    Timestamps are UTC epoch seconds; `updated_at` is kept strictly increasing so it
+    works as a watermark like Firestore's server timestamps.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str = "data/face_vectors.sqlite", collection_name: str = "face_vectors"):
+        if not collection_name.isidentifier():
+            raise ValueError(f"Invalid collection name for SQLite table: {collection_name}")
+        self.path = path
+        self.table = collection_name
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "face_id TEXT PRIMARY KEY, vector BLOB, last_seen REAL, created_at REAL, "
+            "updated_at REAL NOT NULL, deleted INTEGER NOT NULL DEFAULT 0, metadata TEXT)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_updated_at ON {self.table}(updated_at)")
+        self._conn.commit()
+        row = self._conn.execute(f"SELECT MAX(updated_at) FROM {self.table}").fetchone()
+        self._last_stamp = row[0] or 0.0
+
+    def _stamp(self) -> float:
+        # Microsecond steps survive the round trip through datetime watermarks
+        self._last_stamp = round(max(time.time(), self._last_stamp + 1e-6), 6)
+        return self._last_stamp
+
+    @staticmethod
+    def _to_datetime(ts: Optional[float]) -> Optional[datetime.datetime]:
+        return None if ts is None else datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+
+    def commit(self, writes: List[Tuple[str, dict]]):
+        with self._lock, self._conn:
+            now = self._stamp()
+            for face_id, entry in writes:
+                if entry["op"] == "upsert":
+                    blob = np.asarray(entry["vector"], dtype=np.float32).tobytes()
+                    meta = json.dumps(entry["metadata"], default=str) if entry["metadata"] else None
+                    self._conn.execute(
+                        f"INSERT INTO {self.table} (face_id, vector, last_seen, created_at, updated_at, deleted, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, 0, ?) ON CONFLICT(face_id) DO UPDATE SET "
+                        "vector=excluded.vector, last_seen=excluded.last_seen, updated_at=excluded.updated_at, "
+                        f"deleted=0, metadata=COALESCE(excluded.metadata, {self.table}.metadata)",
+                        (face_id, blob, now, now, now, meta))
+                elif entry["op"] == "touch":
+                    self._conn.execute(f"UPDATE {self.table} SET last_seen=? WHERE face_id=?", (now, face_id))
+                else:
+                    self._conn.execute(
+                        f"INSERT INTO {self.table} (face_id, updated_at, deleted) VALUES (?, ?, 1) "
+                        "ON CONFLICT(face_id) DO UPDATE SET vector=NULL, deleted=1, updated_at=excluded.updated_at",
+                        (face_id, now))
+
+    def stream(self, since: Optional[datetime.datetime] = None) -> Iterator[Tuple[str, dict]]:
+        query = f"SELECT face_id, vector, last_seen, created_at, updated_at, deleted, metadata FROM {self.table}"
+        params: tuple = ()
+        if since is not None:
+            query += " WHERE updated_at > ? ORDER BY updated_at"
+            params = (since.timestamp(),)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for face_id, blob, last_seen, created_at, updated_at, deleted, meta in rows:
+            doc = json.loads(meta) if meta else {}
+            doc.update({
+                "vector": np.frombuffer(blob, dtype=np.float32).tolist() if blob is not None else None,
+                "last_seen": self._to_datetime(last_seen),
+                "created_at": self._to_datetime(created_at),
+                "updated_at": self._to_datetime(updated_at),
+                "deleted": bool(deleted)
+            })
+            yield face_id, doc
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+VECTOR_STORES = {
+    "firestore": FirestoreVectorStore,
+    "sqlite": SQLiteVectorStore,
+    "memory": MemoryVectorStore,
+}
+
+# Deployment-wide default backend; offline sites set VECTOR_STORE_BACKEND=sqlite
+DEFAULT_BACKEND_ENV = "VECTOR_STORE_BACKEND"
+
+def create_vector_store(backend: Optional[str] = None, **params) -> VectorStore:
+    """
+    Builds a vector store backend by name ("firestore", "sqlite" or "memory").
+    Defaults to $VECTOR_STORE_BACKEND, then "firestore".
+    """
+    backend = (backend or os.environ.get(DEFAULT_BACKEND_ENV) or "firestore").lower()
+    if backend not in VECTOR_STORES:
+        raise ValueError(f"Unknown vector store backend '{backend}'. Available: {list(VECTOR_STORES)}")
+    return VECTOR_STORES[backend](**params)
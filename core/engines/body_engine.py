@@ -1,6 +1,6 @@
 import cv2
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional
 from core.models.qwen_vl import QwenVLProcessor
 from core.utils.logger import get_logger
 
@@ -19,20 +19,27 @@ class BodyEngine:
         self.refiner = RefinementEngine()
         logger.info("🧍 BodyEngine initialized with Qwen-VL backend and Refiner.")
 
-    def detect_and_analyze(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+    def detect_and_analyze(self, frame: np.ndarray, max_persons: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Detects persons (full body) and extracts attributes like gender, age, clothing.
         Then refines the results using Hybrid Refinement Algorithm.
         """
+        return list(self.stream_and_analyze(frame, max_persons))
+
+    def stream_and_analyze(self, frame: np.ndarray, max_persons: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming detect_and_analyze: each person is refined and yielded as soon as Qwen-VL
+        has decoded its line, while decoding of the remaining persons continues.
+        Decoding stops after `max_persons` detections (before refinement).
+        """
         logger.info("🔍 [BodyEngine] Analyzing full body attributes...")
-        # 1. Base Detection using Qwen-VL
-        raw_results = self.processor.detect_and_analyze_persons(frame)
-        
-        # 2. Hybrid Refinement (Geometric + CV Verification)
-        refined_results = self.refiner.refine_detections(frame, raw_results)
-        
-        # 3. Final Metadata Tagging
-        for res in refined_results:
-            res["type"] = "body"
-            
-        return refined_results
+        # 1. Base Detection using Qwen-VL (streamed)
+        for det in self.processor.stream_persons(frame, max_detections=max_persons):
+            # 2. Hybrid Refinement (Geometric + CV Verification)
+            refined = self.refiner.refine_detection(frame, det)
+            if refined is None:
+                continue
+
+            # 3. Final Metadata Tagging
+            refined["type"] = "body"
+            yield refined
@@ -12,7 +12,7 @@ class FaceEngine:
     """
     def __init__(self, processor: Optional[FaceProcessor] = None):
         # Assuming FaceProcessor is already implemented in core/processing
-        self.processor = processor or FaceProcessor()
+        self.processor = processor or FaceProcessor(with_attributes=False) # Results carry IDs and boxes only
         logger.info("👤 FaceEngine initialized with FaceProcessor backend.")
 
     def detect_and_analyze(self, frame: np.ndarray) -> List[Dict[str, Any]]:
@@ -20,18 +20,14 @@ class FaceEngine:
         Detects faces and extracts features.
         """
         logger.info("🔍 [FaceEngine] Analyzing faces...")
-        # FaceProcessor has process_frame method returning List[Person]
-        people = self.processor.process_frame(frame)
+        # FaceProcessor.process_frame returns a column-wise FrameResult
+        result = self.processor.process_frame(frame)
         
         # Standardize results
-        formatted_results = []
-        for p in people:
-            formatted_results.append({
-                "id": p.id,
-                "bbox": p.rect, # (x1, y1, x2, y2)
-                "type": "face",
-                "confidence": 0.99, # Placeholder if not in Person
-                "landmarks": []
-            })
-            
-        return formatted_results
+        return [{
+            "id": face_id,
+            "bbox": tuple(box), # (x1, y1, x2, y2)
+            "type": "face",
+            "confidence": 0.99, # Placeholder if not in FrameResult
+            "landmarks": []
+        } for face_id, box in zip(result.ids, result.boxes.tolist())]
@@ -11,6 +11,8 @@ class ObjectEngine:
     """
     Engine specialized in general object detection (furniture, electronics, etc.)
     """
+    OBJECT_LINE = re.compile(r"\[\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\]\s*([^\n\[]+)")
+
     def __init__(self, processor: Optional[QwenVLProcessor] = None):
         self.processor = processor or QwenVLProcessor()
         logger.info("📦 ObjectEngine initialized with Qwen-VL backend.")
@@ -24,21 +26,25 @@ class ObjectEngine:
 
         logger.info(f"🔍 [ObjectEngine] Searching for: {target_objects}")
         
-        # Custom prompt for object detection
+        # Fixed instruction per object list: its prefix KV cache is reused across frames
         obj_list_str = ", ".join(target_objects)
-        prompt = (
-            f"<|image_pad|>Detect the following objects: {obj_list_str}.\n"
+        instruction = (
+            f"Detect the following objects: {obj_list_str}.\n"
             "Return: [ymin, xmin, ymax, xmax] ClassName\n"
             "No conversation. Just the list."
         )
-        
-        # This is a simplified call to the processor's lower-level generation
-        # In a real implementation, we might add a generic 'detect_objects' method to QwenVLProcessor
-        # For now, we simulate the output parsing here or use a simplified version of person detection logic
-        
-        # Mocking the inference logic for the structural demo
-        # (Practical implementation would call model.generate directly)
+        res_text = self.processor.generate_texts([frame], instruction)[0]
+        if not res_text:
+            return []
+
         results = []
-        # Placeholder for actual inference call...
-        
+        for match in self.OBJECT_LINE.finditer(res_text):
+            ymin, xmin, ymax, xmax = (int(v) for v in match.group(1, 2, 3, 4))
+            label = match.group(5).strip()
+            if xmax <= xmin or ymax <= ymin:
+                continue
+            # Same 0-1000 [ymin, xmin, ymax, xmax] convention as the person results
+            results.append({"bbox": [ymin, xmin, ymax, xmax], "label": label})
+
+        logger.info(f"📦 [ObjectEngine] Found {len(results)} object(s)")
         return results
@@ -1,6 +1,6 @@
 import cv2
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from core.utils.logger import get_logger
 from core.processing.face_processor import FaceProcessor
 
@@ -10,7 +10,8 @@ class RefinementEngine:
     """
     def __init__(self, face_processor: FaceProcessor = None):
         self.logger = get_logger("RefinementEngine")
-        self.face_processor = face_processor or FaceProcessor()
+        # Only face presence inside each VLM ROI is checked: no age/gender classification
+        self.face_processor = face_processor or FaceProcessor(with_attributes=False)
         self.logger.info("🛡️ RefinementEngine initialized for high-precision validation.")
 
     def refine_detections(self, frame: np.ndarray, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -20,29 +21,38 @@ class RefinementEngine:
         refined_results = []
         
         for det in detections:
-            bbox = det.get('bbox') # [ymin, xmin, ymax, xmax]
-            if not bbox: continue
-            
-            # 1. Geometric Verification (기하학적 검증)
-            geo_score = self._verify_geometry(bbox, frame.shape)
-            
-            # 2. CV-based Verification (Face/Keypoint 검증 - 우선 Face 위주)
-            cv_score = self._verify_with_face(frame, bbox)
-            
-            # 3. Final Integration (가중치 기반 결정)
-            # VLM 결과가 압도적이거나, CV 증거가 보완될 때 생존
-            final_confidence = (geo_score * 0.4) + (cv_score * 0.6)
-            
-            self.logger.info(f"🔍 Refinement [ID:{det.get('id')}]: Geo:{geo_score:.2f}, CV:{cv_score:.2f} -> Final:{final_confidence:.2f}")
-            
-            if final_confidence > 0.4: # 임계값 (상황에 따라 조정 가능)
-                det['confidence_score'] = round(final_confidence, 2)
-                refined_results.append(det)
-            else:
-                self.logger.warning(f"🚫 Removing False Positive [ID:{det.get('id')}]: Semantic mismatch or geometry error.")
+            refined = self.refine_detection(frame, det)
+            if refined is not None:
+                refined_results.append(refined)
 
         return refined_results
 
+    def refine_detection(self, frame: np.ndarray, det: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        단일 탐지 결과 정제 (스트리밍 탐지 시 결과가 도착하는 즉시 호출). 탈락 시 None.
+        """
+        bbox = det.get('bbox') # [ymin, xmin, ymax, xmax]
+        if not bbox: return None
+        
+        # 1. Geometric Verification (기하학적 검증)
+        geo_score = self._verify_geometry(bbox, frame.shape)
+        
+        # 2. CV-based Verification (Face/Keypoint 검증 - 우선 Face 위주)
+        cv_score = self._verify_with_face(frame, bbox)
+        
+        # 3. Final Integration (가중치 기반 결정)
+        # VLM 결과가 압도적이거나, CV 증거가 보완될 때 생존
+        final_confidence = (geo_score * 0.4) + (cv_score * 0.6)
+        
+        self.logger.info(f"🔍 Refinement [ID:{det.get('id')}]: Geo:{geo_score:.2f}, CV:{cv_score:.2f} -> Final:{final_confidence:.2f}")
+        
+        if final_confidence > 0.4: # 임계값 (상황에 따라 조정 가능)
+            det['confidence_score'] = round(final_confidence, 2)
+            return det
+
+        self.logger.warning(f"🚫 Removing False Positive [ID:{det.get('id')}]: Semantic mismatch or geometry error.")
+        return None
+
     def _verify_geometry(self, bbox: List[int], img_shape: tuple) -> float:
         """
         바운딩 박스의 종횡비와 크기를 분석하여 인체 가능성 점수 산출.
@@ -81,9 +91,9 @@ class RefinementEngine:
         
         try:
             # FaceProcessor를 사용해 ROI 내 얼굴 탐지 시도
-            persons = self.face_processor.process_frame(roi)
+            result = self.face_processor.process_frame(roi)
             
-            if persons and len(persons) > 0:
+            if len(result) > 0:
                 self.logger.info(f"✅ Face confirmed inside VLM bbox.")
                 return 1.0
             
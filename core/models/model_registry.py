@@ -0,0 +1,136 @@
+import cv2
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from core.utils.logger import get_logger
+
+logger = get_logger("ModelRegistry")
+
+class _ModelEntry:
+    """Bookkeeping for one loaded weight file (per backend/target combination)."""
+    def __init__(self, key: Tuple, net: cv2.dnn.Net, load_ms: float):
+        self.key = key
+        self.input_shape = None
+        self.net = net
+        self.load_ms = load_ms
+        self.local = threading.local()
+        self.thread_handles = 0
+        self.requests = 1
+
+class ModelRegistry:
+    """
+    Process-wide registry of OpenCV DNN networks (Caffe / Torch).
+    Each weight file is read once per process and keyed by
+    (model path, config path, backend, target), so every FaceUtils / FaceReID
+    instance created by the engines shares the same loaded network.
+
+    cv2.dnn.Net is not safe for concurrent setInput/forward calls; callers that run
+    inference from several threads should request per-thread handles.
+    """
+    _entries: Dict[Tuple, _ModelEntry] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(model: str, config: Optional[str], backend: int, target: int) -> Tuple:
+        return (os.path.abspath(model), os.path.abspath(config) if config else None, backend, target)
+
+    @staticmethod
+    def _read_net(model: str, config: Optional[str], backend: int, target: int) -> cv2.dnn.Net:
+        if model.endswith(".t7") or model.endswith(".net"):
+            net = cv2.dnn.readNetFromTorch(model)
+        else:
+            net = cv2.dnn.readNet(model, config) if config else cv2.dnn.readNet(model)
+        net.setPreferableBackend(backend)
+        net.setPreferableTarget(target)
+        return net
+
+    @classmethod
+    def get_net(cls, model: str, config: Optional[str] = None,
+                backend: int = cv2.dnn.DNN_BACKEND_DEFAULT, target: int = cv2.dnn.DNN_TARGET_CPU,
+                per_thread: bool = False, input_shape: Optional[Tuple[int, ...]] = None) -> cv2.dnn.Net:
+        """
+        Returns a loaded network for the given weight file.
+
+        Args:
+            model: Path to the weights (.caffemodel, .t7, ...)
+            config: Optional path to the network definition (.prototxt)
+            backend: cv2.dnn backend id
+            target: cv2.dnn target id
+            per_thread: If True, returns a handle private to the calling thread
+                        (loaded on first use in that thread) instead of the shared one.
+            input_shape: Optional NCHW input shape, used by memory_report to size the blobs.
+
+        Raises:
+            FileNotFoundError: If the model or config file does not exist.
+        """
+        if not os.path.exists(model) or (config and not os.path.exists(config)):
+            raise FileNotFoundError(f"Model files not found: {model} or {config}")
+
+        key = cls._make_key(model, config, backend, target)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None:
+                start = time.perf_counter()
+                net = cls._read_net(model, config, backend, target)
+                entry = _ModelEntry(key, net, (time.perf_counter() - start) * 1000.0)
+                cls._entries[key] = entry
+                logger.info(f"📦 ModelRegistry: Loaded '{os.path.basename(model)}' ({entry.load_ms:.1f} ms)")
+            else:
+                entry.requests += 1
+            if input_shape is not None:
+                entry.input_shape = tuple(input_shape)
+
+        if not per_thread:
+            return entry.net
+
+        net = getattr(entry.local, "net", None)
+        if net is None:
+            net = cls._read_net(model, config, backend, target)
+            entry.local.net = net
+            with cls._lock:
+                entry.thread_handles += 1
+        return net
+
+    @classmethod
+    def memory_report(cls) -> List[Dict]:
+        """
+        Reports memory use for every loaded model.
+
+        Returns:
+            List of dicts with file size, weight/blob bytes (as reported by OpenCV for the
+            registered input shape, None if unknown), load time and handle counts.
+        """
+        report = []
+        with cls._lock:
+            entries = list(cls._entries.values())
+
+        for entry in entries:
+            model, config, backend, target = entry.key
+            name = os.path.basename(model)
+            info = {
+                "model": name,
+                "backend": backend,
+                "target": target,
+                "file_bytes": os.path.getsize(model) + (os.path.getsize(config) if config else 0),
+                "weights_bytes": None,
+                "blobs_bytes": None,
+                "load_ms": round(entry.load_ms, 1),
+                "requests": entry.requests,
+                "thread_handles": entry.thread_handles,
+            }
+            if entry.input_shape is not None:
+                try:
+                    weights, blobs = entry.net.getMemoryConsumption(entry.input_shape)
+                    info["weights_bytes"] = int(weights)
+                    info["blobs_bytes"] = int(blobs)
+                except Exception as e:
+                    logger.warning(f"Memory query failed for {name}: {e}")
+            report.append(info)
+        return report
+
+    @classmethod
+    def clear(cls):
+        """Drops every cached network (handles already given out stay valid)."""
+        with cls._lock:
+            cls._entries.clear()
@@ -1,25 +1,54 @@
+import copy
+import hashlib
+import inspect
 import os
 import re
 import json
+import queue
+import threading
 import cv2
 import torch
 import requests
 import numpy as np
 from PIL import Image
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from typing import Callable, Iterator, Optional, List, Dict, Any
+from core.models.result_cache import RESULT_CACHE_ENV, InferenceResultCache
+from core.models.structured_output import GrammarVocabulary, LineGrammar, StreamingRecordParser, person_line_grammar
 from core.utils.logger import get_logger
 
 logger = get_logger("QwenVL")
 
+# on_record(image_index, record) for every completed output line; returning True ends that image's output
+RecordCallback = Callable[[int, Dict[str, str]], Optional[bool]]
+
 class QwenVLProcessor:
     """
     Hybrid object detection and analysis processor using the Qwen-2.5-VL model.
     Supports:
     - Automatic Hybrid Loading: Local weights (assets/weights) vs Online (Hugging Face)
     - Comprehensive Person Analysis: Detection + Gender + Age in one pass
+    - Batched Inference: many images (e.g. multi-camera keyframes) per generate call
+    - Prompt Prefix Reuse: the fixed instruction's KV cache is computed once, only image tokens are prefilled
+    - Constrained Decoding: person results restricted to the list grammar, records emitted as lines complete
+    - Streaming: persons yielded as soon as their line is decoded, with early stop on repeats or a detection cap
+    - Result Cache (opt-in): results keyed by image content + prompt + parameters + model revision
     - Precision Parsing: Regex-based coordinate extraction
     """
-    def __init__(self, model_path: Optional[str] = None, device: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, device: Optional[str] = None,
+                 max_batch_size: int = 4, max_batch_tokens: int = 16384, reuse_prefix_cache: bool = True,
+                 constrained_decoding: bool = True, result_cache: Optional[InferenceResultCache] = None):
+        """
+        Args:
+            max_batch_size: Most images per model.generate call in detect_and_analyze_persons_batch
+            max_batch_tokens: Padded token budget per call (batch size x (longest input + new tokens))
+            reuse_prefix_cache: Compute the KV cache of the fixed instruction once and prefill only
+                the image / variable tokens per call
+            constrained_decoding: Mask person-detection decoding to the '[ymin, xmin, ymax, xmax] Gender, AgeGroup'
+                list grammar (no preambles, no unparsable output, stops at the end of the list)
+            result_cache: Cache for detect_and_analyze_persons / detect_objects results; defaults to
+                an on-disk cache in $QWEN_RESULT_CACHE_DIR when set, otherwise no caching
+        """
         # Set default local path
         if model_path is None:
             model_path = os.path.join(os.getcwd(), "assets/weights/Qwen2.5-VL-3B-Instruct")
@@ -29,6 +58,17 @@ class QwenVLProcessor:
         self.repo_id = "Qwen/Qwen2.5-VL-3B-Instruct"
         self.model = None
         self.processor = None
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.reuse_prefix_cache = reuse_prefix_cache
+        self._prefix_caches: "OrderedDict[str, tuple]" = OrderedDict()
+        self.constrained_decoding = constrained_decoding
+        self._grammar_vocabularies: Dict[LineGrammar, GrammarVocabulary] = {}
+        self._grammar_masks: Dict[tuple, torch.Tensor] = {}
+        if result_cache is None and os.environ.get(RESULT_CACHE_ENV):
+            result_cache = InferenceResultCache(os.environ[RESULT_CACHE_ENV])
+        self.result_cache = result_cache
+        self._revision: Optional[str] = None
         
         self._initialize_model()
 
@@ -77,6 +117,8 @@ class QwenVLProcessor:
                 local_files_only=has_local
             )
             
+            # Fingerprinted at load time: describes the weights actually in memory
+            self._revision = self._local_revision(load_path) if has_local else None
             logger.info(f"✅ Qwen-2.5-VL loaded successfully on {self.device}")
             
         except ImportError as e:
@@ -87,116 +129,479 @@ class QwenVLProcessor:
             if not has_local:
                 logger.info("💡 Hint: Run 'core/utils/download_model.py' to download weights for offline use.")
 
-    def detect_and_analyze_persons(self, image_input: Any) -> List[Dict[str, Any]]:
+    GENDERS = ("Male", "Female")
+    AGE_GROUPS = {"10s": 0.1, "20s": 0.2, "30s": 0.3, "40s": 0.4, "50s": 0.5, "60s": 0.6, "70s+": 0.7}
+    EXAMPLE_BOX = [150, 200, 400, 300]   # Echoed example boxes are dropped when parsing
+    PERSON_INSTRUCTION = (
+        "Analyze the image and detect every single person.\n"
+        "Return the results in exactly this format for each person:\n"
+        "[ymin, xmin, ymax, xmax] Gender, AgeGroup\n"
+        f"Example output: {EXAMPLE_BOX} Male, 20s\n"
+        "Focus: Ensure every person is caught. No talking. Just the list."
+    )
+    # Constrained decoding: only '[ymin, xmin, ymax, xmax] Gender, AgeGroup' lines, end of list at a line boundary
+    PERSON_GRAMMAR = person_line_grammar(GENDERS, AGE_GROUPS)
+    # Chat template with the fixed instruction *before* the image: everything up to the image
+    # is identical across calls, so its key/value cache is computed once and reused
+    CHAT_PREFIX = "<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\n"
+    IMAGE_SUFFIX = "<|vision_start|><|image_pad|><|vision_end|><|im_end|>\n<|im_start|>assistant\n"
+    PREFIX_CACHE_SIZE = 8        # Distinct instructions whose prefix KV cache is kept (LRU)
+    MAX_SIDE = 1200
+    # Optimized pixel limitations (Multiple of 28 is best for Qwen2-VL)
+    MIN_PIXELS = 224 * 224
+    MAX_PIXELS = 1024 * 1024
+    PATCH_PIXELS = 28 * 28       # One visual token per 28x28 patch after merging
+    MAX_NEW_TOKENS = 256
+    REPETITION_PENALTY = 1.2
+
+    def _load_image(self, image_input: Any) -> Image.Image:
+        """Loads a path / BGR frame as RGB and scales it to fit model limits efficiently."""
+        image = Image.open(image_input).convert("RGB") if isinstance(image_input, str) else Image.fromarray(cv2.cvtColor(image_input, cv2.COLOR_BGR2RGB))
+        if max(image.size) > self.MAX_SIDE:
+            scale = self.MAX_SIDE / max(image.size)
+            new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
+            image = image.resize(new_size, Image.LANCZOS)
+            logger.info(f"📏 Image resized to {new_size} for model stability.")
+        return image
+
+    def _estimate_tokens(self, image: Image.Image) -> int:
+        """Prompt + visual tokens of one image (pixels clamped to [MIN_PIXELS, MAX_PIXELS])."""
+        pixels = min(max(image.size[0] * image.size[1], self.MIN_PIXELS), self.MAX_PIXELS)
+        return pixels // self.PATCH_PIXELS + 64
+
+    def _plan_batches(self, token_counts: List[int]) -> List[List[int]]:
         """
-        Detects all persons in the image and analyzes their gender and age group.
-        Returns a list of dictionaries containing 'bbox', 'gender', and 'age'.
+        Groups image indices into generate() batches of at most `max_batch_size` images whose
+        padded cost (batch size x (longest input + new tokens)) stays within `max_batch_tokens`.
+        Images are sorted by size first so each batch pads as little as possible.
         """
-        if not self.model or not self.processor:
-            return []
+        batches, current, longest = [], [], 0
+        for i in sorted(range(len(token_counts)), key=lambda i: token_counts[i]):
+            longest_if_added = max(longest, token_counts[i])
+            cost = (len(current) + 1) * (longest_if_added + self.MAX_NEW_TOKENS)
+            if current and (len(current) >= self.max_batch_size or cost > self.max_batch_tokens):
+                batches.append(current)
+                current, longest_if_added = [], token_counts[i]
+            current.append(i)
+            longest = longest_if_added
+        if current:
+            batches.append(current)
+        return batches
 
+    def _tokenize(self, texts: List[str], images: List[Image.Image]):
+        """Processor call with left padding (decoder-only batching: prompts end where generation starts)."""
+        tokenizer = self.processor.tokenizer
+        padding_side = tokenizer.padding_side
+        tokenizer.padding_side = "left"
         try:
-            # 1. Load image and ensure resolution is optimized for Qwen-VL
-            image = Image.open(image_input).convert("RGB") if isinstance(image_input, str) else Image.fromarray(cv2.cvtColor(image_input, cv2.COLOR_BGR2RGB))
-            
-            # 2. Prepare Prompt (Strict High-Precision Detection)
-            prompt = (
-                "<|image_pad|>Analyze the image and detect every single person.\n"
-                "Return the results in exactly this format for each person:\n"
-                "[ymin, xmin, ymax, xmax] Gender, AgeGroup\n"
-                "Example output: [150, 200, 400, 300] Male, 20s\n"
-                "Focus: Ensure every person is caught. No talking. Just the list."
-            )
-
-            # Performance optimization: Scale resolution to fit model limits efficiently
-            min_pixels = 256 * 28 * 28
-            max_pixels = 1280 * 28 * 28
-            
-            logger.info("📡 Analyzing image with Qwen-VL (Inference starting...)")
-            max_side = 1200
-            if max(image.size) > max_side:
-                scale = max_side / max(image.size)
-                new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
-                image = image.resize(new_size, Image.LANCZOS)
-                logger.info(f"📏 Image resized to {new_size} for model stability.")
-
-            # Optimized pixel limitations (Multiple of 28 is best for Qwen2-VL)
-            min_pixels = 224 * 224
-            max_pixels = 1024 * 1024
-            
-            inputs = self.processor(
-                text=[prompt], 
-                images=[image], 
+            return self.processor(
+                text=texts,
+                images=images,
                 padding=True,
                 return_tensors="pt",
-                min_pixels=min_pixels,
-                max_pixels=max_pixels
+                min_pixels=self.MIN_PIXELS,
+                max_pixels=self.MAX_PIXELS
             ).to(self.device)
-            
-            logger.info(f"🚀 Starting token generation (Ready with input shape constraint)...")
-            with torch.no_grad():
-                generated_ids = self.model.generate(
-                    **inputs, 
-                    max_new_tokens=256,
-                    repetition_penalty=1.2,
-                    temperature=0.1,
-                    top_p=0.9
-                )
-            
-            res_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        finally:
+            tokenizer.padding_side = padding_side
+
+    def _last_logits_only(self) -> Dict[str, int]:
+        """Forward kwarg limiting logits to the last position (name depends on the transformers version)."""
+        params = inspect.signature(self.model.forward).parameters
+        for name in ("logits_to_keep", "num_logits_to_keep"):
+            if name in params:
+                return {name: 1}
+        return {}
+
+    def _prefix_cache(self, prefix: str):
+        """(prefix token ids, KV cache) of the static prompt prefix, computed once per instruction."""
+        entry = self._prefix_caches.get(prefix)
+        if entry is not None:
+            self._prefix_caches.move_to_end(prefix)
+            return entry
+        ids = self.processor.tokenizer(prefix, return_tensors="pt", add_special_tokens=False)["input_ids"].to(self.device)
+        with torch.no_grad():
+            out = self.model(input_ids=ids, use_cache=True, **self._last_logits_only())
+        entry = (ids, out.past_key_values)
+        self._prefix_caches[prefix] = entry
+        if len(self._prefix_caches) > self.PREFIX_CACHE_SIZE:
+            self._prefix_caches.popitem(last=False)
+        logger.info(f"🧠 Cached KV for a {ids.shape[1]}-token prompt prefix")
+        return entry
+
+    def _grammar_vocabulary(self, grammar: LineGrammar) -> GrammarVocabulary:
+        """Per-grammar token filter over the decoded vocabulary (built once)."""
+        vocabulary = self._grammar_vocabularies.get(grammar)
+        if vocabulary is None:
+            tokenizer = self.processor.tokenizer
+            token_texts = tokenizer.batch_decode([[i] for i in range(len(tokenizer))])
+            vocabulary = self._grammar_vocabularies[grammar] = GrammarVocabulary(grammar, token_texts)
+        return vocabulary
+
+    def _grammar_processor(self, grammar: Optional[LineGrammar], prompt_len: int, batch: int,
+                           on_record: Optional[RecordCallback]):
+        if grammar is None:
+            return None
+        return _GrammarLogitsProcessor(self, grammar, prompt_len, batch, on_record)
+
+    def _generate(self, images: List[Image.Image], instruction: str, grammar: Optional[LineGrammar] = None,
+                  on_record: Optional[RecordCallback] = None) -> List[str]:
+        """
+        One padded batch for all images; returns the generated text per image.
+        With a `grammar`, decoding is masked to it and `on_record(row, record)` receives each completed line.
+        """
+        prefix = self.CHAT_PREFIX + instruction + "\n"
+        if self.reuse_prefix_cache:
+            emitted = []
+            def tracked_record(row: int, record: Dict[str, str]) -> bool:
+                emitted.append(row)
+                return on_record(row, record)
+            try:
+                return self._generate_with_prefix_cache(images, prefix, grammar, tracked_record if on_record else None)
+            except (TypeError, AttributeError) as e:
+                # The installed transformers has a different Qwen2.5-VL forward / get_rope_index / cache API:
+                # the prefix path cannot work in this process
+                logger.warning(f"⚠️ Prefix KV-cache reuse unsupported ({e}); using full prefill from now on.")
+                self.reuse_prefix_cache = False
+                if emitted:
+                    raise
+            except torch.cuda.OutOfMemoryError as e:
+                # Out of memory on a large batch: full prefill for this batch only. Other errors propagate.
+                if emitted:
+                    raise   # A retry would report the already delivered records a second time
+                torch.cuda.empty_cache()
+                logger.warning(f"⚠️ Prefix KV-cache reuse ran out of memory for this batch ({e}); falling back to full prefill.")
+
+        inputs = self._tokenize([prefix + self.IMAGE_SUFFIX] * len(images), images)
+        logger.info(f"🚀 Starting token generation (batch of {len(images)}, input shape {tuple(inputs['input_ids'].shape)})...")
+        grammar_processor = self._grammar_processor(grammar, inputs["input_ids"].shape[1], len(images), on_record)
+        with torch.no_grad():
+            generated_ids = self.model.generate(
+                **inputs, 
+                max_new_tokens=self.MAX_NEW_TOKENS,
+                # Grammar-constrained lines repeat digits by design; looping is cut by the grammar processor instead
+                repetition_penalty=1.0 if grammar_processor else self.REPETITION_PENALTY,
+                temperature=0.1,
+                top_p=0.9,
+                logits_processor=[grammar_processor] if grammar_processor else None
+            )
+        # Decode only the new tokens of every row
+        new_tokens = generated_ids[:, inputs["input_ids"].shape[1]:]
+        return self.processor.batch_decode(new_tokens, skip_special_tokens=True)
+
+    def _generate_with_prefix_cache(self, images: List[Image.Image], prefix: str, grammar: Optional[LineGrammar] = None,
+                                    on_record: Optional[RecordCallback] = None) -> List[str]:
+        """
+        Prefills only the image + variable tokens on top of a copy of the cached prefix.
+        model.generate cannot be used for this step: with a non-empty cache it drops the
+        pixel values and derives M-RoPE positions from the (uncached) tokens only, so the
+        suffix prefill runs as one forward with explicit positions, followed by greedy decoding.
+        """
+        prefix_ids, prefix_cache = self._prefix_cache(prefix)
+        inputs = self._tokenize([self.IMAGE_SUFFIX] * len(images), images)
+        batch, prefix_len = len(images), prefix_ids.shape[1]
+
+        # Full sequences: shared prefix + left-padded suffix (padding sits between them, masked out)
+        input_ids = torch.cat([prefix_ids.expand(batch, -1), inputs["input_ids"]], dim=1)
+        attention_mask = torch.cat([inputs["attention_mask"].new_ones((batch, prefix_len)), inputs["attention_mask"]], dim=1)
+        get_rope_index = getattr(self.model, "get_rope_index", None) or self.model.model.get_rope_index
+        position_ids, rope_deltas = get_rope_index(input_ids, image_grid_thw=inputs["image_grid_thw"], attention_mask=attention_mask)
+
+        cache = copy.deepcopy(prefix_cache)
+        if batch > 1:
+            cache.batch_repeat_interleave(batch)
+        total_len = input_ids.shape[1]
+        logger.info(f"🚀 Starting token generation (batch of {batch}, {prefix_len} cached + {total_len - prefix_len} new prompt tokens)...")
+        with torch.no_grad():
+            out = self.model(
+                input_ids=input_ids[:, prefix_len:],
+                attention_mask=attention_mask,
+                position_ids=position_ids[:, :, prefix_len:],
+                past_key_values=cache,
+                pixel_values=inputs["pixel_values"],
+                image_grid_thw=inputs["image_grid_thw"],
+                cache_position=torch.arange(prefix_len, total_len, device=self.device),
+                use_cache=True,
+                **self._last_logits_only()
+            )
+            grammar_processor = self._grammar_processor(grammar, total_len, batch, on_record)
+            new_tokens = self._decode(out.logits[:, -1, :], input_ids, attention_mask, rope_deltas, cache, grammar_processor)
+        return self.processor.batch_decode(new_tokens, skip_special_tokens=True)
+
+    def _decode(self, logits: torch.Tensor, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+                rope_deltas: torch.Tensor, cache, grammar_processor=None) -> torch.Tensor:
+        """
+        Greedy decoding on a prefilled cache; returns (batch, new tokens).
+        Logits are masked by `grammar_processor` when given, otherwise penalized for repetition.
+        """
+        eos = self.model.generation_config.eos_token_id
+        eos = torch.tensor(eos if isinstance(eos, (list, tuple)) else [eos], device=self.device)
+        pad_id = self.processor.tokenizer.pad_token_id
+        batch, length = input_ids.shape
+        seen, tokens = input_ids, []
+        finished = torch.zeros(batch, dtype=torch.bool, device=self.device)
+        for step in range(self.MAX_NEW_TOKENS):
+            if grammar_processor is not None:
+                logits = grammar_processor(seen, logits)
+            else:
+                score = torch.gather(logits, 1, seen)
+                score = torch.where(score < 0, score * self.REPETITION_PENALTY, score / self.REPETITION_PENALTY)
+                logits = logits.scatter(1, seen, score)
+            next_tokens = logits.argmax(dim=-1)
+            next_tokens = torch.where(finished, torch.full_like(next_tokens, pad_id), next_tokens)
+            tokens.append(next_tokens)
+            finished |= torch.isin(next_tokens, eos)
+            if finished.all():
+                break
+            seen = torch.cat([seen, next_tokens[:, None]], dim=1)
+            attention_mask = torch.cat([attention_mask, attention_mask.new_ones((batch, 1))], dim=1)
+            position = length + step
+            # Text tokens after the prompt: position = cache position + per-row M-RoPE delta (same on all 3 axes)
+            position_ids = (rope_deltas.view(batch, 1) + position).view(1, batch, 1).expand(3, -1, -1)
+            logits = self.model(
+                input_ids=next_tokens[:, None],
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=cache,
+                cache_position=torch.tensor([position], device=self.device),
+                use_cache=True
+            ).logits[:, -1, :]
+        return torch.stack(tokens, dim=1)
+
+    def generate_texts(self, image_inputs: List[Any], instruction: str, grammar: Optional[LineGrammar] = None,
+                       on_record: Optional[RecordCallback] = None) -> List[Optional[str]]:
+        """
+        Runs one instruction over many images (paths or BGR frames) in as few batches as the
+        limits (`max_batch_size`, `max_batch_tokens`) allow, reusing the instruction's prefix KV cache.
+        With a `grammar`, output is constrained to it and `on_record(image_index, record)` is called
+        for every line as soon as it is generated (returning True stops generating for that image).
+        Returns the generated text per image, in input order (None for images that failed).
+        """
+        texts: List[Optional[str]] = [None] * len(image_inputs)
+        if not self.model or not self.processor or not image_inputs:
+            return texts
+
+        images: Dict[int, Image.Image] = {}
+        for i, image_input in enumerate(image_inputs):
+            try:
+                images[i] = self._load_image(image_input)
+            except Exception as e:
+                logger.error(f"❌ Failed to load image #{i}: {e}")
+
+        indices = list(images)
+        for batch in self._plan_batches([self._estimate_tokens(images[i]) for i in indices]):
+            batch = [indices[j] for j in batch]
+            try:
+                logger.info(f"📡 Analyzing {len(batch)} image(s) with Qwen-VL (Inference starting...)")
+                row_callback = None
+                if on_record is not None:
+                    row_callback = lambda row, record, batch=batch: on_record(batch[row], record)
+                for i, res_text in zip(batch, self._generate([images[i] for i in batch], instruction, grammar, row_callback)):
+                    texts[i] = res_text
+            except Exception as e:
+                logger.error(f"❌ Error during Qwen-VL generation: {e}")
+        return texts
+
+    REVISION_FILES = ("config.json", "generation_config.json", "model.safetensors.index.json")
+
+    @classmethod
+    def _local_revision(cls, path: str) -> str:
+        """
+        Fingerprint of a local weights directory (no commit hash there): name, size and mtime of
+        the config / index files and of every .safetensors shard, so replaced weights miss the cache.
+        """
+        digest = hashlib.sha256()
+        names = sorted(name for name in os.listdir(path) if name.endswith(".safetensors"))
+        for name in list(cls.REVISION_FILES) + names:
+            try:
+                stat = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        return f"{os.path.abspath(path)}@local-{digest.hexdigest()[:16]}"
+
+    def _model_revision(self) -> str:
+        if self._revision is not None:
+            return self._revision
+        config = getattr(self.model, "config", None)
+        return f"{getattr(config, '_name_or_path', self.model_path)}@{getattr(config, '_commit_hash', None)}"
+
+    def _result_key(self, image_input: Any, task: str, prompt: str, **params) -> Optional[str]:
+        """Result cache key (None when caching is off or the image cannot be read)."""
+        if self.result_cache is None or not self.model:
+            return None
+        try:
+            digest = self.result_cache.image_digest(image_input)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"⚠️ Result cache skipped (unreadable image: {e})")
+            return None
+        return self.result_cache.make_key(digest, task=task, prompt=prompt, revision=self._model_revision(),
+                                          max_new_tokens=self.MAX_NEW_TOKENS, **params)
+
+    def _person_key(self, image_input: Any) -> Optional[str]:
+        return self._result_key(image_input, "persons", self.PERSON_INSTRUCTION,
+                                constrained=self.constrained_decoding, repetition_penalty=self.REPETITION_PENALTY,
+                                max_side=self.MAX_SIDE, min_pixels=self.MIN_PIXELS, max_pixels=self.MAX_PIXELS)
+
+    def detect_and_analyze_persons(self, image_input: Any) -> List[Dict[str, Any]]:
+        """
+        Detects all persons in the image and analyzes their gender and age group.
+        Returns a list of dictionaries containing 'bbox', 'gender', and 'age'.
+        """
+        return self.detect_and_analyze_persons_batch([image_input])[0]
+
+    def detect_and_analyze_persons_batch(self, image_inputs: List[Any],
+                                         on_record: Optional[RecordCallback] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Batched detect_and_analyze_persons: images (paths or BGR frames, e.g. keyframes from
+        several cameras) are padded through as few generation batches as the limits allow.
+        With constrained decoding, `on_record(image_index, record)` receives each raw person record
+        ({"ymin", "xmin", "ymax", "xmax", "gender", "age"} strings) while generation is still running;
+        returning True from it ends that image's list.
+        Returns one result list per image, in input order ([] for images that failed).
+        """
+        keys = [self._person_key(image_input) for image_input in image_inputs]
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(image_inputs)
+        for i, key in enumerate(keys):
+            if key is not None:
+                results[i] = self.result_cache.get(key)
+            if results[i] is None:
+                continue
+            logger.info(f"⚡ Person analysis of image #{i} served from the result cache")
+            if on_record is not None:
+                for person in results[i]:
+                    record = [*map(str, person["bbox"]), person["gender"], person["age"]]
+                    if on_record(i, dict(zip(self.PERSON_GRAMMAR.fields, record))):
+                        break
+
+        misses = [i for i, cached in enumerate(results) if cached is None]
+        grammar = self.PERSON_GRAMMAR if self.constrained_decoding else None
+        row_callback, truncated = None, set()
+        if on_record is not None:
+            def row_callback(j: int, record: Dict[str, str]) -> bool:
+                stop = on_record(misses[j], record)
+                if stop:
+                    truncated.add(misses[j])
+                return stop
+        texts = self.generate_texts([image_inputs[i] for i in misses], self.PERSON_INSTRUCTION, grammar, row_callback)
+        for i, res_text in zip(misses, texts):
+            if res_text is None:
+                results[i] = []
+                continue
             logger.info(f"--- [Qwen-VL Raw Output Content] ---\n{res_text}\n-----------------------------------")
+            results[i] = self._parse_persons(res_text)
+            if keys[i] is not None and i not in truncated:
+                self.result_cache.put(keys[i], results[i])
+        return results
 
-            # Regex for parsing bounding boxes: [ymin, xmin, ymax, xmax] or (ymin, xmin, ymax, xmax)
-            results = []
-            
-            # Enhanced Regex for parsing bounding boxes and attributes
-            # Matches: [ymin, xmin, ymax, xmax] Gender, Age
-            # Also handles variations with/without comma and parentheses
-            pattern = re.compile(r"[\[\(](\d+),\s*(\d+),\s*(\d+),\s*(\d+)[\]\)]\s*(\w+)[,\s]*(\d+s)")
-            matches = pattern.findall(res_text)
-
-            if not matches:
-                # Fallback: Try just finding boxes first
-                logger.warning("⚠️ No structured attribute matches found. Falling back to box-only search.")
-                box_matches = re.findall(r"[\[\(](\d+),\s*(\d+),\s*(\d+),\s*(\d+)[\]\)]", res_text)
-                if not box_matches:
-                    logger.warning("❌ Totally no bounding boxes found in model output.")
-                    return []
-                # If only boxes found, assign default attributes
-                for box in box_matches:
-                    matches.append((*box, "Unknown", "Unknown"))
-
-            for i, match in enumerate(matches):
-                ymin, xmin, ymax, xmax, gender, age = match
-                ymin, xmin, ymax, xmax = int(ymin), int(xmin), int(ymax), int(xmax)
-
-                # Skip if it's the example from the prompt
-                if [ymin, xmin, ymax, xmax] == [120, 250, 480, 510]:
-                    continue
-
-                # [NEW] Distance and Location Estimation
-                distance = self.estimate_distance([ymin, xmin, ymax, xmax])
-                location = self.calculate_location([ymin, xmin, ymax, xmax], distance)
-                
-                # [NEW] Vectorize attributes for downstream analysis
-                feature_vector = self.vectorize_attributes(i + 1, gender, age, [ymin, xmin, ymax, xmax])
-
-                results.append({
-                    "id": len(results) + 1,
-                    "bbox": [ymin, xmin, ymax, xmax],
-                    "gender": gender,
-                    "age": age,
-                    "distance": round(float(distance), 2),
-                    "location": location,
-                    "feature_vector": feature_vector.tolist() if isinstance(feature_vector, np.ndarray) else feature_vector,
-                    "raw_info": f"{gender}, {age}"
-                })
-
-            return results
+    def stream_persons(self, image_input: Any, max_detections: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming detect_and_analyze_persons: yields each person as soon as its line is decoded,
+        while generation continues in a background thread. Generation stops early once
+        `max_detections` persons were found, when the model starts repeating boxes, or when
+        the caller stops iterating.
+        """
+        key = self._person_key(image_input)
+        cached = self.result_cache.get(key) if key is not None else None
+        if cached is not None or not self.constrained_decoding:
+            # Cache hit, or free-form output that cannot be parsed line by line reliably: parse once at the end
+            yield from (cached if cached is not None else self.detect_and_analyze_persons(image_input))[:max_detections]
+            return
 
-        except Exception as e:
-            logger.error(f"❌ Error during comprehensive person analysis: {e}")
-            return []
+        persons: "queue.Queue" = queue.Queue()
+        finished = object()
+        stop = threading.Event()
+        count = 0
+        streamed: List[Dict[str, Any]] = []
+        completed = []
+
+        def on_record(_, record: Dict[str, str]) -> bool:
+            # Runs on the decoding thread, right after the line is generated
+            nonlocal count
+            person = self._person_result(count + 1, *(record[f] for f in self.PERSON_GRAMMAR.fields))
+            if person is not None:
+                count += 1
+                streamed.append(copy.deepcopy(person))
+                persons.put(person)
+                if max_detections is not None and count >= max_detections:
+                    stop.set()
+            return stop.is_set()
+
+        def run():
+            try:
+                texts = self.generate_texts([image_input], self.PERSON_INSTRUCTION, self.PERSON_GRAMMAR, on_record)
+                completed.append(texts[0] is not None)
+            finally:
+                persons.put(finished)
+
+        threading.Thread(target=run, name="QwenVLStream", daemon=True).start()
+        try:
+            while True:
+                person = persons.get()
+                if person is finished:
+                    break
+                yield person
+            # Only complete lists are cached (not ones cut short by max_detections or the caller)
+            if key is not None and completed == [True] and not stop.is_set():
+                self.result_cache.put(key, streamed)
+        finally:
+            # Also reached when the caller stops iterating: the decoder ends at its next completed line
+            stop.set()
+
+    def _parse_persons(self, res_text: str) -> List[Dict[str, Any]]:
+        """Parses '[ymin, xmin, ymax, xmax] Gender, AgeGroup' lines into result dictionaries."""
+        # Regex for parsing bounding boxes: [ymin, xmin, ymax, xmax] or (ymin, xmin, ymax, xmax)
+        results = []
+        
+        # Enhanced Regex for parsing bounding boxes and attributes
+        # Matches: [ymin, xmin, ymax, xmax] Gender, Age
+        # Also handles variations with/without comma and parentheses
+        pattern = re.compile(r"[\[\(](\d+),\s*(\d+),\s*(\d+),\s*(\d+)[\]\)]\s*(\w+)[,\s]*(\d+s\+?)")
+        matches = pattern.findall(res_text)
+
+        if not matches:
+            # Fallback: Try just finding boxes first
+            logger.warning("⚠️ No structured attribute matches found. Falling back to box-only search.")
+            box_matches = re.findall(r"[\[\(](\d+),\s*(\d+),\s*(\d+),\s*(\d+)[\]\)]", res_text)
+            if not box_matches:
+                logger.warning("❌ Totally no bounding boxes found in model output.")
+                return []
+            # If only boxes found, assign default attributes
+            for box in box_matches:
+                matches.append((*box, "Unknown", "Unknown"))
+
+        for match in matches:
+            person = self._person_result(len(results) + 1, *match)
+            if person is not None:
+                results.append(person)
+
+        return results
+
+    def _person_result(self, person_id: int, ymin, xmin, ymax, xmax, gender: str, age: str) -> Optional[Dict[str, Any]]:
+        """Result dictionary of one parsed person line (None for degenerate boxes and echoed examples)."""
+        ymin, xmin, ymax, xmax = (min(int(v), 1000) for v in (ymin, xmin, ymax, xmax))
+
+        # Skip degenerate boxes and echoes of the example from the prompt
+        if ymax <= ymin or xmax <= xmin or [ymin, xmin, ymax, xmax] == self.EXAMPLE_BOX:
+            return None
+
+        # [NEW] Distance and Location Estimation
+        distance = self.estimate_distance([ymin, xmin, ymax, xmax])
+        location = self.calculate_location([ymin, xmin, ymax, xmax], distance)
+
+        # [NEW] Vectorize attributes for downstream analysis
+        feature_vector = self.vectorize_attributes(person_id, gender, age, [ymin, xmin, ymax, xmax])
+
+        return {
+            "id": person_id,
+            "bbox": [ymin, xmin, ymax, xmax],
+            "gender": gender,
+            "age": age,
+            "distance": round(float(distance), 2),
+            "location": location,
+            "feature_vector": feature_vector.tolist() if isinstance(feature_vector, np.ndarray) else feature_vector,
+            "raw_info": f"{gender}, {age}"
+        }
 
     def vectorize_attributes(self, obj_id: int, gender: str, age: str, bbox: List[int]) -> np.ndarray:
         """
@@ -207,8 +612,7 @@ class QwenVLProcessor:
         gender_bit = 1.0 if gender == "Male" else -1.0 if gender == "Female" else 0.0
         
         # Age Mapping
-        age_map = {"10s": 0.1, "20s": 0.2, "30s": 0.3, "40s": 0.4, "50s": 0.5, "60s": 0.6, "70s+": 0.7}
-        age_val = age_map.get(age, 0.0)
+        age_val = self.AGE_GROUPS.get(age, 0.0)
         
         # BBox Normalization (Assuming 1000-scale coordinates from Qwen-VL)
         ymin, xmin, ymax, xmax = bbox
@@ -256,6 +660,12 @@ class QwenVLProcessor:
         if not self.model or not self.processor:
             return "Error: Model not initialized."
 
+        key = self._result_key(image_input, "objects", prompt)
+        cached = self.result_cache.get(key) if key is not None else None
+        if cached is not None:
+            logger.info("⚡ [detect_objects] Served from the result cache")
+            return cached
+
         try:
             image = Image.open(image_input).convert("RGB") if isinstance(image_input, str) else Image.fromarray(cv2.cvtColor(image_input, cv2.COLOR_BGR2RGB))
             
@@ -272,6 +682,8 @@ class QwenVLProcessor:
             
             res_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
             logger.info(f"🔍 [detect_objects] Output: {res_text[:100]}...")
+            if key is not None:
+                self.result_cache.put(key, res_text)
             return res_text
 
         except Exception as e:
@@ -284,6 +696,71 @@ class QwenVLProcessor:
 
 import datetime
 
+class _GrammarLogitsProcessor:
+    """
+    Masks next-token logits to what a LineGrammar accepts; usable as a transformers
+    logits processor and by QwenVLProcessor._decode.
+
+    Per row it tracks the grammar state of the generated tokens, allows the end-of-sequence
+    token only at a line boundary (end of list), forces it once the model repeats a record
+    (see StreamingRecordParser) and reports every completed line to `on_record(row, record)`,
+    forcing it as well when the callback returns True.
+    """
+    def __init__(self, owner: "QwenVLProcessor", grammar: LineGrammar, prompt_len: int, batch: int,
+                 on_record: Optional[RecordCallback] = None):
+        self.owner = owner
+        self.grammar = grammar
+        self.vocabulary = owner._grammar_vocabulary(grammar)
+        self.prompt_len = prompt_len
+        self.on_record = on_record
+        eos = owner.model.generation_config.eos_token_id
+        self.eos_ids = list(eos) if isinstance(eos, (list, tuple)) else [eos]
+        self.states = [grammar.start] * batch
+        self.parsers = [StreamingRecordParser(grammar) for _ in range(batch)]
+        self.done = [False] * batch
+        self.consumed = 0
+
+    def _mask(self, state, size: int, device) -> torch.Tensor:
+        """Bool (vocab,) mask of allowed tokens from `state`, cached on the owner."""
+        key = (self.grammar, state, size)
+        mask = self.owner._grammar_masks.get(key)
+        if mask is None:
+            mask = torch.zeros(size, dtype=torch.bool, device=device)
+            ids = torch.as_tensor(self.vocabulary.allowed(state), device=device)
+            mask[ids[ids < size]] = True
+            if self.grammar.at_line_start(state):
+                mask[[i for i in self.eos_ids if i < size]] = True
+            self.owner._grammar_masks[key] = mask
+        return mask
+
+    def _advance(self, row: int, token: int):
+        if self.done[row]:
+            return
+        if token in self.eos_ids or token >= len(self.vocabulary):
+            self.done[row] = True
+            return
+        text = self.vocabulary.token_texts[token]
+        self.states[row] = self.grammar.advance(self.states[row], text)
+        for record in self.parsers[row].feed(text):
+            if self.on_record is not None and self.on_record(row, record):
+                self.done[row] = True   # Caller has enough (e.g. detection cap reached)
+        if self.states[row] is None or self.parsers[row].repeated:
+            self.done[row] = True
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor) -> torch.Tensor:
+        new_tokens = input_ids[:, self.prompt_len + self.consumed:].tolist()
+        for row, tokens in enumerate(new_tokens):
+            for token in tokens:
+                self._advance(row, token)
+        self.consumed += len(new_tokens[0]) if new_tokens else 0
+
+        size = scores.shape[-1]
+        eos_only = torch.zeros(size, dtype=torch.bool, device=scores.device)
+        eos_only[[i for i in self.eos_ids if i < size]] = True
+        masks = torch.stack([eos_only if self.done[row] else self._mask(self.states[row], size, scores.device)
+                             for row in range(len(self.states))])
+        return scores.masked_fill(~masks, float("-inf"))
+
 def generate_markdown_report(results, output_path):
     """Generates a markdown report (detect_person_list.md)."""
     headers = ["ID", "Gender", "Age Group", "Distance (m)", "Coordinates", "Vector (Gender, Age, BBox...)","Raw Output"]
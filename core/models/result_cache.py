@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+# Opt-in for scripts that build QwenVLProcessor themselves: QWEN_RESULT_CACHE_DIR=cache/qwen_vl
+RESULT_CACHE_ENV = "QWEN_RESULT_CACHE_DIR"
+
+class InferenceResultCache:
+    """
+    Content-addressed cache of model results (JSON-serializable values).
+
+    Keys are SHA-256 digests of the image content (file bytes for paths, shape/dtype/pixels
+    for frames) together with the prompt, generation parameters and model revision, so a
+    changed image, prompt or model never hits a stale entry.
+
+    Two tiers:
+    - memory: LRU of up to `max_memory_entries` results
+    - disk (optional, `cache_dir`): one JSON file per key, evicted least-recently-used
+      (file mtime, refreshed on hit) once the directory exceeds `max_disk_bytes`
+    """
+    SUFFIX = ".json"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_entries: int = 256,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    @staticmethod
+    def image_digest(image_input: Any) -> str:
+        """SHA-256 of an image path's file bytes or of a frame's pixels."""
+        digest = hashlib.sha256()
+        if isinstance(image_input, str):
+            with open(image_input, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        else:
+            frame = np.ascontiguousarray(image_input)
+            digest.update(f"{frame.shape}{frame.dtype}".encode())
+            digest.update(frame.data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(image_digest: str, **parts) -> str:
+        """Cache key of an image digest plus prompt / parameters / model revision."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(f"{image_digest}\n{payload}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def _disk_entries(self):
+        """(path, size, mtime) of every cached file."""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value or None (memory first, then disk; a disk hit is promoted to memory)."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(self._memory[key])
+            if self.cache_dir:
+                path = self._path(key)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        raw = f.read()
+                    json.loads(raw)
+                    os.utime(path)  # Mark as recently used for eviction
+                except (FileNotFoundError, ValueError):
+                    raw = None
+                if raw is not None:
+                    self._remember(key, raw)
+                    self.hits += 1
+                    return json.loads(raw)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        # Stored serialized: callers get independent copies and memory/disk hold the same form
+        raw = json.dumps(value)
+        with self._lock:
+            self._remember(key, raw)
+            if not self.cache_dir:
+                return
+            path = self._path(key)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(raw)
+            os.replace(tmp, path)
+            self._disk_bytes += os.path.getsize(path) - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Removes least-recently-used files until the directory is back under max_disk_bytes."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_bytes -= size
+            self._memory.pop(os.path.basename(path)[:-len(self.SUFFIX)], None)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir:
+                for path, _, _ in list(self._disk_entries()):
+                    os.remove(path)
+            self._disk_bytes = 0
@@ -0,0 +1,168 @@
+import re
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+
+class LineGrammar:
+    """
+    Character-level automaton for line-oriented model output, used to constrain decoding.
+
+    A line is a sequence of segments:
+    - literal(text): fixed characters; spaces inside a literal are optional
+    - number(max_digits): 1..max_digits decimal digits
+    - choice(options): exactly one of the given words
+    Lines repeat; the state after a complete line is `start` again, the only state in
+    which the list may end (end-of-list token).
+
+    States are small hashable tuples (segment index, position), so per-state token masks
+    can be cached (see GrammarVocabulary). `pattern` is the equivalent strict regex of one
+    line, capturing the number / choice segments as `fields`; records with equal `key_fields`
+    (default: all fields) are repeats.
+    """
+    LITERAL, NUMBER, CHOICE = "literal", "number", "choice"
+
+    def __init__(self, segments: Sequence[Tuple[str, object]], fields: Sequence[str] = (),
+                 key_fields: Sequence[str] = ()):
+        self.segments = list(segments)
+        self.start = self._initial(0)
+        self.pattern = re.compile("".join(self._regex(kind, arg) for kind, arg in self.segments))
+        self.fields = tuple(fields) or tuple(f"field_{i}" for i in range(self.pattern.groups))
+        self.key_fields = tuple(key_fields) or self.fields
+        self.charset = set()
+        for kind, arg in self.segments:
+            if kind == self.NUMBER:
+                self.charset.update("0123456789")
+            elif kind == self.CHOICE:
+                self.charset.update("".join(arg))
+            else:
+                self.charset.update(arg)
+
+    @staticmethod
+    def _regex(kind: str, arg) -> str:
+        if kind == LineGrammar.NUMBER:
+            return rf"(\d{{1,{arg}}})"
+        if kind == LineGrammar.CHOICE:
+            return "(" + "|".join(re.escape(o) for o in sorted(arg, key=len, reverse=True)) + ")"
+        return "".join(" ?" if ch == " " else re.escape(ch) for ch in arg if ch != "\n")
+
+    @classmethod
+    def literal(cls, text: str) -> Tuple[str, str]:
+        return (cls.LITERAL, text)
+
+    @classmethod
+    def number(cls, max_digits: int = 4) -> Tuple[str, int]:
+        return (cls.NUMBER, max_digits)
+
+    @classmethod
+    def choice(cls, options: Sequence[str]) -> Tuple[str, Tuple[str, ...]]:
+        return (cls.CHOICE, tuple(options))
+
+    def _initial(self, seg: int):
+        return (seg, "" if self.segments[seg][0] == self.CHOICE else 0)
+
+    def _next(self, seg: int):
+        return self._initial((seg + 1) % len(self.segments))
+
+    def step(self, state, ch: str):
+        """State after one character, or None if the character is not allowed."""
+        seg, pos = state
+        while True:
+            kind, arg = self.segments[seg]
+            if kind == self.LITERAL:
+                if ch == arg[pos]:
+                    return self._next(seg) if pos + 1 == len(arg) else (seg, pos + 1)
+                if arg[pos] != " ":
+                    return None
+                # Skip an optional space
+                if pos + 1 == len(arg):
+                    seg, pos = self._next(seg)
+                else:
+                    pos += 1
+            elif kind == self.NUMBER:
+                if ch.isdigit() and pos < arg:
+                    return (seg, pos + 1)
+                if pos == 0:
+                    return None
+                seg, pos = self._next(seg)
+            else:
+                prefix = pos + ch
+                if any(option.startswith(prefix) for option in arg):
+                    return (seg, prefix)
+                if pos not in arg:
+                    return None
+                seg, pos = self._next(seg)
+
+    def advance(self, state, text: str):
+        """State after a whole token's text, or None if any character is not allowed."""
+        for ch in text:
+            state = self.step(state, ch)
+            if state is None:
+                return None
+        return state
+
+    def at_line_start(self, state) -> bool:
+        return state == self.start
+
+class GrammarVocabulary:
+    """
+    Token ids the grammar accepts from each state, computed lazily and cached per state.
+    `token_texts[i]` is the decoded text of token id i; tokens with characters outside the
+    grammar's charset (most of the vocabulary) are excluded up front.
+    """
+    def __init__(self, grammar: LineGrammar, token_texts: Sequence[str]):
+        self.grammar = grammar
+        self.token_texts = list(token_texts)
+        self._candidates = [i for i, text in enumerate(self.token_texts) if text and set(text) <= grammar.charset]
+        self._allowed: Dict[tuple, np.ndarray] = {}
+
+    def allowed(self, state) -> np.ndarray:
+        ids = self._allowed.get(state)
+        if ids is None:
+            ids = np.array([i for i in self._candidates if self.grammar.advance(state, self.token_texts[i]) is not None],
+                           dtype=np.int64)
+            self._allowed[state] = ids
+        return ids
+
+    def __len__(self) -> int:
+        return len(self.token_texts)
+
+class StreamingRecordParser:
+    """
+    Turns generated text into records as soon as each line is complete.
+    A record whose key fields equal an earlier one (e.g. the same box again) marks the list
+    as `repeated` (the model is looping) and is not emitted.
+    """
+    def __init__(self, grammar: LineGrammar):
+        self.pattern = grammar.pattern
+        self.fields = grammar.fields
+        self._key = [grammar.fields.index(f) for f in grammar.key_fields]
+        self.repeated = False
+        self._buffer = ""
+        self._seen = set()
+
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        """Appends generated text; returns the records of the lines it completed."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        records = []
+        for line in lines:
+            match = self.pattern.fullmatch(line.strip())
+            if match is None:
+                continue
+            key = tuple(match.group(i + 1) for i in self._key)
+            if key in self._seen:
+                self.repeated = True
+                continue
+            self._seen.add(key)
+            records.append(dict(zip(self.fields, match.groups())))
+        return records
+
+def person_line_grammar(genders: Sequence[str], age_groups: Sequence[str]) -> LineGrammar:
+    """
+    '[ymin, xmin, ymax, xmax] Gender, AgeGroup' lines; records {"ymin", "xmin", "ymax", "xmax", "gender", "age"},
+    keyed by the box.
+    """
+    g = LineGrammar
+    return LineGrammar([
+        g.literal("["), g.number(), g.literal(", "), g.number(), g.literal(", "), g.number(), g.literal(", "),
+        g.number(), g.literal("] "), g.choice(genders), g.literal(", "), g.choice(age_groups), g.literal("\n"),
+    ], fields=("ymin", "xmin", "ymax", "xmax", "gender", "age"), key_fields=("ymin", "xmin", "ymax", "xmax"))
@@ -0,0 +1,686 @@
+import heapq
+import math
+import os
+import threading
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from core.utils.logger import get_logger
+
+logger = get_logger("ANNIndex")
+
+class GalleryMatrix:
+    """
+    Contiguous (N, D) float32 embedding matrix with an aligned FaceID array.
+    Rows are inserted/updated in place and removed by swapping in the last row,
+    so registration and cleanup never rebuild the whole matrix.
+    """
+    def __init__(self, dim: int = 128, capacity: int = 1024):
+        self.dim = dim
+        self.size = 0
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=object)
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, face_id: str) -> bool:
+        return face_id in self._rows
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """(N, D) view of the stored embeddings."""
+        return self._vectors[:self.size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        """(N,) view of the FaceIDs aligned with `vectors`."""
+        return self._ids[:self.size]
+
+    def _grow(self):
+        capacity = max(1, 2 * len(self._vectors))
+        for name in ("_vectors", "_sq_norms", "_ids"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def upsert(self, face_id: str, embedding: np.ndarray):
+        """Inserts a new identity or overwrites the embedding of an existing one."""
+        row = self._rows.get(face_id)
+        if row is None:
+            if self.size == len(self._vectors):
+                self._grow()
+            row = self.size
+            self._rows[face_id] = row
+            self._ids[row] = face_id
+            self.size += 1
+        vec = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        self._vectors[row] = vec
+        self._sq_norms[row] = vec @ vec
+
+    def remove(self, face_id: str) -> bool:
+        """Removes an identity; the last row is moved into the freed slot."""
+        row = self._rows.pop(face_id, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._ids[row] = self._ids[last]
+            self._rows[self._ids[row]] = row
+        self._ids[last] = None
+        self.size = last
+        return True
+
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(face_id)
+        return None if row is None else self._vectors[row].copy()
+
+    def clear(self):
+        self._rows.clear()
+        self._ids[:self.size] = None
+        self.size = 0
+
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact nearest neighbour (Euclidean) for a batch of queries.
+
+        Args:
+            queries: (M, D) or (D,) embeddings
+
+        Returns:
+            (rows, distances): (M,) int64 row indices into `ids` and (M,) float32 distances.
+            Both are empty when the gallery is empty.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g  (one GEMM for all pairs)
+        sq_dist = self._sq_norms[:self.size][None, :] - 2.0 * (queries @ self.vectors.T)
+        rows = sq_dist.argmin(axis=1)
+        best = sq_dist[np.arange(len(queries)), rows] + np.einsum("ij,ij->i", queries, queries)
+        return rows, np.sqrt(np.maximum(best, 0.0))
+
+class VectorIndex(ABC):
+    """
+    Common interface for FaceID -> embedding nearest-neighbour indexes.
+    All indexes support incremental upsert/remove and on-disk persistence (.npz).
+    """
+    kind = "base"
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def __contains__(self, face_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def ids(self) -> List[str]:
+        """Returns every FaceID currently stored."""
+        pass
+
+    @abstractmethod
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        pass
+
+    @abstractmethod
+    def upsert(self, face_id: str, embedding: np.ndarray):
+        """Inserts a new identity or replaces the embedding of an existing one."""
+        pass
+
+    @abstractmethod
+    def remove(self, face_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def search(self, queries: np.ndarray) -> Tuple[List[Optional[str]], np.ndarray]:
+        """
+        Nearest neighbour for a batch of queries.
+
+        Returns:
+            (face_ids, distances): M FaceIDs (None if the index is empty) and (M,) float32
+            Euclidean distances (inf where no candidate was found).
+        """
+        pass
+
+    @abstractmethod
+    def _state(self) -> Dict[str, np.ndarray]:
+        pass
+
+    def _params(self) -> Dict[str, float]:
+        """Construction/search settings persisted alongside the data."""
+        return {}
+
+    @abstractmethod
+    def _restore(self, state: Dict[str, np.ndarray]):
+        pass
+
+    def clear(self):
+        for face_id in self.ids():
+            self.remove(face_id)
+
+    def save(self, path: str):
+        """Writes the index to a single .npz file (no pickling)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        state = self._state()
+        for name, value in self._params().items():
+            state[f"param_{name}"] = np.array(value)
+        state["kind"] = np.array(self.kind)
+        state["dim"] = np.array(self.dim)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str, **params) -> "VectorIndex":
+        """Loads an index written by save(); `params` override the persisted settings."""
+        with np.load(path, allow_pickle=False) as data:
+            state = {k: data[k] for k in data.files}
+        saved = {k[len("param_"):]: state.pop(k).item() for k in list(state) if k.startswith("param_")}
+        saved.update(params)
+        index = create_index(str(state.pop("kind")), dim=int(state.pop("dim")), **saved)
+        index._restore(state)
+        return index
+
+    @staticmethod
+    def _empty_result(num_queries: int) -> Tuple[List[Optional[str]], np.ndarray]:
+        return [None] * num_queries, np.full(num_queries, np.inf, dtype=np.float32)
+
+class ExactIndex(VectorIndex):
+    """Brute-force search over a GalleryMatrix (recall 1.0, O(N) per query)."""
+    kind = "exact"
+
+    def __init__(self, dim: int = 128):
+        super().__init__(dim)
+        self.matrix = GalleryMatrix(dim)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def __contains__(self, face_id: str) -> bool:
+        return face_id in self.matrix
+
+    def ids(self) -> List[str]:
+        return list(self.matrix.ids)
+
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        return self.matrix.get(face_id)
+
+    def upsert(self, face_id: str, embedding: np.ndarray):
+        self.matrix.upsert(face_id, embedding)
+
+    def remove(self, face_id: str) -> bool:
+        return self.matrix.remove(face_id)
+
+    def clear(self):
+        self.matrix.clear()
+
+    def search(self, queries: np.ndarray) -> Tuple[List[Optional[str]], np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(self.matrix) == 0:
+            return self._empty_result(len(queries))
+        rows, dists = self.matrix.search(queries)
+        return list(self.matrix.ids[rows]), dists.astype(np.float32)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        return {"ids": np.array(self.ids(), dtype=str), "vectors": self.matrix.vectors.copy()}
+
+    def _restore(self, state: Dict[str, np.ndarray]):
+        for face_id, vec in zip(state["ids"].tolist(), state["vectors"]):
+            self.matrix.upsert(face_id, vec)
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index with k-means coarse quantization.
+    Each vector lives in the list of its nearest centroid; a query scans only the
+    `nprobe` closest lists. Higher `nprobe` -> higher recall, higher latency.
+    Until `train_size` vectors have been added, search falls back to an exact scan.
+
+    Training is a one-time cost of `kmeans_iters` passes over up to 64 * nlist vectors
+    (hundreds of ms for the defaults). With `background_training`, the upsert that reaches
+    `train_size` only starts it in a background thread on a snapshot; search stays exact
+    until the next upsert / remove / search installs the result on the calling thread
+    (re-assigning only the vectors changed meanwhile), so no frame waits for k-means.
+    """
+    kind = "ivf"
+
+    def __init__(self, dim: int = 128, nlist: int = 256, nprobe: int = 8,
+                 train_size: Optional[int] = None, kmeans_iters: int = 10, seed: int = 0,
+                 background_training: bool = True):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or 16 * nlist
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.background_training = background_training
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[GalleryMatrix] = []
+        self.pending = GalleryMatrix(dim) # Storage before training
+        self._list_of: Dict[str, int] = {}
+        self._trainer: Optional[threading.Thread] = None
+        self._trained = None # (centroids, snapshot ids, snapshot labels) from the background trainer
+        self._changed: set = set() # FaceIDs upserted / removed since the training snapshot
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._list_of) if self.is_trained else len(self.pending)
+
+    def __contains__(self, face_id: str) -> bool:
+        return face_id in self._list_of if self.is_trained else face_id in self.pending
+
+    def ids(self) -> List[str]:
+        return list(self._list_of) if self.is_trained else list(self.pending.ids)
+
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        if not self.is_trained:
+            return self.pending.get(face_id)
+        list_no = self._list_of.get(face_id)
+        return None if list_no is None else self.lists[list_no].get(face_id)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return self._nearest(vectors, self.centroids)
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        sq_dist = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * (vectors @ centroids.T)
+        return sq_dist.argmin(axis=1)
+
+    def _kmeans(self, sample: np.ndarray) -> np.ndarray:
+        """(nlist, D) k-means centroids of `sample` (touches no index state: safe off-thread)."""
+        nlist = min(self.nlist, len(sample))
+        rng = np.random.default_rng(self.seed)
+        if len(sample) > 64 * nlist:
+            sample = sample[rng.choice(len(sample), 64 * nlist, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            labels = self._nearest(sample, centroids)
+            counts = np.bincount(labels, minlength=nlist).astype(np.float32)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    def _install(self, centroids: np.ndarray, stored_ids: List[str], stored: np.ndarray, labels: np.ndarray):
+        """Switches to the trained lists, placing every stored vector in its list."""
+        self.centroids = centroids
+        self.lists = [GalleryMatrix(self.dim, capacity=16) for _ in range(len(centroids))]
+        self._list_of = {}
+        self.pending.clear()
+        for face_id, vec, list_no in zip(stored_ids, stored, labels.tolist()):
+            self.lists[list_no].upsert(face_id, vec)
+            self._list_of[face_id] = list_no
+        logger.info(f"🧭 IVFIndex: Trained {len(centroids)} lists over {len(stored_ids)} vectors")
+
+    def train(self, vectors: Optional[np.ndarray] = None):
+        """(Re)trains the coarse quantizer with k-means (synchronously) and redistributes every stored vector."""
+        stored_ids = self.ids()
+        stored = np.array([self.get(fid) for fid in stored_ids], dtype=np.float32).reshape(-1, self.dim)
+        sample = stored if vectors is None else np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(sample) == 0:
+            return
+        centroids = self._kmeans(sample)
+        self._install(centroids, stored_ids, stored, self._nearest(stored, centroids))
+
+    def _train_in_background(self):
+        """Starts k-means on a snapshot of the pending vectors; the frame loop keeps running."""
+        snapshot_ids, snapshot = list(self.pending.ids), self.pending.vectors.copy()
+        self._changed = set()
+
+        def run():
+            try:
+                centroids = self._kmeans(snapshot)
+                self._trained = (centroids, snapshot_ids, self._nearest(snapshot, centroids))
+            except Exception as e:
+                logger.error(f"❌ IVFIndex: Background training failed: {e}")
+
+        self._trainer = threading.Thread(target=run, name="IVFTrainer", daemon=True)
+        self._trainer.start()
+
+    def _install_trained(self):
+        """Installs a finished background training (on the caller's thread, between index operations)."""
+        trained, self._trained = self._trained, None
+        if trained is None or self.is_trained:
+            return
+        centroids, snapshot_ids, snapshot_labels = trained
+        label_of = dict(zip(snapshot_ids, snapshot_labels.tolist()))
+        stored_ids = list(self.pending.ids)
+        stored = self.pending.vectors.copy()
+        labels = np.array([label_of.get(fid, -1) for fid in stored_ids], dtype=np.int64)
+        # Only vectors added or replaced since the snapshot need a nearest-centroid pass
+        stale = np.array([fid in self._changed or label < 0 for fid, label in zip(stored_ids, labels.tolist())], dtype=bool)
+        if stale.any():
+            labels[stale] = self._nearest(stored[stale], centroids)
+        self._changed = set()
+        self._install(centroids, stored_ids, stored, labels)
+
+    def wait_for_training(self, timeout: Optional[float] = None):
+        """Blocks until a running background training has finished (installed on the next operation)."""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join(timeout)
+
+    def upsert(self, face_id: str, embedding: np.ndarray):
+        vec = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        self._install_trained()
+        if not self.is_trained:
+            self.pending.upsert(face_id, vec)
+            if self._trainer is not None:
+                self._changed.add(face_id)
+            if len(self.pending) >= self.train_size:
+                if not self.background_training:
+                    self.train()
+                elif self._trained is None and (self._trainer is None or not self._trainer.is_alive()):
+                    self._train_in_background()
+            return
+        list_no = int(self._assign(vec[None, :])[0])
+        old_list = self._list_of.get(face_id)
+        if old_list is not None and old_list != list_no:
+            self.lists[old_list].remove(face_id)
+        self.lists[list_no].upsert(face_id, vec)
+        self._list_of[face_id] = list_no
+
+    def remove(self, face_id: str) -> bool:
+        self._install_trained()
+        if not self.is_trained:
+            self._changed.discard(face_id)
+            return self.pending.remove(face_id)
+        list_no = self._list_of.pop(face_id, None)
+        return list_no is not None and self.lists[list_no].remove(face_id)
+
+    def clear(self):
+        self.pending.clear()
+        for inv_list in self.lists:
+            inv_list.clear()
+        self._list_of.clear()
+
+    def search(self, queries: np.ndarray) -> Tuple[List[Optional[str]], np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        num_queries = len(queries)
+        self._install_trained()
+        if len(self) == 0:
+            return self._empty_result(num_queries)
+        if not self.is_trained:
+            rows, dists = self.pending.search(queries)
+            return list(self.pending.ids[rows]), dists.astype(np.float32)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        coarse = (self.centroids ** 2).sum(axis=1)[None, :] - 2.0 * (queries @ self.centroids.T)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        best_ids: List[Optional[str]] = [None] * num_queries
+        best_dists = np.full(num_queries, np.inf, dtype=np.float32)
+        # Scan each probed list once for all queries that selected it
+        for list_no in np.unique(probes):
+            inv_list = self.lists[list_no]
+            if len(inv_list) == 0:
+                continue
+            query_rows = np.flatnonzero((probes == list_no).any(axis=1))
+            rows, dists = inv_list.search(queries[query_rows])
+            better = dists < best_dists[query_rows]
+            for q, row, dist in zip(query_rows[better], rows[better], dists[better]):
+                best_ids[q] = inv_list.ids[row]
+                best_dists[q] = dist
+        return best_ids, best_dists
+
+    def _params(self) -> Dict[str, float]:
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "train_size": self.train_size}
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        ids = self.ids()
+        vectors = np.array([self.get(fid) for fid in ids], dtype=np.float32).reshape(-1, self.dim)
+        state = {"ids": np.array(ids, dtype=str), "vectors": vectors}
+        if self.is_trained:
+            state["centroids"] = self.centroids
+            state["assignments"] = np.array([self._list_of[fid] for fid in ids], dtype=np.int32)
+        return state
+
+    def _restore(self, state: Dict[str, np.ndarray]):
+        ids, vectors = state["ids"].tolist(), state["vectors"]
+        if "centroids" not in state:
+            for face_id, vec in zip(ids, vectors):
+                self.pending.upsert(face_id, vec)
+            return
+        self.centroids = state["centroids"].astype(np.float32)
+        self.lists = [GalleryMatrix(self.dim, capacity=16) for _ in range(len(self.centroids))]
+        for face_id, vec, list_no in zip(ids, vectors, state["assignments"].tolist()):
+            self.lists[list_no].upsert(face_id, vec)
+            self._list_of[face_id] = list_no
+
+class HNSWIndex(VectorIndex):
+    """
+    Hierarchical navigable small-world graph (HNSW-style) index.
+    `M` bounds the out-degree per layer, `ef_construction` the build beam and
+    `ef_search` the query beam (higher -> higher recall, higher latency).
+    Deletes are tombstones: removed nodes still route searches but are never
+    returned; the graph is rebuilt once tombstones exceed `max_deleted_ratio`.
+    """
+    kind = "hnsw"
+
+    def __init__(self, dim: int = 128, M: int = 16, ef_construction: int = 100, ef_search: int = 50,
+                 max_deleted_ratio: float = 0.3, seed: int = 0):
+        super().__init__(dim)
+        self.M = M
+        self.max_m0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.max_deleted_ratio = max_deleted_ratio
+        self.seed = seed
+        self._level_mult = 1.0 / math.log(max(M, 2))
+        self._rng = np.random.default_rng(seed)
+        self._init_storage()
+
+    def _init_storage(self, capacity: int = 1024):
+        self._vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        self._node_ids: List[Optional[str]] = []
+        self._links: List[List[List[int]]] = [] # node -> level -> neighbours
+        self._deleted = np.zeros(capacity, dtype=bool)
+        self._node_of: Dict[str, int] = {}
+        self._entry = -1
+        self._max_level = -1
+        self._num_deleted = 0
+
+    def __len__(self) -> int:
+        return len(self._node_of)
+
+    def __contains__(self, face_id: str) -> bool:
+        return face_id in self._node_of
+
+    def ids(self) -> List[str]:
+        return list(self._node_of)
+
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        node = self._node_of.get(face_id)
+        return None if node is None else self._vectors[node].copy()
+
+    def _dist(self, q: np.ndarray, nodes: List[int]) -> np.ndarray:
+        diff = self._vectors[nodes] - q
+        return np.einsum("ij,ij->i", diff, diff)
+
+    def _search_layer(self, q: np.ndarray, entry_points: List[int], ef: int, level: int) -> List[Tuple[float, int]]:
+        """Beam search on one layer; returns up to `ef` (sq_dist, node) pairs, closest first."""
+        visited = set(entry_points)
+        entry_dists = self._dist(q, entry_points)
+        candidates = [(float(d), n) for d, n in zip(entry_dists, entry_points)]
+        heapq.heapify(candidates)
+        results = [(-d, n) for d, n in candidates] # max-heap of the current best
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if dist > -results[0][0] and len(results) >= ef:
+                break
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for d, n in zip(self._dist(q, neighbours).tolist(), neighbours):
+                if len(results) < ef or d < -results[0][0]:
+                    heapq.heappush(candidates, (d, n))
+                    heapq.heappush(results, (-d, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted((-d, n) for d, n in results)
+
+    def _greedy_descend(self, q: np.ndarray, target_level: int) -> int:
+        node = self._entry
+        for level in range(self._max_level, target_level, -1):
+            node = self._search_layer(q, [node], 1, level)[0][1]
+        return node
+
+    def _prune(self, node: int, level: int):
+        max_links = self.max_m0 if level == 0 else self.M
+        links = self._links[node][level]
+        if len(links) > max_links:
+            order = np.argsort(self._dist(self._vectors[node], links))[:max_links]
+            self._links[node][level] = [links[i] for i in order]
+
+    def _insert_node(self, face_id: str, vec: np.ndarray):
+        node = len(self._node_ids)
+        if node == len(self._vectors):
+            capacity = 2 * len(self._vectors)
+            self._vectors = np.resize(self._vectors, (capacity, self.dim))
+            deleted = np.zeros(capacity, dtype=bool)
+            deleted[:node] = self._deleted[:node]
+            self._deleted = deleted
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._vectors[node] = vec
+        self._node_ids.append(face_id)
+        self._links.append([[] for _ in range(level + 1)])
+        self._node_of[face_id] = node
+
+        if self._entry < 0:
+            self._entry, self._max_level = node, level
+            return
+
+        entry = self._greedy_descend(vec, level)
+        entry_points = [entry]
+        for lvl in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(vec, entry_points, self.ef_construction, lvl)
+            neighbours = [n for _, n in found[:self.M]]
+            self._links[node][lvl] = neighbours
+            for n in neighbours:
+                self._links[n][lvl].append(node)
+                self._prune(n, lvl)
+            entry_points = [n for _, n in found]
+
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+
+    def upsert(self, face_id: str, embedding: np.ndarray):
+        vec = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        node = self._node_of.get(face_id)
+        if node is not None:
+            if np.array_equal(self._vectors[node], vec):
+                return
+            self.remove(face_id)
+        self._insert_node(face_id, vec)
+
+    def remove(self, face_id: str) -> bool:
+        node = self._node_of.pop(face_id, None)
+        if node is None:
+            return False
+        self._deleted[node] = True
+        self._num_deleted += 1
+        if self._num_deleted > self.max_deleted_ratio * max(len(self._node_ids), 1):
+            self.rebuild()
+        return True
+
+    def rebuild(self):
+        """Rebuilds the graph from the live nodes, dropping all tombstones."""
+        live = [(fid, self._vectors[n].copy()) for fid, n in self._node_of.items()]
+        self._init_storage(max(1024, len(live)))
+        for face_id, vec in live:
+            self._insert_node(face_id, vec)
+
+    def clear(self):
+        self._init_storage()
+
+    def search(self, queries: np.ndarray) -> Tuple[List[Optional[str]], np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(self) == 0:
+            return self._empty_result(len(queries))
+
+        ids: List[Optional[str]] = []
+        dists = np.full(len(queries), np.inf, dtype=np.float32)
+        ef = max(self.ef_search, 1)
+        for i, q in enumerate(queries):
+            entry = self._greedy_descend(q, 0)
+            found = self._search_layer(q, [entry], ef, 0)
+            best = next(((d, n) for d, n in found if not self._deleted[n]), None)
+            if best is None:
+                ids.append(None)
+            else:
+                ids.append(self._node_ids[best[1]])
+                dists[i] = math.sqrt(max(best[0], 0.0))
+        return ids, dists
+
+    def _params(self) -> Dict[str, float]:
+        return {"M": self.M, "ef_construction": self.ef_construction, "ef_search": self.ef_search,
+                "max_deleted_ratio": self.max_deleted_ratio}
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        num_nodes = len(self._node_ids)
+        levels = np.array([len(links) - 1 for links in self._links], dtype=np.int32)
+        link_counts = [len(level_links) for links in self._links for level_links in links]
+        link_data = [n for links in self._links for level_links in links for n in level_links]
+        return {
+            "ids": np.array([fid or "" for fid in self._node_ids], dtype=str),
+            "vectors": self._vectors[:num_nodes].copy(),
+            "deleted": self._deleted[:num_nodes].copy(),
+            "levels": levels,
+            "link_counts": np.array(link_counts, dtype=np.int32),
+            "link_data": np.array(link_data, dtype=np.int32),
+            "entry": np.array([self._entry, self._max_level], dtype=np.int64),
+        }
+
+    def _restore(self, state: Dict[str, np.ndarray]):
+        num_nodes = len(state["ids"])
+        self._init_storage(max(1024, num_nodes))
+        self._vectors[:num_nodes] = state["vectors"]
+        self._deleted[:num_nodes] = state["deleted"]
+        counts, data = state["link_counts"].tolist(), state["link_data"].tolist()
+        pos, offset = 0, 0
+        for node, (face_id, level) in enumerate(zip(state["ids"].tolist(), state["levels"].tolist())):
+            self._node_ids.append(face_id)
+            links = []
+            for _ in range(level + 1):
+                links.append(data[offset:offset + counts[pos]])
+                offset += counts[pos]
+                pos += 1
+            self._links.append(links)
+            if not self._deleted[node]:
+                self._node_of[face_id] = node
+        self._num_deleted = int(self._deleted[:num_nodes].sum())
+        self._entry, self._max_level = (int(v) for v in state["entry"])
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex, HNSWIndex)}
+
+def create_index(kind: str = "exact", dim: int = 128, **params) -> VectorIndex:
+    """
+    Builds a gallery index by name.
+
+    Args:
+        kind: "exact", "ivf" or "hnsw"
+        dim: Embedding dimension
+        params: Index-specific settings (e.g. nlist/nprobe for IVF, M/ef_search for HNSW)
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}'. Available: {list(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](dim=dim, **params)
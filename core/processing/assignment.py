@@ -0,0 +1,151 @@
+import numpy as np
+from typing import Optional, Tuple
+
+def pairwise_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, 2) x (M, 2) points -> (N, M) Euclidean distances in one broadcast."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 2)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 2)
+    # Per-axis outer differences (a reduction over a length-2 axis is much slower)
+    dx = a[:, 0, None] - b[None, :, 0]
+    dy = a[:, 1, None] - b[None, :, 1]
+    return np.sqrt(dx * dx + dy * dy)
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, 4) x (M, 4) boxes (startX, startY, endX, endY) -> (N, M) intersection over union."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    iw = np.minimum(a[:, 2, None], b[None, :, 2]) - np.maximum(a[:, 0, None], b[None, :, 0])
+    ih = np.minimum(a[:, 3, None], b[None, :, 3]) - np.maximum(a[:, 1, None], b[None, :, 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+def greedy_assignment(cost: np.ndarray, max_cost: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classic centroid-tracker matching: rows in order of their best cost take their
+    argmin column if it is still free. Returns (rows, cols) of the accepted pairs.
+    """
+    if cost.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    order = cost.min(axis=1).argsort()
+    best = cost.argmin(axis=1)[order]
+    rows, cols, used_cols = [], [], set()
+    for row, col in zip(order.tolist(), best.tolist()):
+        if col in used_cols or (max_cost is not None and cost[row, col] > max_cost):
+            continue
+        used_cols.add(col)
+        rows.append(row)
+        cols.append(col)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+def _hungarian(cost: np.ndarray) -> np.ndarray:
+    """
+    Shortest augmenting path (Jonker-Volgenant style) min-cost assignment for n <= m.
+    Each row costs one augmentation whose inner step is vectorized over columns.
+    Returns the column assigned to every row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=int)   # owner[j]: 1-based row assigned to column j (0 = free)
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(candidates.argmin()) + 1
+            delta = candidates[j1 - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    assigned = np.empty(n, dtype=int)
+    cols = np.flatnonzero(owner[1:])
+    assigned[owner[1:][cols] - 1] = cols
+    return assigned
+
+def _components(mask: np.ndarray):
+    """Connected components of the bipartite graph given by a boolean (N, M) mask."""
+    seen = np.zeros(mask.shape[0], dtype=bool)
+    for start in np.flatnonzero(mask.any(axis=1)):
+        if seen[start]:
+            continue
+        rows = np.zeros(mask.shape[0], dtype=bool)
+        rows[start] = True
+        while True:
+            cols = mask[rows].any(axis=0)
+            grown = mask[:, cols].any(axis=1)
+            if (grown == rows).all():
+                break
+            rows = grown
+        seen |= rows
+        yield np.flatnonzero(rows), np.flatnonzero(cols)
+
+def optimal_assignment(cost: np.ndarray, max_cost: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum total cost assignment (Hungarian) with an optional gate: pairs above
+    `max_cost` are never matched. Unambiguous pairs (a row and a column that only gate
+    each other) are accepted directly; the rest of the gated graph is split into connected
+    components so crowded scenes solve many small problems instead of one large one.
+    Returns (rows, cols) of the accepted pairs.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    mask = np.isfinite(cost) if max_cost is None else (cost <= max_cost)
+
+    candidate = mask.argmax(axis=1)
+    trivial = (mask.sum(axis=1) == 1) & (mask.sum(axis=0)[candidate] == 1)
+    rows_out, cols_out = [np.flatnonzero(trivial)], [candidate[trivial]]
+    if trivial.any():
+        mask = mask.copy()
+        mask[trivial] = False
+
+    for rows, cols in _components(mask):
+        sub = cost[np.ix_(rows, cols)]
+        sub_mask = mask[np.ix_(rows, cols)]
+        # Gated pairs get a penalty larger than any valid total, so the solver first
+        # maximizes the number of valid pairs and then minimizes their cost
+        penalty = sub[sub_mask].sum() + 1.0
+        sub = np.where(sub_mask, sub, penalty)
+        transpose = sub.shape[0] > sub.shape[1]
+        if transpose:
+            sub, sub_mask = sub.T, sub_mask.T
+        assigned = _hungarian(sub)
+        keep = sub_mask[np.arange(len(assigned)), assigned]
+        r, c = np.flatnonzero(keep), assigned[keep]
+        if transpose:
+            r, c = c, r
+        rows_out.append(rows[r])
+        cols_out.append(cols[c])
+    return np.concatenate(rows_out).astype(int), np.concatenate(cols_out).astype(int)
+
+def track_matches(matched_ids: np.ndarray, cols: np.ndarray, first_new_id: int, new_detections: np.ndarray) -> np.ndarray:
+    """(K, 2) (track ID, detection index) pairs for matched and newly registered tracks, by track ID."""
+    new_ids = np.arange(first_new_id, first_new_id + len(new_detections), dtype=np.int64)
+    matches = np.stack([np.concatenate([matched_ids, new_ids]),
+                        np.concatenate([cols, new_detections]).astype(np.int64)], axis=1)
+    return matches[np.argsort(matches[:, 0], kind="stable")]
+
+ASSIGNMENT_MODES = {
+    "greedy": greedy_assignment,
+    "hungarian": optimal_assignment,
+}
@@ -1,77 +1,104 @@
 import numpy as np
 from collections import OrderedDict
+from typing import Optional
+from core.processing.assignment import ASSIGNMENT_MODES, pairwise_distances, track_matches
 
 class CentroidTracker:
-    def __init__(self, max_disappeared: int = 20):
+    """
+    Nearest-centroid tracker.
+    State is kept as parallel NumPy arrays (ids, centroids, disappeared counts), so one
+    update is a broadcast distance matrix plus an assignment step:
+    - "greedy": the classic row-min heuristic (default)
+    - "hungarian": minimum total distance, avoids ID swaps when people cross
+    `max_distance` gates both modes: farther pairs are never matched (None = no gate).
+
+    `update_with_matches` also reports which detection each track took, so callers can
+    pick the exact box per track instead of searching for it.
+    """
+    def __init__(self, max_disappeared: int = 20, assignment: str = "greedy", max_distance: Optional[float] = None):
+        if assignment not in ASSIGNMENT_MODES:
+            raise ValueError(f"Unknown assignment mode '{assignment}'. Available: {list(ASSIGNMENT_MODES)}")
         self.next_id = 0
-        self.objects = OrderedDict()
-        self.disappeared = OrderedDict()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.centroids = np.empty((0, 2), dtype=int)
+        self.disappeared_counts = np.empty(0, dtype=np.int64)
         self.max_disappeared = max_disappeared
+        self.assignment = assignment
+        self.max_distance = max_distance
+
+    @property
+    def objects(self) -> "OrderedDict[int, np.ndarray]":
+        """ID -> centroid (same shape as the original OrderedDict state); copies, so they survive later updates."""
+        return OrderedDict(zip(self.ids.tolist(), self.centroids.copy()))
+
+    @property
+    def disappeared(self) -> "OrderedDict[int, int]":
+        return OrderedDict(zip(self.ids.tolist(), self.disappeared_counts.tolist()))
 
     def register(self, centroid):
-        self.objects[self.next_id] = centroid
-        self.disappeared[self.next_id] = 0
-        self.next_id += 1
+        self.register_many(np.asarray(centroid).reshape(1, 2))
+
+    def register_many(self, centroids: np.ndarray):
+        count = len(centroids)
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count, dtype=np.int64)])
+        self.centroids = np.concatenate([self.centroids, centroids.astype(int).reshape(-1, 2)])
+        self.disappeared_counts = np.concatenate([self.disappeared_counts, np.zeros(count, dtype=np.int64)])
+        self.next_id += count
 
     def deregister(self, object_id):
-        del self.objects[object_id]
-        del self.disappeared[object_id]
+        keep = self.ids != object_id
+        self._keep(keep)
+
+    def _keep(self, keep: np.ndarray):
+        self.ids = self.ids[keep]
+        self.centroids = self.centroids[keep]
+        self.disappeared_counts = self.disappeared_counts[keep]
+
+    def _age(self, rows: np.ndarray):
+        """Counts a missed frame for the given rows and drops tracks gone for too long."""
+        self.disappeared_counts[rows] += 1
+        if (self.disappeared_counts > self.max_disappeared).any():
+            self._keep(self.disappeared_counts <= self.max_disappeared)
 
     def update(self, rects):
+        return self.update_with_matches(rects)[0]
+
+    def update_with_matches(self, rects):
+        """
+        Returns:
+            objects: ID -> centroid for every live track
+            matches: (K, 2) int array of (track ID, detection index) for every track that
+                     took a detection this frame, new tracks included, sorted by track ID
+            new_detections: (U,) indices of the detections that started new tracks
+        """
         if len(rects) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-            return self.objects
-
-        input_centroids = np.zeros((len(rects), 2), dtype="int")
-        for (i, (startX, startY, endX, endY)) in enumerate(rects):
-            cX = int((startX + endX) / 2.0)
-            cY = int((startY + endY) / 2.0)
-            input_centroids[i] = (cX, cY)
-
-        if len(self.objects) == 0:
-            for i in range(0, len(input_centroids)):
-                self.register(input_centroids[i])
-        else:
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-
-            # Manual Euclidean distance calculation using NumPy
-            # This avoids the scipy dependency conflict
-            D = np.zeros((len(object_centroids), len(input_centroids)))
-            for i, o_centroid in enumerate(object_centroids):
-                for j, i_centroid in enumerate(input_centroids):
-                    D[i, j] = np.linalg.norm(o_centroid - i_centroid)
-
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
-
-            used_rows = set()
-            used_cols = set()
-
-            for (row, col) in zip(rows, cols):
-                if row in used_rows or col in used_cols:
-                    continue
-
-                object_id = object_ids[row]
-                self.objects[object_id] = input_centroids[col]
-                self.disappeared[object_id] = 0
-                used_rows.add(row)
-                used_cols.add(col)
-
-            unused_rows = set(range(0, D.shape[0])).difference(used_rows)
-            unused_cols = set(range(0, D.shape[1])).difference(used_cols)
-
-            if D.shape[0] >= D.shape[1]:
-                for row in unused_rows:
-                    object_id = object_ids[row]
-                    self.disappeared[object_id] += 1
-                    if self.disappeared[object_id] > self.max_disappeared:
-                        self.deregister(object_id)
-            else:
-                for col in unused_cols:
-                    self.register(input_centroids[col])
-
-        return self.objects
+            self._age(np.arange(len(self.ids)))
+            return self.objects, np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # Accepts both (N, 4) box arrays and lists of (startX, startY, endX, endY) tuples
+        boxes = np.asarray(rects, dtype="float").reshape(-1, 4)
+        input_centroids = ((boxes[:, :2] + boxes[:, 2:]) / 2.0).astype("int")
+
+        if len(self.ids) == 0:
+            new_detections = np.arange(len(input_centroids))
+            self.register_many(input_centroids)
+            return self.objects, np.stack([self.ids, new_detections], axis=1), new_detections
+
+        D = pairwise_distances(self.centroids, input_centroids)
+        rows, cols = ASSIGNMENT_MODES[self.assignment](D, self.max_distance)
+
+        self.centroids[rows] = input_centroids[cols]
+        self.disappeared_counts[rows] = 0
+        matched_ids = self.ids[rows]
+
+        unmatched_rows = np.ones(len(self.ids), dtype=bool)
+        unmatched_rows[rows] = False
+        unmatched_cols = np.ones(len(input_centroids), dtype=bool)
+        unmatched_cols[cols] = False
+        new_detections = np.flatnonzero(unmatched_cols)
+
+        self._age(np.flatnonzero(unmatched_rows))
+        first_new_id = self.next_id
+        self.register_many(input_centroids[new_detections])
+
+        return self.objects, track_matches(matched_ids, cols, first_new_id, new_detections), new_detections
@@ -0,0 +1,147 @@
+import cv2
+import math
+import time
+import numpy as np
+from typing import Optional
+
+class DetectionScheduler:
+    """
+    Decides on which frames the face detector runs, and propagates boxes in between.
+
+    - Detection runs every `interval` frames, and immediately when motion appears outside
+      the tracked boxes (a new face may have entered) or a propagated box is lost.
+    - The interval adapts: it halves when the set of faces changes and grows by one
+      frame after each stable detection, within [min_interval, max_interval].
+    - With a `latency_budget_ms`, the interval never drops below what keeps the average
+      per-frame cost (one detection + propagations) inside the budget.
+    - Between detections, boxes are moved with sparse Lucas-Kanade optical flow
+      (cv2.calcOpticalFlowPyrLK) on a small grid of points inside each box.
+    """
+    THUMB_WIDTH = 80          # Motion trigger works on a tiny grayscale thumbnail
+    PIXEL_DIFF = 25           # Thumbnail pixel change counted as motion
+    GRID = 4                  # GRID x GRID flow points per box
+    MIN_TRACKED_POINTS = 0.5  # Fraction of points that must be tracked to keep a box
+
+    def __init__(self, interval: int = 5, min_interval: int = 1, max_interval: int = 15,
+                 motion_threshold: float = 0.01, latency_budget_ms: Optional[float] = None):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.latency_budget_ms = latency_budget_ms
+
+        self.frames_since_detection = 0
+        self.detect_ms = 0.0      # EMA of detector latency
+        self.propagate_ms = 0.0   # EMA of propagation latency
+        self.activity = 0.0       # EMA of the changed-pixel fraction
+        self.detections = 0
+        self.frames = 0
+        self._force = True
+        self._last_count = None
+        self._prev_gray = None
+        self._prev_thumb = None
+
+    # --- Scheduling ---------------------------------------------------------
+
+    def _thumbnail(self, gray: np.ndarray) -> np.ndarray:
+        h, w = gray.shape[:2]
+        return cv2.resize(gray, (self.THUMB_WIDTH, max(1, round(h * self.THUMB_WIDTH / w))), interpolation=cv2.INTER_AREA)
+
+    def _motion_outside(self, thumb: np.ndarray, boxes: np.ndarray, frame_width: int) -> float:
+        """Fraction of thumbnail pixels that changed outside the tracked boxes."""
+        if self._prev_thumb is None or self._prev_thumb.shape != thumb.shape:
+            return 0.0
+        changed = cv2.absdiff(thumb, self._prev_thumb) > self.PIXEL_DIFF
+        self.activity = 0.8 * self.activity + 0.2 * float(changed.mean())
+        if len(boxes):
+            scale = thumb.shape[1] / float(frame_width)
+            for x1, y1, x2, y2 in (np.asarray(boxes, dtype=float) * scale).astype(int):
+                changed[max(0, y1 - 1):y2 + 2, max(0, x1 - 1):x2 + 2] = False
+        return float(changed.mean())
+
+    def _latency_floor(self) -> int:
+        """Smallest interval whose average per-frame cost fits the latency budget."""
+        if not self.latency_budget_ms or self.detect_ms <= self.latency_budget_ms:
+            return self.min_interval
+        headroom = self.latency_budget_ms - self.propagate_ms
+        if headroom <= 0:
+            return self.max_interval
+        return min(self.max_interval, math.ceil((self.detect_ms - self.propagate_ms) / headroom))
+
+    def should_detect(self, gray: np.ndarray, boxes: np.ndarray) -> bool:
+        """Call once per frame (grayscale) with the current boxes; True when the detector should run."""
+        self.frames += 1
+        thumb = self._thumbnail(gray)
+        motion = self._motion_outside(thumb, boxes, gray.shape[1])
+        self._prev_thumb = thumb
+        self.frames_since_detection += 1
+        return (self._force or motion > self.motion_threshold
+                or self.frames_since_detection >= max(self.interval, self._latency_floor()))
+
+    def record_detection(self, gray: np.ndarray, count: int, elapsed_ms: float):
+        """Updates the cadence after a detector run that found `count` faces."""
+        self.detections += 1
+        self.frames_since_detection = 0
+        self._force = False
+        self.detect_ms = elapsed_ms if self.detect_ms == 0.0 else 0.8 * self.detect_ms + 0.2 * elapsed_ms
+        if self._last_count is not None and count != self._last_count:
+            self.interval = max(self.min_interval, self.interval // 2)
+        else:
+            self.interval = min(self.max_interval, self.interval + 1)
+        self.interval = max(self.interval, self._latency_floor())
+        self._last_count = count
+        self._prev_gray = gray
+
+    def request_detection(self):
+        self._force = True
+
+    # --- Propagation --------------------------------------------------------
+
+    def propagate(self, gray: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """
+        Moves boxes from the previous frame to `gray` with pyramidal LK flow.
+        Each box is shifted by the median displacement of its tracked grid points;
+        boxes that lose most of their points are dropped (and force a detection next frame).
+        """
+        start = time.perf_counter()
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        if self._prev_gray is None or len(boxes) == 0:
+            self._prev_gray = gray
+            return boxes
+
+        # GRID x GRID points per box (inner 80% of the box), all boxes in one LK call
+        steps = (np.arange(self.GRID) + 0.5) / self.GRID * 0.8 + 0.1
+        gx, gy = np.meshgrid(steps, steps)
+        wh = (boxes[:, 2:] - boxes[:, :2]).astype(np.float32)
+        points = boxes[:, None, :2] + np.stack([gx.ravel(), gy.ravel()], axis=1)[None] * wh[:, None, :]
+        points = points.reshape(-1, 1, 2).astype(np.float32)
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None,
+                                                    winSize=(15, 15), maxLevel=2)
+        ok = status.reshape(len(boxes), -1).astype(bool)
+        shift = (moved - points).reshape(len(boxes), -1, 2)
+        shift[~ok] = np.nan
+
+        keep = ok.mean(axis=1) >= self.MIN_TRACKED_POINTS
+        if not keep.all():
+            self.request_detection()
+        offsets = np.nanmedian(shift[keep], axis=1) if keep.any() else np.empty((0, 2))
+        out = boxes[keep] + np.round(np.hstack([offsets, offsets])).astype(np.int32)
+        h, w = gray.shape[:2]
+        out[:, [0, 2]] = np.clip(out[:, [0, 2]], 0, w)
+        out[:, [1, 3]] = np.clip(out[:, [1, 3]], 0, h)
+
+        self._prev_gray = gray
+        elapsed = (time.perf_counter() - start) * 1000.0
+        self.propagate_ms = elapsed if self.propagate_ms == 0.0 else 0.8 * self.propagate_ms + 0.2 * elapsed
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "interval": self.interval,
+            "detect_ms": round(self.detect_ms, 2),
+            "propagate_ms": round(self.propagate_ms, 2),
+            "activity": round(self.activity, 4),
+        }
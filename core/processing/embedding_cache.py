@@ -0,0 +1,143 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+class TrackEmbeddingCache:
+    """
+    Per-track embedding cache for identity re-verification.
+
+    For every live tracker ID it keeps a quality-weighted running mean embedding, the best
+    face quality seen so far (with its crop, for later enrollment) and the frame of the last
+    verification. `due` decides which tracks need a (re-)embedding this frame:
+    - tracks never embedded (highest priority)
+    - tracks whose face quality improved by `improve_ratio` over the best seen (closer / sharper / more frontal)
+    - tracks not verified for `reverify_interval` frames
+    Faces below `min_quality` are never embedded (see FaceQualityScorer), and the batch is
+    capped at `max_per_frame`, so the embedding cost per frame is bounded.
+    Tracks over budget stay due and are picked up on the next frames.
+
+    Age/gender labels are cached per track the same way: classified once on a face above
+    `min_quality`, again only when the face quality improves by `improve_ratio`.
+
+    State is kept as parallel arrays (ids, means, weights, best quality, verified frame),
+    like the trackers.
+    """
+    UNKNOWN = ("Unknown", "Unknown")
+
+    def __init__(self, dim: int = 128, reverify_interval: int = 30, improve_ratio: float = 1.25,
+                 max_per_frame: Optional[int] = 8, min_quality: float = 0.0):
+        self.dim = dim
+        self.reverify_interval = reverify_interval
+        self.improve_ratio = improve_ratio
+        self.max_per_frame = max_per_frame
+        self.min_quality = min_quality
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.means = np.empty((0, dim), dtype=np.float32)
+        self.weights = np.empty(0, dtype=np.float32)
+        self.best_quality = np.empty(0, dtype=np.float32)
+        self.verified_at = np.empty(0, dtype=np.int64)
+        self.best_crops: Dict[int, np.ndarray] = {} # Track ID -> highest-quality face crop
+        self.attributes: Dict[int, Tuple[str, str, float]] = {} # Track ID -> (age, gender, quality when classified)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _rows(self, track_ids: np.ndarray) -> np.ndarray:
+        """Row of every track ID in the cache (-1 if not cached)."""
+        track_ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        if len(self.ids) == 0:
+            return np.full(len(track_ids), -1, dtype=np.int64)
+        sorter = np.argsort(self.ids)
+        pos = np.minimum(np.searchsorted(self.ids, track_ids, sorter=sorter), len(self.ids) - 1)
+        rows = sorter[pos]
+        return np.where(self.ids[rows] == track_ids, rows, -1)
+
+    def retain(self, track_ids):
+        """Drops the entries of tracks that are no longer alive."""
+        alive_ids = np.asarray(list(track_ids), dtype=np.int64)
+        keep = np.isin(self.ids, alive_ids)
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.means = self.means[keep]
+            self.weights = self.weights[keep]
+            self.best_quality = self.best_quality[keep]
+            self.verified_at = self.verified_at[keep]
+        alive = set(alive_ids.tolist())
+        for cache in (self.best_crops, self.attributes):
+            for track_id in [tid for tid in cache if tid not in alive]:
+                del cache[track_id]
+
+    def best_crop(self, track_id: int) -> Optional[np.ndarray]:
+        return self.best_crops.get(track_id)
+
+    def due(self, track_ids: np.ndarray, quality: np.ndarray, frame_index: int) -> np.ndarray:
+        """Indices into `track_ids` to embed this frame, most urgent first (at most `max_per_frame`)."""
+        rows = self._rows(track_ids)
+        cached = rows >= 0
+        quality = np.asarray(quality, dtype=np.float32).reshape(-1)
+
+        staleness = np.zeros(len(rows), dtype=np.float64)
+        gain = np.zeros(len(rows), dtype=np.float64)
+        staleness[cached] = (frame_index - self.verified_at[rows[cached]]) / max(self.reverify_interval, 1)
+        gain[cached] = quality[cached] / np.maximum(self.best_quality[rows[cached]], 1e-6) / self.improve_ratio
+
+        is_due = (~cached | (staleness >= 1.0) | (gain >= 1.0)) & (quality >= self.min_quality)
+        priority = np.where(cached, np.maximum(staleness, gain), np.inf)
+        candidates = np.flatnonzero(is_due)
+        candidates = candidates[np.argsort(-priority[candidates], kind="stable")]
+        return candidates if self.max_per_frame is None else candidates[:self.max_per_frame]
+
+    def attributes_due(self, track_ids: np.ndarray, quality: np.ndarray) -> np.ndarray:
+        """Indices into `track_ids` to (re-)classify this frame, unclassified first (at most `max_per_frame`)."""
+        quality = np.asarray(quality, dtype=np.float32).reshape(-1)
+        previous = np.array([self.attributes.get(tid, (None, None, 0.0))[2] for tid in np.asarray(track_ids).tolist()],
+                            dtype=np.float32)
+        is_due = (quality >= self.min_quality) & ((previous == 0) | (quality >= previous * self.improve_ratio))
+        candidates = np.flatnonzero(is_due)
+        candidates = candidates[np.argsort(previous[candidates], kind="stable")]
+        return candidates if self.max_per_frame is None else candidates[:self.max_per_frame]
+
+    def set_attributes(self, track_ids, ages: List[str], genders: List[str], quality: np.ndarray):
+        for track_id, age, gender, q in zip(np.asarray(track_ids).tolist(), ages, genders, np.asarray(quality).tolist()):
+            self.attributes[track_id] = (age, gender, max(q, 1e-3))
+
+    def get_attributes(self, track_id: int) -> Tuple[str, str]:
+        attrs = self.attributes.get(track_id)
+        return self.UNKNOWN if attrs is None else attrs[:2]
+
+    def update(self, track_ids: np.ndarray, embeddings: np.ndarray, quality: np.ndarray, frame_index: int,
+               crops: Optional[list] = None) -> np.ndarray:
+        """
+        Folds new embeddings into the per-track means (weighted by quality) and marks the
+        tracks verified; `crops` (one per track) replace a track's best crop when their quality is higher.
+        Returns the (M, dim) L2-normalized means to search the gallery with.
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        weight = np.maximum(np.asarray(quality, dtype=np.float32).reshape(-1), 1e-3)
+
+        rows = self._rows(track_ids)
+        new = rows < 0
+        if new.any():
+            count = int(new.sum())
+            rows[new] = np.arange(len(self.ids), len(self.ids) + count)
+            self.ids = np.concatenate([self.ids, track_ids[new]])
+            self.means = np.concatenate([self.means, np.zeros((count, self.dim), dtype=np.float32)])
+            self.weights = np.concatenate([self.weights, np.zeros(count, dtype=np.float32)])
+            self.best_quality = np.concatenate([self.best_quality, np.zeros(count, dtype=np.float32)])
+            self.verified_at = np.concatenate([self.verified_at, np.zeros(count, dtype=np.int64)])
+
+        if crops is not None:
+            improved = weight > self.best_quality[rows]
+            for track_id, crop in zip(track_ids[improved].tolist(), [c for c, ok in zip(crops, improved) if ok]):
+                self.best_crops[track_id] = crop.copy()
+
+        total = self.weights[rows] + weight
+        self.means[rows] += (weight / total)[:, None] * (embeddings - self.means[rows])
+        self.weights[rows] = total
+        self.best_quality[rows] = np.maximum(self.best_quality[rows], weight)
+        self.verified_at[rows] = frame_index
+
+        means = self.means[rows]
+        norms = np.linalg.norm(means, axis=1, keepdims=True)
+        return np.divide(means, norms, out=np.zeros_like(means), where=norms > 0)
@@ -1,34 +1,65 @@
 import cv2
 import numpy as np
-import datetime
+import time
 from typing import List, Dict, Optional, Tuple
 from core.processing.face_utils import FaceUtils
 from core.processing.centroid_tracker import CentroidTracker
+from core.processing.detection_scheduler import DetectionScheduler
+from core.processing.embedding_cache import TrackEmbeddingCache
+from core.processing.face_quality import FaceQualityScorer
+from core.processing.frame_result import FrameResult
+from core.processing.kalman_tracker import KalmanTracker
 from core.processing.reid_utils import FaceReID
 from core.utils.logger import get_logger
 
 logger = get_logger("FaceProcessor")
 
-class Person:
-    """Represents a tracked person with identity and spatial metadata."""
-    def __init__(self, face_id: str, rect: Tuple[int, int, int, int], centroid: np.ndarray, 
-                 age: str = "Unknown", gender: str = "Unknown"):
-        self.id = face_id
-        self.rect = rect # (x1, y1, x2, y2)
-        self.centroid = centroid
-        self.age = age
-        self.gender = gender
-        self.last_seen = datetime.datetime.now()
-
 class FaceProcessor:
     """
     High-level library module for real-time Face Detection, Tracking, and 
     Cloud-synced Identity Re-identification.
     """
-    def __init__(self, max_disappeared: int = 40, match_threshold: float = 0.6):
-        self.face_utils = FaceUtils()
-        self.reid = FaceReID()
-        self.ct = CentroidTracker(max_disappeared=max_disappeared)
+    TRACKERS = {"centroid": CentroidTracker, "kalman": KalmanTracker}
+
+    def __init__(self, max_disappeared: int = 40, match_threshold: float = 0.6, gallery_path: Optional[str] = None,
+                 tracker: str = "centroid", detect_interval: int = 1, propagation: str = "flow",
+                 latency_budget_ms: Optional[float] = None, reverify_interval: int = 30,
+                 max_embeddings_per_frame: Optional[int] = 8, min_face_quality: float = FaceQualityScorer.MIN_QUALITY,
+                 with_attributes: bool = True):
+        """
+        Args:
+            tracker: "centroid" or "kalman"
+            detect_interval: 1 runs the detector on every frame; N > 1 enables the detection
+                cadence (detect every ~N frames or on motion, propagate boxes in between)
+            propagation: Between detections, "flow" moves boxes with LK optical flow,
+                "motion" uses the tracker's motion model (Kalman prediction; held boxes otherwise)
+            latency_budget_ms: Optional per-frame budget the cadence adapts to
+            reverify_interval: Frames after which an identified track is re-embedded and re-checked
+                against the gallery (earlier when its face gets larger / more frontal)
+            max_embeddings_per_frame: Cap on embeddings computed per frame (None = no cap)
+            min_face_quality: Faces scoring below this (size, blur, edge truncation, pose, detector
+                confidence) are not embedded yet (reported under their temporary tracking ID); 0 disables the gate
+            with_attributes: Fill age/gender (batched, cached per track; reclassified only when the face improves).
+                Callers that only need identities pass False: the age/gender networks are then not loaded
+        """
+        self.face_utils = FaceUtils(components=FaceUtils.COMPONENTS if with_attributes else ("face", "reid"))
+        self.reid = FaceReID(embedder=self.face_utils, gallery_path=gallery_path)
+        # "kalman" keeps IDs for fast walkers, so fewer new tracks need an embedding + gallery lookup
+        if tracker not in self.TRACKERS:
+            raise ValueError(f"Unknown tracker '{tracker}'. Available: {list(self.TRACKERS)}")
+        self.ct = self.TRACKERS[tracker](max_disappeared=max_disappeared)
+        if propagation not in ("flow", "motion"):
+            raise ValueError(f"Unknown propagation '{propagation}'. Available: ['flow', 'motion']")
+        self.propagation = propagation
+        self.scheduler = DetectionScheduler(interval=detect_interval, max_interval=max(detect_interval * 3, 1),
+                                            latency_budget_ms=latency_budget_ms) if detect_interval > 1 else None
+        self._last_rects = np.empty((0, 4), dtype=np.int32)
+        # Per-track running mean embeddings; decides which tracks are (re-)verified each frame
+        self.embedding_cache = TrackEmbeddingCache(reverify_interval=reverify_interval,
+                                                   max_per_frame=max_embeddings_per_frame,
+                                                   min_quality=min_face_quality)
+        self.frame_index = 0
+        self.with_attributes = with_attributes
         self.match_threshold = match_threshold
         self.auto_reg = False # Default: Don't register invisible people automatically
         
@@ -40,80 +71,140 @@ class FaceProcessor:
         else:
             print("✅ FaceProcessor: Library ready for frame processing.")
 
-    def process_frame(self, frame: np.ndarray) -> List[Person]:
+    def process_frame(self, frame: np.ndarray) -> FrameResult:
         """
         Processes a single frame: detects faces, tracks motion, and identifies people.
         
         Returns:
-            List of Person objects containing ID, coordinates, and attributes.
+            FrameResult with per-face columns (IDs, int32 boxes, float32 centroids, attributes);
+            iterating it yields PersonView rows (id, rect, centroid, age, gender).
         """
         if frame is None:
-            return []
+            return FrameResult.empty()
 
-        # 1. Detection
-        rects = self.face_utils.detect_faces(frame)
-        if len(rects) > 0:
-            print(f"🔍 FaceProcessor: Detected {len(rects)} faces")
+        # 1. Detection (every frame, or on the scheduler's cadence with propagated boxes in between)
+        rects, scores = self._detect_or_propagate(frame)
         
-        # 2. Tracking (Motion-based)
-        objects = self.ct.update(rects)
+        # 2. Tracking (Motion-based); each track reports the index of the detection it took
+        objects, assignments, _ = self.ct.update_with_matches(rects)
         
         # 3. Identity Identification (Vector-based Re-ID)
-        people = []
+        self.frame_index += 1
         active_centroid_ids = set(objects.keys())
         
         # Cleanup stale mappings
         self.id_mapping = {k: v for k, v in self.id_mapping.items() if k in active_centroid_ids}
+        self.embedding_cache.retain(active_centroid_ids)
+
+        # Pair every tracked centroid with the exact detection box it was matched to
+        track_ids = assignments[:, 0]
+        boxes = np.asarray(rects, dtype=np.int32).reshape(-1, 4)[assignments[:, 1]]
+
+        # Embed new tracks and the identified ones due for re-verification in one forward pass;
+        # faces too small, blurry or cut off wait for a better frame
+        quality = self.face_utils.quality.score(frame, boxes, None if scores is None else scores[assignments[:, 1]])
+        due = self.embedding_cache.due(track_ids, quality, self.frame_index)
+        if len(due):
+            embeddings = self.face_utils.get_face_embeddings(frame, boxes[due])
+            valid = np.isfinite(embeddings).all(axis=1)
+            due = due[valid]
+            crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes[due].tolist()]
+            # Gallery matching on the tracks' running mean embeddings, whole batch at once
+            means = self.embedding_cache.update(track_ids[due], embeddings[valid], quality[due], self.frame_index, crops)
+            matches = self.reid.find_matches(means, threshold=self.match_threshold)
+            for track_id, embedding, matched_fid in zip(track_ids[due].tolist(), means, matches):
+                self._identify(track_id, embedding, matched_fid)
+
+        # Tracks not embedded yet (face below the quality gate, or over this frame's budget) are
+        # still reported, under their temporary tracking ID until a good enough face is seen
+        for track_id in track_ids.tolist():
+            if track_id not in self.id_mapping:
+                self.id_mapping[track_id] = self._temporary_id(track_id)
+
+        # The result is built column-wise in one go
+        if len(track_ids) == 0:
+            return FrameResult.empty()
+
+        # 4. Age/Gender: one batched pass over the tracks not classified yet (or whose face got clearly better)
+        if self.with_attributes:
+            todo = self.embedding_cache.attributes_due(track_ids, quality)
+            if len(todo):
+                ages, genders = self.face_utils.classify_attributes(frame, boxes[todo], min_quality=0)
+                self.embedding_cache.set_attributes(track_ids[todo], ages, genders, quality[todo])
+        track_list = track_ids.tolist()
+        attributes = [self.embedding_cache.get_attributes(track_id) for track_id in track_list]
+
+        return FrameResult(
+            ids=[self.id_mapping[track_id] for track_id in track_list],
+            track_ids=track_ids,
+            boxes=boxes,
+            centroids=[objects[track_id] for track_id in track_list],
+            attributes={"age": [age for age, _ in attributes], "gender": [gender for _, gender in attributes]},
+        )
+
+    def _detect_or_propagate(self, frame: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Boxes for this frame and their detector scores (None for propagated boxes)."""
+        if self.scheduler is None:
+            rects, scores = self.face_utils.detect_face_boxes(frame, return_scores=True)
+            if len(rects) > 0:
+                print(f"🔍 FaceProcessor: Detected {len(rects)} faces")
+            return rects, scores
 
-        for (centroid_id, centroid) in objects.items():
-            face_id = self.id_mapping.get(centroid_id)
-            
-            # Find the detection box corresponding to this tracking centroid
-            matching_rect = None
-            for r in rects:
-                if r[0] <= centroid[0] <= r[2] and r[1] <= centroid[1] <= r[3]:
-                    matching_rect = r
-                    break
-            
-            if matching_rect:
-                # If we don't have a persistent FaceID for this tracker yet, extract vector
-                if face_id is None:
-                    face_roi = frame[matching_rect[1]:matching_rect[3], matching_rect[0]:matching_rect[2]]
-                    embedding = self.face_utils.get_face_embedding(face_roi)
-                    
-                    if embedding is not None:
-                        # Cloud/Gallery matching
-                        matched_fid = self.reid.find_match(embedding, threshold=self.match_threshold)
-                        
-                        if matched_fid:
-                            face_id = matched_fid
-                        elif self.auto_reg:
-                            # New Identity Registration - only if auto_reg is enabled
-                            # Find the highest existing FaceID number to avoid overlap
-                            existing_nums = []
-                            for fid in self.reid.gallery.keys():
-                                if fid.startswith("User_ID:"):
-                                    try: existing_nums.append(int(fid.split(":")[1]))
-                                    except: pass
-                            
-                            next_num = max(existing_nums) + 1 if existing_nums else 1
-                            face_id = f"User_ID:{next_num:03d}"
-                            self.reid.register_face(face_id, embedding)
-                            logger.info(f"🆕 New face registered: {face_id}")
-                        else:
-                            # If not auto-registering, use a temporary tracking ID
-                            face_id = f"User_ID:TRK_{centroid_id:03d}"
-                        
-                        self.id_mapping[centroid_id] = face_id
-
-                if face_id:
-                    # Optional: Add Age/Gender if requested (expensive, so only do if needed)
-                    # For simplicity in this base version, we keep them optional
-                    p = Person(face_id, matching_rect, centroid)
-                    people.append(p)
-
-        # Periodic cloud cleanup hint: typically handled outside or as a specific call
-        return people
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        scores = None
+        if self.scheduler.should_detect(gray, self._last_rects):
+            start = time.perf_counter()
+            rects, scores = self.face_utils.detect_face_boxes(frame, return_scores=True)
+            self.scheduler.record_detection(gray, len(rects), (time.perf_counter() - start) * 1000.0)
+        elif self.propagation == "motion":
+            rects = self.ct.predicted_boxes() if hasattr(self.ct, "predicted_boxes") else self._last_rects
+        else:
+            rects = self.scheduler.propagate(gray, self._last_rects)
+        self._last_rects = np.asarray(rects, dtype=np.int32).reshape(-1, 4)
+        return self._last_rects, scores
+
+    def best_face_crop(self, face_id: str) -> Optional[np.ndarray]:
+        """Highest-quality crop seen for a currently tracked FaceID (e.g. for manual enrollment)."""
+        for track_id, mapped in self.id_mapping.items():
+            if mapped == face_id:
+                return self.embedding_cache.best_crop(track_id)
+        return None
+
+    @staticmethod
+    def _temporary_id(centroid_id: int) -> str:
+        return f"User_ID:TRK_{centroid_id:03d}"
+
+    def _identify(self, centroid_id: int, embedding: np.ndarray, matched_fid: Optional[str]) -> str:
+        """
+        Resolves a persistent FaceID for a tracker from its gallery match (or registration).
+        On re-verification of an identified tracker, a different gallery match replaces the
+        current FaceID; no match keeps it.
+        """
+        current = self.id_mapping.get(centroid_id)
+        if current == self._temporary_id(centroid_id):
+            current = None # Not embedded before: resolve (and auto-register) like a new track
+        if current is not None and matched_fid != current:
+            if matched_fid is None:
+                return current
+            logger.info(f"🔁 Track {centroid_id} re-identified: {current} -> {matched_fid}")
+
+        face_id = matched_fid
+        
+        if face_id is None:
+            if self.auto_reg:
+                # New Identity Registration - only if auto_reg is enabled
+                face_id = self.reid.allocate_face_id()
+                self.reid.register_face(face_id, embedding)
+                logger.info(f"🆕 New face registered: {face_id}")
+            else:
+                # If not auto-registering, use a temporary tracking ID
+                face_id = self._temporary_id(centroid_id)
+        else:
+            # Refresh last_seen so the identity survives stale-entry cleanup
+            self.reid.touch(face_id)
+        
+        self.id_mapping[centroid_id] = face_id
+        return face_id
 
     def cleanup(self, max_age_seconds: int = 86400):
         """Perform cloud/local cleanup for old identities."""
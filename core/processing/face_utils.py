@@ -3,6 +3,8 @@ import numpy as np
 import os
 import time
 from typing import List, Tuple, Dict, Optional
+from core.models.model_registry import ModelRegistry
+from core.processing.face_quality import FaceQualityScorer
 from core.utils.logger import get_logger
 
 # Unified logger initialization
@@ -18,10 +20,24 @@ class FaceUtils:
     AGE_LIST = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
     GENDER_LIST = ['Male', 'Female']
     MODEL_MEAN_VALUES = (78.4263377603, 87.7689143744, 114.895847746)
+    COMPONENTS = ("face", "age", "gender", "reid")
+    REID_MODEL = "openface.nn4.small2.v1.t7"
 
-    def __init__(self, models_path: str = "assets/weights/face_models", use_opencl: bool = True):
+    def __init__(self, models_path: str = "assets/weights/face_models", use_opencl: bool = True,
+                 components: Tuple[str, ...] = COMPONENTS, reid_model_path: Optional[str] = None):
+        """
+        Args:
+            components: Networks to load (subset of COMPONENTS); e.g. ("reid",) for an embedder only.
+                is_ready means all requested networks loaded.
+            reid_model_path: Embedding network file (default: REID_MODEL inside models_path)
+        """
+        unknown = set(components) - set(self.COMPONENTS)
+        if unknown:
+            raise ValueError(f"Unknown FaceUtils components {sorted(unknown)}. Available: {list(self.COMPONENTS)}")
         self.models_path = models_path
         self.use_opencl = use_opencl
+        self.components = tuple(components)
+        self.reid_model_path = reid_model_path or os.path.join(models_path, self.REID_MODEL)
         self.is_ready = False
         
         # Initialize model attributes
@@ -29,6 +45,8 @@ class FaceUtils:
         self.age_net = None
         self.gender_net = None
         self.reid_net = None
+        # Cheap pre-DNN gate: blurry, tiny or cut-off crops skip the age/gender/embedding nets
+        self.quality = FaceQualityScorer()
         
         self._load_models()
 
@@ -39,73 +57,106 @@ class FaceUtils:
                 "face": (os.path.join(self.models_path, "face_net.caffemodel"), os.path.join(self.models_path, "face_deploy.prototxt")),
                 "age": (os.path.join(self.models_path, "age_net.caffemodel"), os.path.join(self.models_path, "age_deploy.prototxt")),
                 "gender": (os.path.join(self.models_path, "gender_net.caffemodel"), os.path.join(self.models_path, "gender_deploy.prototxt")),
-                "reid": (os.path.join(self.models_path, "openface.nn4.small2.v1.t7"), None)
+                "reid": (self.reid_model_path, None)
             }
 
-            for key, (model, proto) in paths.items():
+            for key in self.components:
+                model, proto = paths[key]
                 if not os.path.exists(model) or (proto and not os.path.exists(proto)):
                     raise FileNotFoundError(f"Model files not found: {model} or {proto}")
 
-            self.face_net = cv2.dnn.readNet(paths["face"][0], paths["face"][1])
-            self.age_net = cv2.dnn.readNet(paths["age"][0], paths["age"][1])
-            self.gender_net = cv2.dnn.readNet(paths["gender"][0], paths["gender"][1])
-            self.reid_net = cv2.dnn.readNetFromTorch(paths["reid"][0])
+            # Networks are shared process-wide: every FaceUtils instance reuses the same weights
+            face_target = cv2.dnn.DNN_TARGET_OPENCL if self.use_opencl else cv2.dnn.DNN_TARGET_CPU
+            if "face" in self.components:
+                self.face_net = ModelRegistry.get_net(*paths["face"], target=face_target, input_shape=(1, 3, 300, 300))
+            if "age" in self.components:
+                self.age_net = ModelRegistry.get_net(*paths["age"], input_shape=(1, 3, 227, 227))
+            if "gender" in self.components:
+                self.gender_net = ModelRegistry.get_net(*paths["gender"], input_shape=(1, 3, 227, 227))
+            if "reid" in self.components:
+                self.reid_net = ModelRegistry.get_net(*paths["reid"], input_shape=(1, 3, 96, 96))
 
             # Hardware acceleration settings
             if self.use_opencl:
-                self.face_net.setPreferableBackend(cv2.dnn.DNN_BACKEND_DEFAULT)
-                self.face_net.setPreferableTarget(cv2.dnn.DNN_TARGET_OPENCL)
                 logger.info("🚀 FaceUtils: OpenCL acceleration mode enabled")
 
             self.is_ready = True
-            logger.info("✅ FaceUtils: All models loaded successfully")
+            logger.info(f"✅ FaceUtils: Models loaded successfully ({', '.join(self.components)})")
 
         except Exception as e:
             logger.error(f"❌ Model load process failed: {e}")
             self.is_ready = False
 
-    def detect_faces(self, frame: np.ndarray, conf_threshold: float = 0.7) -> List[Tuple[int, int, int, int]]:
+    def detect_face_boxes(self, frame: np.ndarray, conf_threshold: float = 0.7,
+                          nms_threshold: Optional[float] = None, return_scores: bool = False):
         """
-        Detects faces in the frame and returns their coordinates.
+        Detects faces in the frame and returns their coordinates as an array.
+        SSD post-processing is fully vectorized (no per-detection Python loop).
         
         Args:
             frame: Input image (BGR)
             conf_threshold: Confidence threshold for detection
+            nms_threshold: Optional IoU threshold for class-agnostic NMS (None = disabled)
+            return_scores: Also return the (N,) float32 detector confidences
             
         Returns:
-            List of (x1, y1, x2, y2) tuples
+            (N, 4) int32 array of (x1, y1, x2, y2) boxes (and the scores if requested)
         """
-        if not self.is_ready or frame is None or frame.size == 0:
-            return []
+        if not self.is_ready or self.face_net is None or frame is None or frame.size == 0:
+            boxes = np.empty((0, 4), dtype=np.int32)
+            return (boxes, np.empty(0, dtype=np.float32)) if return_scores else boxes
 
         h, w = frame.shape[:2]
         blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), [104, 117, 123], False, False)
         
         self.face_net.setInput(blob)
         detections = self.face_net.forward()
+
+        # (num_detections, 7): [image_id, label, confidence, x1, y1, x2, y2] (normalized)
+        detections = detections.reshape(-1, 7)
+        detections = detections[detections[:, 2] > conf_threshold]
+
+        # Coordinate normalization and boundary handling
+        boxes = (detections[:, 3:7] * np.array([w, h, w, h], dtype=np.float32)).astype(np.int32)
+        np.clip(boxes[:, 0::2], 0, w - 1, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, h - 1, out=boxes[:, 1::2])
+
+        # Drop degenerate boxes
+        valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+        boxes, scores = boxes[valid], detections[valid, 2]
+
+        if nms_threshold is not None and len(boxes) > 1:
+            xywh = np.column_stack((boxes[:, :2], boxes[:, 2:] - boxes[:, :2])).tolist()
+            keep = np.asarray(cv2.dnn.NMSBoxes(xywh, scores.tolist(), conf_threshold, nms_threshold), dtype=np.int64).reshape(-1)
+            boxes, scores = boxes[keep], scores[keep]
+
+        return (boxes, scores.astype(np.float32)) if return_scores else boxes
+
+    def detect_faces(self, frame: np.ndarray, conf_threshold: float = 0.7,
+                     nms_threshold: Optional[float] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        Detects faces in the frame and returns their coordinates.
+        Compatibility view over detect_face_boxes.
         
-        face_boxes = []
-        # Optimization: Reference fixed shape value outside the loop
-        num_detections = detections.shape[2]
-        
-        for i in range(num_detections):
-            confidence = detections[0, 0, i, 2]
-            if confidence > conf_threshold:
-                # Coordinate normalization and boundary handling
-                x1 = max(0, int(detections[0, 0, i, 3] * w))
-                y1 = max(0, int(detections[0, 0, i, 4] * h))
-                x2 = min(w - 1, int(detections[0, 0, i, 5] * w))
-                y2 = min(h - 1, int(detections[0, 0, i, 6] * h))
-                
-                # Check if the box has valid dimensions
-                if x2 > x1 and y2 > y1:
-                    face_boxes.append((x1, y1, x2, y2))
-        return face_boxes
-
-    def _classify_common(self, net: cv2.dnn.Net, face_img: np.ndarray, labels: List[str]) -> str:
+        Args:
+            frame: Input image (BGR)
+            conf_threshold: Confidence threshold for detection
+            nms_threshold: Optional IoU threshold for class-agnostic NMS (None = disabled)
+            
+        Returns:
+            List of (x1, y1, x2, y2) tuples
+        """
+        return [tuple(box) for box in self.detect_face_boxes(frame, conf_threshold, nms_threshold).tolist()]
+
+    def _classify_common(self, net: cv2.dnn.Net, face_img: np.ndarray, labels: List[str],
+                         min_quality: Optional[float] = None) -> str:
         """Common classification logic (deduplication and stability)"""
         if not self.is_ready or net is None or face_img is None or face_img.size == 0:
             return "Unknown"
+        # Low-quality crops (blurry / tiny) would only produce noisy labels
+        threshold = self.quality.min_quality if min_quality is None else min_quality
+        if threshold > 0 and self.quality.score_crop(face_img) < threshold:
+            return "Unknown"
             
         try:
             blob = cv2.dnn.blobFromImage(face_img, 1.0, (227, 227), self.MODEL_MEAN_VALUES, swapRB=False)
@@ -116,13 +167,69 @@ class FaceUtils:
             logger.warning(f"Error during classification: {e}")
             return "Unknown"
 
-    def classify_gender(self, face_img: np.ndarray) -> str:
-        """Categorize gender (Male/Female) from a face image snippet"""
-        return self._classify_common(self.gender_net, face_img, self.GENDER_LIST)
+    def classify_gender(self, face_img: np.ndarray, min_quality: Optional[float] = None) -> str:
+        """Categorize gender (Male/Female) from a face image snippet ("Unknown" below min_quality; 0 disables the gate)"""
+        return self._classify_common(self.gender_net, face_img, self.GENDER_LIST, min_quality)
+
+    def classify_age(self, face_img: np.ndarray, min_quality: Optional[float] = None) -> str:
+        """Estimate age range from a face image snippet ("Unknown" below min_quality; 0 disables the gate)"""
+        return self._classify_common(self.age_net, face_img, self.AGE_LIST, min_quality)
+
+    def classify_attributes(self, frame: np.ndarray, rects,
+                            min_quality: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        Age and gender for all faces of one frame: the crops are preprocessed into a single
+        227x227 blob, which feeds one batched forward pass of each network.
+        
+        Args:
+            frame: Input image (BGR)
+            rects: Sequence of (x1, y1, x2, y2) boxes
+            min_quality: Faces scoring below this (FaceQualityScorer) are not classified;
+                None uses the scorer default, 0 disables the gate
+            
+        Returns:
+            (ages, genders): label lists in the order of `rects` ("Unknown" where not classified)
+        """
+        num_rects = len(rects)
+        ages, genders = ["Unknown"] * num_rects, ["Unknown"] * num_rects
+        if not self.is_ready or (self.age_net is None and self.gender_net is None) or num_rects == 0:
+            return ages, genders
+
+        valid, crops = self._crops(frame, rects)
+        threshold = self.quality.min_quality if min_quality is None else min_quality
+        if threshold > 0 and valid.size:
+            keep = self.quality.passes(self.quality.score(frame, np.asarray(rects).reshape(-1, 4)[valid]))
+            valid, crops = valid[keep], [crop for crop, ok in zip(crops, keep) if ok]
+        if valid.size == 0:
+            return ages, genders
+
+        try:
+            blob = cv2.dnn.blobFromImages(crops, 1.0, (227, 227), self.MODEL_MEAN_VALUES, swapRB=False)
+            for net, labels, out in ((self.age_net, self.AGE_LIST, ages), (self.gender_net, self.GENDER_LIST, genders)):
+                if net is None:
+                    continue
+                net.setInput(blob)
+                preds = net.forward().reshape(valid.size, -1)
+                for i, label in zip(valid.tolist(), preds.argmax(axis=1).tolist()):
+                    out[i] = labels[label]
+        except Exception as e:
+            logger.warning(f"Batch attribute classification failed: {e}")
+        return ages, genders
+
+    def _crops(self, frame: np.ndarray, rects) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """Indices of the boxes with a non-empty crop (after clipping to the frame) and those crops."""
+        if frame is None or frame.size == 0:
+            return np.empty(0, dtype=np.int64), []
+        h, w = frame.shape[:2]
+        boxes = np.asarray(rects, dtype=np.int32).reshape(-1, 4).copy()
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h)
+        valid = np.flatnonzero((boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1]))
+        return valid, [frame[y1:y2, x1:x2] for (x1, y1, x2, y2) in boxes[valid].tolist()]
 
-    def classify_age(self, face_img: np.ndarray) -> str:
-        """Estimate age range from a face image snippet"""
-        return self._classify_common(self.age_net, face_img, self.AGE_LIST)
+    def _embedding_blob(self, face_imgs: List[np.ndarray]) -> np.ndarray:
+        """Builds one OpenFace input blob (N x 3 x 96 x 96, RGB, [0, 1]) from BGR face crops."""
+        return cv2.dnn.blobFromImages(face_imgs, 1.0/255, (96, 96), (0, 0, 0), swapRB=True, crop=False)
 
     def get_face_embedding(self, face_img: np.ndarray) -> Optional[np.ndarray]:
         """Extracts a 128-dimensional embedding vector from a face image."""
@@ -131,10 +238,36 @@ class FaceUtils:
         
         try:
             # Preprocess for OpenFace (96x96 RGB)
-            face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-            blob = cv2.dnn.blobFromImage(face_rgb, 1.0/255, (96, 96), (0, 0, 0), swapRB=False, crop=False)
-            self.reid_net.setInput(blob)
+            self.reid_net.setInput(self._embedding_blob([face_img]))
             return self.reid_net.forward().flatten()
         except Exception as e:
             logger.warning(f"Embedding extraction failed: {e}")
             return None
+
+    def get_face_embeddings(self, frame: np.ndarray, rects) -> np.ndarray:
+        """
+        Extracts 128-dimensional embeddings for several faces of one frame in a single forward pass.
+        
+        Args:
+            frame: Input image (BGR)
+            rects: Sequence of (x1, y1, x2, y2) boxes, e.g. the output of detect_faces
+            
+        Returns:
+            (N, 128) float32 matrix in the order of `rects`. Rows whose crop is empty
+            (degenerate box) or that could not be computed are filled with NaN.
+        """
+        num_rects = len(rects)
+        embeddings = np.full((num_rects, 128), np.nan, dtype=np.float32)
+        if not self.is_ready or self.reid_net is None or frame is None or frame.size == 0 or num_rects == 0:
+            return embeddings
+
+        valid, crops = self._crops(frame, rects)
+        if valid.size == 0:
+            return embeddings
+
+        try:
+            self.reid_net.setInput(self._embedding_blob(crops))
+            embeddings[valid] = self.reid_net.forward().reshape(valid.size, -1)
+        except Exception as e:
+            logger.warning(f"Batch embedding extraction failed: {e}")
+        return embeddings
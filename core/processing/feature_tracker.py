@@ -1,133 +1,211 @@
 import numpy as np
 from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
+from core.processing.assignment import greedy_assignment, pairwise_distances, track_matches
 
 class FeatureMatchTracker:
     """
     Advanced tracker combine Centroid (Spatial) and Feature Vector (Appearance).
     Uses weighted matching to maintain ID consistency even with occlusion.
+
+    State is stacked per track (ids, centroids, disappeared counts and an (N, D) feature
+    bank with a cached L2-normalized copy), so the combined cost matrix is one matrix
+    multiply plus one broadcast distance computation.
     """
-    def __init__(self, max_disappeared: int = 40, feature_weight: float = 0.7):
+    # Spatial distances are normalized by this fraction of the frame diagonal
+    # (0.34 x the 1280x720 diagonal ~= the former fixed 500 px)
+    FAR_DISTANCE_RATIO = 0.34
+    FAR_DISTANCE_PX = 500.0 # Fallback when the frame size is unknown
+    MATCH_THRESHOLD = 0.8
+    FEATURE_MOMENTUM = 0.8
+
+    def __init__(self, max_disappeared: int = 40, feature_weight: float = 0.7,
+                 far_distance_ratio: float = FAR_DISTANCE_RATIO):
         self.next_id = 0
-        self.objects = OrderedDict()        # ID -> Centroid
-        self.features = OrderedDict()       # ID -> Feature Vector
-        self.disappeared = OrderedDict()     # ID -> Disappeared Frames Count
         self.max_disappeared = max_disappeared
         self.feature_weight = feature_weight # Weight for feature similarity (0.0 to 1.0)
+        self.far_distance_ratio = far_distance_ratio
+        self.frame_shape: Optional[Tuple[int, int]] = None
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.centroids = np.empty((0, 2), dtype=int)
+        self.disappeared_counts = np.empty(0, dtype=np.int64)
+        self.feature_bank: Optional[np.ndarray] = None  # (N, D) momentum-averaged features
+        self._normed: Optional[np.ndarray] = None       # (N, D) L2-normalized copy of feature_bank
+        self.has_feature = np.empty(0, dtype=bool)
+
+    # --- Views ------------------------------------------------------------
+
+    @property
+    def objects(self) -> "OrderedDict[int, np.ndarray]":
+        """ID -> Centroid (copies; later updates modify the centroid array in place)"""
+        return OrderedDict(zip(self.ids.tolist(), self.centroids.copy()))
+
+    @property
+    def disappeared(self) -> "OrderedDict[int, int]":
+        """ID -> Disappeared Frames Count"""
+        return OrderedDict(zip(self.ids.tolist(), self.disappeared_counts.tolist()))
+
+    @property
+    def features(self) -> "OrderedDict[int, Optional[np.ndarray]]":
+        """ID -> Feature Vector"""
+        return OrderedDict((oid, self.get_feature(oid)) for oid in self.ids.tolist())
+
+    def get_feature(self, object_id):
+        rows = np.flatnonzero(self.ids == object_id)
+        if len(rows) == 0 or not self.has_feature[rows[0]]:
+            return None
+        return self.feature_bank[rows[0]].copy()
+
+    # --- Feature bank -----------------------------------------------------
+
+    @staticmethod
+    def _normalize(features: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return np.divide(features, norms, out=np.zeros_like(features), where=norms > 0)
+
+    def _stack_features(self, features, count: int) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Stacks per-detection features into (M, D); rows that are None/invalid are masked out."""
+        if features is None:
+            return None, np.zeros(count, dtype=bool)
+        dim = self.feature_bank.shape[1] if self.feature_bank is not None else None
+        if dim is None:
+            dim = next((np.asarray(f).size for f in features if f is not None and np.asarray(f).dtype != object), None)
+            if dim is None:
+                return None, np.zeros(count, dtype=bool)
+        stacked = np.zeros((count, dim), dtype=np.float32)
+        valid = np.zeros(count, dtype=bool)
+        for j, f in enumerate(features):
+            if f is None:
+                continue
+            f = np.asarray(f)
+            if f.dtype != object and f.size == dim:
+                stacked[j] = f.ravel()
+                valid[j] = np.isfinite(stacked[j]).all()
+        return stacked, valid
+
+    def _ensure_bank(self, dim: int):
+        """Allocates a zero feature bank for the existing (feature-less) tracks when features first arrive."""
+        if self.feature_bank is None:
+            self.feature_bank = np.zeros((len(self.ids), dim), dtype=np.float32)
+            self._normed = self.feature_bank.copy()
+
+    # --- Track management -------------------------------------------------
+
+    def _register_many(self, centroids: np.ndarray, feats: Optional[np.ndarray], valid: np.ndarray):
+        count = len(centroids)
+        if count == 0:
+            return
+        if feats is not None:
+            self._ensure_bank(feats.shape[1])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count, dtype=np.int64)])
+        self.centroids = np.concatenate([self.centroids, centroids.astype(int).reshape(-1, 2)])
+        self.disappeared_counts = np.concatenate([self.disappeared_counts, np.zeros(count, dtype=np.int64)])
+        self.has_feature = np.concatenate([self.has_feature, valid])
+        if self.feature_bank is not None:
+            new = feats if feats is not None else np.zeros((count, self.feature_bank.shape[1]), dtype=np.float32)
+            self.feature_bank = np.concatenate([self.feature_bank, new])
+            self._normed = np.concatenate([self._normed, self._normalize(new)])
+        self.next_id += count
 
     def register(self, centroid, feature=None):
-        self.objects[self.next_id] = centroid
-        self.features[self.next_id] = feature
-        self.disappeared[self.next_id] = 0
-        self.next_id += 1
+        feats, valid = self._stack_features(None if feature is None else [feature], 1)
+        self._register_many(np.asarray(centroid).reshape(1, 2), feats, valid)
+
+    def _keep(self, keep: np.ndarray):
+        self.ids = self.ids[keep]
+        self.centroids = self.centroids[keep]
+        self.disappeared_counts = self.disappeared_counts[keep]
+        self.has_feature = self.has_feature[keep]
+        if self.feature_bank is not None:
+            self.feature_bank = self.feature_bank[keep]
+            self._normed = self._normed[keep]
 
     def deregister(self, object_id):
-        del self.objects[object_id]
-        del self.features[object_id]
-        del self.disappeared[object_id]
-
-    def _cosine_similarity(self, v1, v2):
-        if v1 is None or v2 is None:
-            return 0.0
-        dot_product = np.dot(v1, v2)
-        norm_v1 = np.linalg.norm(v1)
-        norm_v2 = np.linalg.norm(v2)
-        if norm_v1 == 0 or norm_v2 == 0:
-            return 0.0
-        return dot_product / (norm_v1 * norm_v2)
-
-    def update(self, rects, features=None):
+        self._keep(self.ids != object_id)
+
+    def _age(self, rows: np.ndarray):
+        self.disappeared_counts[rows] += 1
+        if (self.disappeared_counts > self.max_disappeared).any():
+            self._keep(self.disappeared_counts <= self.max_disappeared)
+
+    def _far_distance(self) -> float:
+        if self.frame_shape is None:
+            return self.FAR_DISTANCE_PX
+        h, w = self.frame_shape[:2]
+        return self.far_distance_ratio * float(np.hypot(w, h))
+
+    def cost_matrix(self, input_centroids: np.ndarray, feats: Optional[np.ndarray], valid: np.ndarray) -> np.ndarray:
+        """(N tracks, M detections) combined cost: weighted spatial and appearance (1 - cosine) terms."""
+        # 1. Spatial Distance (Normalized): distance over the "far" distance saturates at 1
+        spatial = np.minimum(1.0, pairwise_distances(self.centroids, input_centroids) / self._far_distance())
+
+        # 2. Appearance Distance (1 - Cosine Similarity), 1.0 where either side has no feature
+        appearance = np.ones_like(spatial)
+        if feats is not None and self._normed is not None:
+            sim = self._normed @ self._normalize(feats).T
+            both = self.has_feature[:, None] & valid[None, :]
+            appearance[both] = 1.0 - sim[both]
+
+        # Combined Score (Lower is better match)
+        return (1 - self.feature_weight) * spatial + self.feature_weight * appearance
+
+    def update(self, rects, features=None, frame_shape: Optional[Tuple[int, ...]] = None):
         """
         Args:
             rects: List of [startX, startY, endX, endY]
             features: List of feature vectors (optional)
+            frame_shape: Frame shape (h, w, ...) for resolution-aware spatial normalization (remembered)
         """
-        if len(rects) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-            return self.objects
-
-        input_centroids = np.zeros((len(rects), 2), dtype="int")
-        for (i, (startX, startY, endX, endY)) in enumerate(rects):
-            cX = int((startX + endX) / 2.0)
-            cY = int((startY + endY) / 2.0)
-            input_centroids[i] = (cX, cY)
-
-        if len(self.objects) == 0:
-            for i in range(0, len(input_centroids)):
-                feat = features[i] if features is not None else None
-                self.register(input_centroids[i], feat)
-        else:
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-            object_features = list(self.features.values())
-
-            # Combined Distance Matrix
-            num_obj = len(object_centroids)
-            num_in = len(input_centroids)
-            D = np.zeros((num_obj, num_in))
-
-            for i in range(num_obj):
-                for j in range(num_in):
-                    # 1. Spatial Distance (Normalized)
-                    spatial_dist = np.linalg.norm(object_centroids[i] - input_centroids[j])
-                    # Simple normalization: distance over 500px is "far"
-                    spatial_score = min(1.0, spatial_dist / 500.0) 
-
-                    # 2. Appearance Distance (1 - Cosine Similarity)
-                    appearance_score = 1.0
-                    if features is not None and object_features[i] is not None:
-                        sim = self._cosine_similarity(object_features[i], features[j])
-                        appearance_score = 1.0 - sim
-                    
-                    # Combined Score (Lower is better match)
-                    D[i, j] = (1 - self.feature_weight) * spatial_score + self.feature_weight * appearance_score
-
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
-
-            used_rows = set()
-            used_cols = set()
-
-            for (row, col) in zip(rows, cols):
-                if row in used_rows or col in used_cols:
-                    continue
-
-                # Threshold check: If match score is too high, it might be a different object
-                if D[row, col] > 0.8: 
-                    continue
-
-                object_id = object_ids[row]
-                self.objects[object_id] = input_centroids[col]
-                # Update features with a small momentum to handle appearance changes
-                if features is not None:
-                    new_feat = features[col]
-                    if self.features[object_id] is not None:
-                        self.features[object_id] = 0.8 * self.features[object_id] + 0.2 * new_feat
-                    else:
-                        self.features[object_id] = new_feat
-                
-                self.disappeared[object_id] = 0
-                used_rows.add(row)
-                used_cols.add(col)
-
-            unused_rows = set(range(0, D.shape[0])).difference(used_rows)
-            unused_cols = set(range(0, D.shape[1])).difference(used_cols)
-
-            if D.shape[0] >= D.shape[1]:
-                for row in unused_rows:
-                    object_id = object_ids[row]
-                    self.disappeared[object_id] += 1
-                    if self.disappeared[object_id] > self.max_disappeared:
-                        self.deregister(object_id)
-            else:
-                for col in unused_cols:
-                    feat = features[col] if features is not None else None
-                    self.register(input_centroids[col], feat)
-
-        return self.objects
+        return self.update_with_matches(rects, features, frame_shape)[0]
 
-    def get_feature(self, object_id):
-        return self.features.get(object_id)
+    def update_with_matches(self, rects, features=None, frame_shape: Optional[Tuple[int, ...]] = None):
+        """Same as update, also returning (matches, new_detections) like CentroidTracker.update_with_matches."""
+        if frame_shape is not None:
+            self.frame_shape = tuple(frame_shape[:2])
+
+        if len(rects) == 0:
+            self._age(np.arange(len(self.ids)))
+            return self.objects, np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # Accepts both (N, 4) box arrays and lists of (startX, startY, endX, endY) tuples
+        boxes = np.asarray(rects, dtype="float").reshape(-1, 4)
+        input_centroids = ((boxes[:, :2] + boxes[:, 2:]) / 2.0).astype("int")
+        feats, valid = self._stack_features(features, len(input_centroids))
+        if feats is not None:
+            self._ensure_bank(feats.shape[1])
+
+        if len(self.ids) == 0:
+            new_detections = np.arange(len(input_centroids))
+            self._register_many(input_centroids, feats, valid)
+            return self.objects, np.stack([self.ids, new_detections], axis=1), new_detections
+
+        D = self.cost_matrix(input_centroids, feats, valid)
+        # Threshold check: If match score is too high, it might be a different object
+        rows, cols = greedy_assignment(D, max_cost=self.MATCH_THRESHOLD)
+
+        self.centroids[rows] = input_centroids[cols]
+        self.disappeared_counts[rows] = 0
+        if feats is not None:
+            # Update features with a small momentum to handle appearance changes
+            upd = valid[cols]
+            rows_f, cols_f = rows[upd], cols[upd]
+            m = self.FEATURE_MOMENTUM
+            blend = self.has_feature[rows_f][:, None]
+            self.feature_bank[rows_f] = np.where(blend, m * self.feature_bank[rows_f] + (1 - m) * feats[cols_f], feats[cols_f])
+            self._normed[rows_f] = self._normalize(self.feature_bank[rows_f])
+            self.has_feature[rows_f] = True
+
+        matched_ids = self.ids[rows]
+        unmatched_rows = np.ones(len(self.ids), dtype=bool)
+        unmatched_rows[rows] = False
+        unmatched_cols = np.ones(len(input_centroids), dtype=bool)
+        unmatched_cols[cols] = False
+        new_detections = np.flatnonzero(unmatched_cols)
+
+        self._age(np.flatnonzero(unmatched_rows))
+        first_new_id = self.next_id
+        self._register_many(input_centroids[new_detections],
+                            feats[new_detections] if feats is not None else None, valid[new_detections])
+
+        return self.objects, track_matches(matched_ids, cols, first_new_id, new_detections), new_detections
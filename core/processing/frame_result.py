@@ -0,0 +1,155 @@
+import datetime
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence
+
+class PersonView:
+    """
+    Lightweight row view into a FrameResult (one tracked face).
+    Exposes the attributes of the former per-face Person object (id, rect, centroid,
+    age, gender, last_seen) without copying anything until an attribute is read.
+    """
+    __slots__ = ("_result", "_row")
+
+    def __init__(self, result: "FrameResult", row: int):
+        self._result = result
+        self._row = row
+
+    @property
+    def id(self) -> str:
+        return self._result.ids[self._row]
+
+    @property
+    def track_id(self) -> int:
+        return int(self._result.track_ids[self._row])
+
+    @property
+    def rect(self) -> tuple:
+        """(x1, y1, x2, y2) as Python ints."""
+        return tuple(self._result.boxes[self._row].tolist())
+
+    @property
+    def centroid(self) -> np.ndarray:
+        return self._result.centroids[self._row]
+
+    @property
+    def age(self) -> str:
+        return self._result.attribute("age")[self._row]
+
+    @property
+    def gender(self) -> str:
+        return self._result.attribute("gender")[self._row]
+
+    @property
+    def last_seen(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self._result.timestamp)
+
+    def __repr__(self):
+        return f"PersonView(id={self.id!r}, rect={self.rect})"
+
+class FrameResult:
+    """
+    Structure-of-arrays result of one processed frame.
+
+    - ids: persistent FaceIDs (list of str), with `index` as FaceID -> row
+    - track_ids: (N,) int64 tracker IDs
+    - boxes: (N, 4) contiguous int32 (x1, y1, x2, y2)
+    - centroids: (N, 2) float32
+    - attributes: per-field columns (list per name, e.g. "age", "gender")
+    - timestamp: one wall-clock time for the whole frame
+
+    A frame costs a handful of array allocations regardless of the number of faces.
+    Iterating (or indexing) yields PersonView rows for code written against Person objects.
+    """
+    DEFAULT_ATTRIBUTE = "Unknown"
+
+    def __init__(self, ids: Sequence[str], track_ids, boxes, centroids,
+                 attributes: Optional[Dict[str, Sequence]] = None, timestamp: Optional[float] = None):
+        self.ids: List[str] = list(ids)
+        self.track_ids = np.ascontiguousarray(track_ids, dtype=np.int64).reshape(-1)
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32).reshape(-1, 2)
+        self.attributes: Dict[str, list] = {k: list(v) for k, v in (attributes or {}).items()}
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._index: Optional[Dict[str, int]] = None
+        if not (len(self.ids) == len(self.track_ids) == len(self.boxes) == len(self.centroids)):
+            raise ValueError("FrameResult columns must have the same length")
+
+    @classmethod
+    def empty(cls) -> "FrameResult":
+        return cls([], np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.int32), np.empty((0, 2), dtype=np.float32))
+
+    # --- Columns ------------------------------------------------------------
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """FaceID -> row (built on first use)."""
+        if self._index is None:
+            self._index = {face_id: row for row, face_id in enumerate(self.ids)}
+        return self._index
+
+    def attribute(self, name: str) -> list:
+        """Column for `name`; missing attributes read as "Unknown"."""
+        column = self.attributes.get(name)
+        return column if column is not None else [self.DEFAULT_ATTRIBUTE] * len(self.ids)
+
+    def set_attribute(self, name: str, values: Sequence):
+        if len(values) != len(self.ids):
+            raise ValueError(f"Attribute '{name}' has {len(values)} values for {len(self.ids)} rows")
+        self.attributes[name] = list(values)
+
+    # --- Row access -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[PersonView]:
+        return (PersonView(self, row) for row in range(len(self.ids)))
+
+    def __getitem__(self, row: int) -> PersonView:
+        if not -len(self.ids) <= row < len(self.ids):
+            raise IndexError(row)
+        return PersonView(self, row % len(self.ids))
+
+    def get(self, face_id: str) -> Optional[PersonView]:
+        row = self.index.get(face_id)
+        return None if row is None else PersonView(self, row)
+
+    # --- Conversion -----------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        """Column-oriented, JSON-serializable dict (one tolist() per column)."""
+        return {
+            "ids": self.ids,
+            "track_ids": self.track_ids.tolist(),
+            "boxes": self.boxes.tolist(),
+            "centroids": self.centroids.tolist(),
+            "attributes": self.attributes,
+            "timestamp": self.timestamp,
+        }
+
+    def to_records(self, fields: Sequence[str] = ("age", "gender")) -> List[dict]:
+        """Row-oriented dicts ({"id", "rect", "centroid", <fields>...}) as sent to the web UI."""
+        columns = [self.ids, self.boxes.tolist(), self.centroids.tolist()] + [self.attribute(f) for f in fields]
+        keys = ["id", "rect", "centroid", *fields]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+    def to_arrow(self):
+        """
+        pyarrow.Table with one row per face. Numeric columns wrap the NumPy buffers
+        without copying (boxes/centroids as fixed-size lists over the flat arrays).
+        `pyarrow` is imported here so it stays an optional dependency.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("FrameResult.to_arrow requires 'pyarrow' (pip install pyarrow)") from e
+        columns = {
+            "id": pa.array(self.ids, type=pa.string()),
+            "track_id": pa.array(self.track_ids),
+            "box": pa.FixedSizeListArray.from_arrays(pa.array(self.boxes.reshape(-1)), 4),
+            "centroid": pa.FixedSizeListArray.from_arrays(pa.array(self.centroids.reshape(-1)), 2),
+        }
+        for name, values in self.attributes.items():
+            columns[name] = pa.array(values)
+        return pa.table(columns)
@@ -0,0 +1,192 @@
+import numpy as np
+from collections import OrderedDict
+from typing import Optional
+from core.processing.assignment import iou_matrix, optimal_assignment, track_matches
+
+# 0.95 quantile of the chi-square distribution with 4 degrees of freedom (cx, cy, w, h)
+CHI2_GATE_4DOF = 9.4877
+
+class KalmanTracker:
+    """
+    SORT-style multi-object tracker with a constant-velocity Kalman filter per track.
+
+    State per track: [cx, cy, w, h, vx, vy, vw, vh] (pixels, pixels/frame).
+    All tracks live in stacked arrays (means (N, 8), covariances (N, 8, 8)), so predict
+    and update are single batched matrix operations.
+    Matching runs in two stages on the predicted boxes:
+    1. IoU (cost 1 - IoU, pairs below `min_iou` gated out)
+    2. Mahalanobis distance for what is left (gated at the chi-square 95% quantile),
+       which re-acquires fast movers whose predicted box no longer overlaps the detection.
+
+    Drop-in replacement for CentroidTracker: `update(rects)` returns ID -> centroid.
+    """
+    # Noise relative to the box height (as in DeepSORT)
+    STD_WEIGHT_POSITION = 1.0 / 20
+    STD_WEIGHT_VELOCITY = 1.0 / 160
+    MIN_VARIANCE = 1e-6   # px^2 added to the innovation covariance diagonal (keeps S invertible)
+
+    def __init__(self, max_disappeared: int = 20, min_iou: float = 0.3, gate: float = CHI2_GATE_4DOF):
+        self.next_id = 0
+        self.max_disappeared = max_disappeared
+        self.min_iou = min_iou
+        self.gate = gate
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.mean = np.empty((0, 8))
+        self.covariance = np.empty((0, 8, 8))
+        self.disappeared_counts = np.empty(0, dtype=np.int64)
+        self.hits = np.empty(0, dtype=np.int64)
+
+        self._F = np.eye(8)
+        self._F[:4, 4:] = np.eye(4)   # x += v (dt = 1 frame)
+        self._H = np.eye(4, 8)
+
+    # --- Views ------------------------------------------------------------
+
+    @property
+    def centroids(self) -> np.ndarray:
+        return self.mean[:, :2].astype(int)
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """(N, 4) int boxes (startX, startY, endX, endY) of the current state."""
+        return self._to_boxes(self.mean[:, :4]).astype(int)
+
+    def predicted_boxes(self) -> np.ndarray:
+        """(n, 4) int boxes one frame ahead for the tracks matched on the last update (state unchanged)."""
+        live = self.disappeared_counts == 0
+        return self._to_boxes((self.mean[live] @ self._F.T)[:, :4]).astype(int)
+
+    @property
+    def objects(self) -> "OrderedDict[int, np.ndarray]":
+        """ID -> centroid view (same shape as CentroidTracker.objects)."""
+        return OrderedDict(zip(self.ids.tolist(), self.centroids))
+
+    @property
+    def disappeared(self) -> "OrderedDict[int, int]":
+        return OrderedDict(zip(self.ids.tolist(), self.disappeared_counts.tolist()))
+
+    @staticmethod
+    def _to_boxes(cxcywh: np.ndarray) -> np.ndarray:
+        half = cxcywh[:, 2:4] / 2.0
+        return np.hstack([cxcywh[:, :2] - half, cxcywh[:, :2] + half])
+
+    @staticmethod
+    def _to_measurements(boxes: np.ndarray) -> np.ndarray:
+        wh = boxes[:, 2:] - boxes[:, :2]
+        return np.hstack([boxes[:, :2] + wh / 2.0, wh])
+
+    # --- Kalman filter ----------------------------------------------------
+
+    def _noise(self, heights: np.ndarray, weights) -> np.ndarray:
+        """Diagonal covariance blocks (N, k, k) from per-component std weights times box height."""
+        std = np.asarray(weights)[None, :] * heights[:, None]
+        return std[:, :, None] ** 2 * np.eye(len(weights))[None]
+
+    def predict(self):
+        """Advances every track by one frame."""
+        if len(self.ids) == 0:
+            return
+        h = self.mean[:, 3]
+        p, v = self.STD_WEIGHT_POSITION, self.STD_WEIGHT_VELOCITY
+        Q = self._noise(h, [p, p, p, p, v, v, v, v])
+        self.mean = self.mean @ self._F.T
+        self.covariance = self._F @ self.covariance @ self._F.T + Q
+        # Keep coasting boxes physically valid
+        self.mean[:, 2:4] = np.maximum(self.mean[:, 2:4], 1.0)
+
+    def _project(self, rows: np.ndarray):
+        """Measurement-space mean (n, 4) and innovation covariance (n, 4, 4) for the given tracks."""
+        p = self.STD_WEIGHT_POSITION
+        R = self._noise(self.mean[rows, 3], [p, p, p, p])
+        S = self._H @ self.covariance[rows] @ self._H.T + R + self.MIN_VARIANCE * np.eye(4)
+        return self.mean[rows, :4], S
+
+    def _mahalanobis(self, rows: np.ndarray, measurements: np.ndarray) -> np.ndarray:
+        """(n, m) squared Mahalanobis distances between the given tracks and measurements."""
+        projected, S = self._project(rows)
+        diff = measurements[None, :, :] - projected[:, None, :]
+        S_inv = np.linalg.inv(S)
+        return np.einsum("nmi,nij,nmj->nm", diff, S_inv, diff)
+
+    def _correct(self, rows: np.ndarray, measurements: np.ndarray):
+        """Batched Kalman update of the given tracks with their matched measurements."""
+        if len(rows) == 0:
+            return
+        projected, S = self._project(rows)
+        P = self.covariance[rows]
+        PHt = P @ self._H.T
+        K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)   # P H^T S^-1
+        self.mean[rows] += np.einsum("nij,nj->ni", K, measurements - projected)
+        self.covariance[rows] = P - K @ S @ K.transpose(0, 2, 1)
+
+    # --- Track management -------------------------------------------------
+
+    def _register(self, measurements: np.ndarray):
+        count = len(measurements)
+        if count == 0:
+            return
+        h = measurements[:, 3]
+        p, v = 2 * self.STD_WEIGHT_POSITION, 10 * self.STD_WEIGHT_VELOCITY
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count, dtype=np.int64)])
+        self.mean = np.vstack([self.mean, np.hstack([measurements, np.zeros((count, 4))])])
+        self.covariance = np.concatenate([self.covariance, self._noise(h, [p, p, p, p, v, v, v, v])])
+        self.disappeared_counts = np.concatenate([self.disappeared_counts, np.zeros(count, dtype=np.int64)])
+        self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+        self.next_id += count
+
+    def _keep(self, keep: np.ndarray):
+        self.ids = self.ids[keep]
+        self.mean = self.mean[keep]
+        self.covariance = self.covariance[keep]
+        self.disappeared_counts = self.disappeared_counts[keep]
+        self.hits = self.hits[keep]
+
+    def deregister(self, object_id):
+        self._keep(self.ids != object_id)
+
+    def _match(self, measurements: np.ndarray):
+        """Two-stage (IoU, then Mahalanobis) assignment of detections to predicted tracks."""
+        num_tracks, num_dets = len(self.ids), len(measurements)
+        rows, cols = optimal_assignment(1.0 - iou_matrix(self._to_boxes(self.mean[:, :4]), self._to_boxes(measurements)),
+                                        max_cost=1.0 - self.min_iou)
+
+        free_rows = np.setdiff1d(np.arange(num_tracks), rows)
+        free_cols = np.setdiff1d(np.arange(num_dets), cols)
+        if len(free_rows) and len(free_cols):
+            cost = self._mahalanobis(free_rows, measurements[free_cols])
+            r, c = optimal_assignment(cost, max_cost=self.gate)
+            rows = np.concatenate([rows, free_rows[r]])
+            cols = np.concatenate([cols, free_cols[c]])
+        return rows, cols
+
+    def update(self, rects):
+        return self.update_with_matches(rects)[0]
+
+    def update_with_matches(self, rects):
+        """Same contract as CentroidTracker.update_with_matches: (objects, matches, new_detections)."""
+        self.predict()
+
+        boxes = np.asarray(rects, dtype="float").reshape(-1, 4)
+        # Zero-width/height boxes (clipped or propagated) would make the measurement noise singular:
+        # they are neither matched nor registered; indices below refer to the caller's rects
+        valid = np.flatnonzero((boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1]))
+        measurements = self._to_measurements(boxes[valid])
+        rows, cols = self._match(measurements) if len(self.ids) and len(valid) else (np.empty(0, int), np.empty(0, int))
+
+        self._correct(rows, measurements[cols])
+        self.disappeared_counts += 1
+        self.disappeared_counts[rows] = 0
+        self.hits[rows] += 1
+        matched_ids = self.ids[rows]
+
+        unmatched = np.ones(len(valid), dtype=bool)
+        unmatched[cols] = False
+        keep = self.disappeared_counts <= self.max_disappeared
+        if not keep.all():
+            self._keep(keep)
+        first_new_id = self.next_id
+        self._register(measurements[unmatched])
+
+        new_detections = valid[unmatched]
+        return self.objects, track_matches(matched_ids, valid[cols], first_new_id, new_detections), new_detections
@@ -3,108 +3,213 @@ import numpy as np
 import os
 import json
 import logging
+import threading
 from typing import Dict, List, Optional, Tuple
 
+from core.db.id_allocator import IdAllocator
+from core.db.local_gallery_store import LocalGalleryStore
 from core.db.vector_manager import VectorManager
+from core.processing.ann_index import ExactIndex, GalleryMatrix, VectorIndex
+from core.processing.face_utils import FaceUtils
 from core.utils.logger import get_logger
 
 logger = get_logger("ReID")
 
 class FaceReID:
-    def __init__(self, model_path: str = "assets/weights/face_models/openface.nn4.small2.v1.t7"):
+    """
+    Gallery-based face re-identification.
+    Embeddings come from an embedding provider (FaceUtils by default), so tracking
+    and gallery enrollment share one loaded OpenFace network and one preprocessing path.
+    """
+    def __init__(self, model_path: str = "assets/weights/face_models/openface.nn4.small2.v1.t7",
+                 embedder: Optional[FaceUtils] = None, index: Optional[VectorIndex] = None,
+                 index_path: Optional[str] = None, gallery_path: Optional[str] = None,
+                 vector_manager: Optional[VectorManager] = None, vector_backend: Optional[str] = None,
+                 id_block_size: int = 1):
         self.model_path = model_path
-        self.net = None
-        self.gallery = {} # Local cache of Cloud Vectors
-        self.vm = VectorManager()
-        self.is_ready = False
+        self._lock = threading.RLock() # Guards index/gallery/store against the background cloud sync
+        # Standalone: load only the requested embedding network (not the detector / age / gender nets)
+        self.embedder = embedder or FaceUtils(models_path=os.path.dirname(model_path), components=("reid",),
+                                              reid_model_path=model_path)
+        self.net = self.embedder.reid_net
+        self.index_path = index_path
+        self.index = index or self._load_index() # Nearest-neighbour index over gallery embeddings
+        # Local cache of Cloud Vectors (FaceID -> metadata).
+        # Identities restored from disk count as seen at startup until the cloud says otherwise
+        restored_at = str(np.datetime64('now', 's'))
+        self.gallery = {fid: {"last_seen": restored_at} for fid in self.index.ids()}
+        # Optional offline gallery (memory-mapped embeddings) so identities survive restarts
+        self.gallery_path = gallery_path
+        self.store = LocalGalleryStore(gallery_path, id_block_size=id_block_size) if gallery_path else None
+        if self.store is not None:
+            self._load_local_store()
+        # FaceID allocation for auto-registration: the store's persisted counter, or an in-memory
+        # one seeded once from the gallery. `id_block_size` > 1 reserves IDs in ranges (one counter
+        # write per range). The store has a single writer: camera workers share one FaceReID, not a gallery_path
+        self.id_allocator = self.store.id_allocator if self.store is not None else IdAllocator(
+            block_size=id_block_size, seed=lambda: self.id_allocator.max_index(list(self.gallery)))
+        # The sync watermark and the offline write journal live next to the local gallery
+        # `vector_backend` picks the VectorStore ("firestore" / "sqlite" / "memory"; default from $VECTOR_STORE_BACKEND)
+        self.vm = vector_manager or VectorManager(
+            backend=vector_backend,
+            state_path=os.path.join(gallery_path, "sync_state.json") if gallery_path else None,
+            journal_path=os.path.join(gallery_path, "cloud_journal.json") if gallery_path else None)
+        self.is_ready = self.embedder.is_ready and self.net is not None
         
-        self._load_model()
         self.sync_with_cloud()
 
-    def _load_model(self):
-        if not os.path.exists(self.model_path):
-            return
-        try:
-            self.net = cv2.dnn.readNetFromTorch(self.model_path)
-            self.is_ready = True
-        except Exception as e:
-            print(f"Failed to load ReID model: {e}")
+    def _load_index(self) -> VectorIndex:
+        """Restores a persisted index from `index_path`, or starts an exact one."""
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                index = VectorIndex.load(self.index_path)
+                logger.info(f"📂 Gallery index restored: {self.index_path} ({len(index)} entries)")
+                return index
+            except Exception as e:
+                logger.error(f"❌ Failed to load gallery index: {e}")
+        return ExactIndex()
+
+    def _load_local_store(self):
+        """Fills the index and metadata cache from the local gallery store."""
+        rebuild = len(self.index) != len(self.store)
+        for fid, vector, last_seen in self.store.items():
+            if rebuild:
+                self.index.upsert(fid, vector)
+            self.gallery[fid] = {"last_seen": str(np.datetime64(int(last_seen), 's'))}
+        logger.info(f"📂 Local gallery loaded: {self.gallery_path} ({len(self.store)} identities)")
 
     def sync_with_cloud(self):
-        """Sync local gallery cache with Firestore vectors."""
+        """Pulls vectors changed in Firestore since the last sync and applies them locally."""
         if self.vm.is_ready:
-            cloud_data = self.vm.sync_gallery_from_cloud()
-            if cloud_data:
-                # Firestore returns "vector" field, local code expects "embedding" for compatibility
-                new_gallery = {}
-                for fid, data in cloud_data.items():
-                    new_gallery[fid] = {
-                        "embedding": data.get("vector"),
-                        "last_seen": str(data.get("last_seen"))
-                    }
-                self.gallery = new_gallery
+            upserts, deleted, latest = self.vm.sync_gallery_delta()
+            self.apply_cloud_delta(upserts, deleted)
+            self.vm.commit_watermark(latest)
         elif not self.gallery:
              # Fallback to empty if both cloud and local fail
              self.gallery = {}
 
+    def apply_cloud_delta(self, upserts: Dict[str, dict], deleted: List[str]):
+        """
+        Applies a cloud delta to the index, metadata cache and local store.
+        Identities absent from the delta are untouched, so local-only (offline) enrollments survive.
+        """
+        with self._lock:
+            # Firestore returns "vector" field; embeddings live in the gallery index,
+            # the dict keeps per-identity metadata
+            changed = []
+            for fid, data in upserts.items():
+                vector = data.get("vector")
+                if vector is None:
+                    continue
+                self.index.upsert(fid, vector)
+                self.gallery[fid] = {
+                    "last_seen": str(data.get("last_seen"))
+                }
+                changed.append(fid)
+            for fid in deleted:
+                self.gallery.pop(fid, None)
+                self.index.remove(fid)
+            if self.store is not None:
+                if changed:
+                    self.store.upsert_many([(fid, self.index.get(fid)) for fid in changed])
+                for fid in deleted:
+                    self.store.remove(fid)
+        if changed or deleted:
+            logger.info(f"☁️ Cloud delta applied: {len(changed)} upserts, {len(deleted)} deletions")
+
+    def start_auto_sync(self, interval_seconds: float = 60.0):
+        """Keeps the gallery fresh by applying cloud deltas from a background thread."""
+        self.vm.start_background_sync(self.apply_cloud_delta, interval_seconds)
+
+    def stop_auto_sync(self):
+        self.vm.stop_background_sync()
+
+    def close(self):
+        """Stops cloud threads, uploads queued writes (or journals them) and flushes local state."""
+        self.vm.close()
+        self.save_gallery()
+
     def save_gallery(self):
-        """No-op for local. Cloud updates happen in register_face."""
-        pass
+        """Flushes the local gallery store and persists the index. Cloud updates happen in register_face."""
+        if self.store is not None:
+            self.store.flush()
+        if self.index_path:
+            self.index.save(self.index_path)
 
     def get_embedding(self, face_img: np.ndarray) -> Optional[np.ndarray]:
-        if not self.is_ready or face_img is None or face_img.size == 0:
-            return None
-        
-        try:
-            # OpenFace expects 96x96 RGB images
-            face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-            blob = cv2.dnn.blobFromImage(face_img, 1.0/255, (96, 96), (0, 0, 0), swapRB=False, crop=False)
-            self.net.setInput(blob)
-            vec = self.net.forward()
-            return vec.flatten()
-        except:
+        """Extracts a 128-d embedding through the shared embedding provider."""
+        if not self.is_ready:
             return None
+        return self.embedder.get_face_embedding(face_img)
+
+    def get_embeddings(self, frame: np.ndarray, rects) -> np.ndarray:
+        """Extracts (N, 128) embeddings for several boxes of one frame in a single forward pass."""
+        return self.embedder.get_face_embeddings(frame, rects)
 
     def find_match(self, embedding: np.ndarray, threshold: float = 0.6) -> Optional[str]:
         """Compares embedding with gallery and returns best matching FaceID."""
-        best_match = None
-        min_dist = threshold
-        
-        if len(self.gallery) > 0:
-            logger.info(f"🔍 Searching against gallery: {list(self.gallery.keys())}")
+        return self.find_matches(embedding, threshold=threshold)[0]
+
+    def find_matches(self, embeddings: np.ndarray, threshold: float = 0.6) -> List[Optional[str]]:
+        """
+        Batched gallery lookup: one vectorized distance computation for all queries.
         
-        for face_id, data in self.gallery.items():
-            gal_emb = np.array(data["embedding"])
-            dist = np.linalg.norm(embedding - gal_emb)
-            msg = f"📐 Checking distance to {face_id}: {dist:.4f} (Threshold: {threshold})"
-            logger.info(msg)
-            print(msg) 
+        Args:
+            embeddings: (M, 128) or (128,) query embeddings
+            threshold: Maximum Euclidean distance for a match
             
-            if dist < min_dist:
-                min_dist = dist
-                best_match = face_id
-        
-        if best_match:
-            logger.info(f"🎯 Match found: {best_match} (Dist: {min_dist:.4f})")
-        else:
-            # If no match found, log the best candidate distance if any
-            if len(self.gallery) > 0:
-                logger.warning(f"❌ No match found. Closest candidate dist: {min_dist:.4f} (Threshold: {threshold})")
-                
-        return best_match
+        Returns:
+            List of M matching FaceIDs (None where no gallery entry is within threshold)
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.index.dim)
+        with self._lock:
+            if len(self.index) == 0:
+                return [None] * len(embeddings)
+            ids, dists = self.index.search(embeddings)
+        matches = []
+        for face_id, dist in zip(ids, dists):
+            if face_id is not None and dist < threshold:
+                matches.append(face_id)
+                logger.info(f"🎯 Match found: {face_id} (Dist: {dist:.4f})")
+            else:
+                matches.append(None)
+                logger.warning(f"❌ No match found. Closest candidate dist: {dist:.4f} (Threshold: {threshold})")
+        return matches
 
     def register_face(self, face_id: str, embedding: np.ndarray):
         """Updates or registers a new identity in the gallery (Cloud + Local Cache)."""
         # Update local cache
-        self.gallery[face_id] = {
-            "embedding": embedding.tolist(),
-            "last_seen": str(np.datetime64('now', 's'))
-        }
+        with self._lock:
+            self.index.upsert(face_id, embedding)
+            self.gallery[face_id] = {
+                "last_seen": str(np.datetime64('now', 's'))
+            }
+            if self.store is not None:
+                self.store.upsert(face_id, embedding)
         
-        # Push to Cloud
+        # Push to Cloud (queued; uploaded in the background)
         if self.vm.is_ready:
             self.vm.push_vector(face_id, embedding)
 
+    def allocate_face_id(self) -> str:
+        """New unused FaceID in O(1) (IDs already in the gallery, e.g. synced from the cloud, are skipped)."""
+        with self._lock:
+            face_id = self.id_allocator.allocate()
+            while face_id in self.gallery:
+                face_id = self.id_allocator.allocate()
+            return face_id
+
+    def touch(self, face_id: str):
+        """Marks a matched identity as seen now (local cache, store and a coalesced cloud update)."""
+        with self._lock:
+            if face_id not in self.gallery:
+                return
+            self.gallery[face_id]["last_seen"] = str(np.datetime64('now', 's'))
+            if self.store is not None:
+                self.store.touch(face_id)
+        if self.vm.is_ready:
+            self.vm.update_last_seen(face_id)
+
     def cleanup_stale_entries(self, max_age_seconds: int = 600, protected_ids: List[str] = ["User_ID:001"]):
         """
         Removes gallery entries that haven't been seen for a long time.
@@ -113,7 +218,9 @@ class FaceReID:
         now = np.datetime64('now', 's')
         to_delete = []
 
-        for face_id, data in self.gallery.items():
+        with self._lock:
+            gallery_items = list(self.gallery.items())
+        for face_id, data in gallery_items:
             if face_id in protected_ids:
                 continue
             
@@ -129,12 +236,17 @@ class FaceReID:
 
         for fid in to_delete:
             print(f"🧹 Cleaning up stale identity: {fid}")
-            # Delete ROI image
-            roi_path = os.path.join(os.path.dirname(self.gallery_path), f"tracking_vision_result_{fid}.jpg")
-            if os.path.exists(roi_path):
-                os.remove(roi_path)
+            # Delete ROI image (stored next to the local gallery)
+            if self.gallery_path:
+                roi_path = os.path.join(os.path.dirname(os.path.abspath(self.gallery_path)), f"tracking_vision_result_{fid}.jpg")
+                if os.path.exists(roi_path):
+                    os.remove(roi_path)
             
-            del self.gallery[fid]
+            with self._lock:
+                self.gallery.pop(fid, None)
+                self.index.remove(fid)
+                if self.store is not None:
+                    self.store.remove(fid)
 
         if to_delete:
             self.save_gallery()
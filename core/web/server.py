@@ -6,6 +6,7 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from core.processing.face_processor import FaceProcessor
+from core.processing.frame_result import FrameResult
 from core.utils.logger import get_logger
 
 logger = get_logger("WebBackend")
@@ -17,7 +18,7 @@ app.mount("/static", StaticFiles(directory="core/web/static"), name="static")
 # Singleton components
 class GlobalState:
     def __init__(self):
-        self.processor = FaceProcessor()
+        self.processor = FaceProcessor(with_attributes=False) # The dashboard shows IDs only
         self.cap = None
         self.active_connections: list[WebSocket] = []
         self.loop = None
@@ -85,24 +86,13 @@ def gen_frames():
         
         try:
             # Face Analysis
-            people = []
-            if state.global_detect:
-                people = state.processor.process_frame(frame)
+            result = state.processor.process_frame(frame) if state.global_detect else FrameResult.empty()
             
-            # Prepare Metadata
-            metadata = []
-            for p in people:
-                x1, y1, x2, y2 = p.rect
+            # Prepare Metadata (column-wise, no per-face objects)
+            for face_id, (x1, y1, x2, y2) in zip(result.ids, result.boxes.tolist()):
                 cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 210, 255), 2)
-                cv2.putText(frame, p.id, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 210, 255), 2)
-                
-                metadata.append({
-                    "id": p.id,
-                    "rect": [int(x1), int(y1), int(x2), int(y2)],
-                    "centroid": p.centroid.tolist() if hasattr(p.centroid, 'tolist') else p.centroid,
-                    "age": getattr(p, 'age', 'N/A'),
-                    "gender": getattr(p, 'gender', 'N/A')
-                })
+                cv2.putText(frame, face_id, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 210, 255), 2)
+            metadata = result.to_records()
             
             # Always broadcast even if empty to clear UI
             if state.loop:
@@ -49,7 +49,8 @@ def run_persistent_tracking():
     
     # Initialize components
     face_utils = FaceUtils()
-    reid = FaceReID()
+    # Persistent local gallery next to the ROI images (survives restarts without cloud access)
+    reid = FaceReID(gallery_path=os.path.join(results_dir, "face_gallery"))
     ct = CentroidTracker(max_disappeared=40)
     
     if not face_utils.is_ready or not reid.is_ready:
@@ -77,7 +78,8 @@ def run_persistent_tracking():
             
             frame = cv2.flip(frame, 1) # Mirror
             rects = face_utils.detect_faces(frame, conf_threshold=0.5)
-            objects = ct.update(rects)
+            objects, matches, _ = ct.update_with_matches(rects)
+            det_index = dict(matches.tolist()) # CentroidID -> index of its detection this frame
             
             current_time = datetime.datetime.now()
             
@@ -90,12 +92,8 @@ def run_persistent_tracking():
             for (centroid_id, centroid) in objects.items():
                 face_id = id_map.get(centroid_id)
                 
-                # Find matching rect for image extraction
-                matched_rect = None
-                for r in rects:
-                    if r[0] <= centroid[0] <= r[2] and r[1] <= centroid[1] <= r[3]:
-                        matched_rect = r
-                        break
+                # Exact detection box for image extraction (None while the track is coasting)
+                matched_rect = rects[det_index[centroid_id]] if centroid_id in det_index else None
                 
                 if matched_rect:
                     w = matched_rect[2] - matched_rect[0]
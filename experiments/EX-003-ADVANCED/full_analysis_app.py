@@ -51,7 +51,7 @@ def run_advanced_analysis(image_path: str):
         features.append(np.array(res['feature_vector']))
 
     # Tracker Update
-    tracked_objects = tracker.update(rects, features)
+    tracked_objects = tracker.update(rects, features, frame_shape=frame.shape)
     
     # Map Tracker IDs to Metadata
     # Since this is a single frame demo, we map directly. 
@@ -44,7 +44,7 @@ def run_photo_test(image_path: str):
         features.append(np.array(res['feature_vector']))
 
     # 트래커 업데이트 (ID 할당)
-    tracked_objects = tracker.update(rects, features)
+    tracked_objects = tracker.update(rects, features, frame_shape=frame.shape)
     
     # 시각화를 위한 가상 궤적 데이터 생성 (포토 테스트용)
     history = {}
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import numpy as np
+from core.processing.ann_index import IVFIndex, VectorIndex, create_index
+
+def test_ann_index_recall_and_persistence():
+    print("🧪 [Test] Verifying gallery indexes (exact / ivf / hnsw)")
+    rng = np.random.default_rng(0)
+    gallery = rng.normal(size=(600, 128)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    ids = [f"User_ID:{i:03d}" for i in range(len(gallery))]
+    
+    configs = {
+        "exact": {},
+        "ivf": {"nlist": 8, "nprobe": 8, "train_size": 200},
+        "hnsw": {"M": 8, "ef_construction": 40, "ef_search": 40},
+    }
+    for kind, params in configs.items():
+        print(f"[{kind}] Building index")
+        index = create_index(kind, **params)
+        for fid, vec in zip(ids, gallery):
+            index.upsert(fid, vec)
+        
+        # 1. Self-queries find themselves
+        found, dists = index.search(gallery[:50])
+        assert found == ids[:50], f"{kind}: recall@1 below 1.0 on self-queries"
+        assert np.all(dists < 1e-3)
+        
+        # 2. Deleted identities are never returned
+        for fid in ids[:300]:
+            assert index.remove(fid)
+        found, _ = index.search(gallery[:300])
+        assert not set(found) & set(ids[:300]), f"{kind}: deleted identity returned"
+        assert len(index) == 300
+        
+        # 3. Round trip through disk keeps results
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "gallery_index.npz")
+            index.save(path)
+            restored = VectorIndex.load(path)
+        assert restored.kind == kind and len(restored) == 300
+        assert restored.search(gallery[300:350])[0] == ids[300:350]
+    
+    print("✅ Gallery index verification successful")
+
+def test_ivf_background_training(monkeypatch):
+    print("🧪 [Test] Verifying IVFIndex trains off the upsert path and keeps concurrent changes")
+    # k-means is held until the concurrent changes below are made
+    release = threading.Event()
+    kmeans = IVFIndex._kmeans
+    def held_kmeans(self, sample):
+        release.wait(10)
+        return kmeans(self, sample)
+    monkeypatch.setattr(IVFIndex, "_kmeans", held_kmeans)
+    rng = np.random.default_rng(1)
+    gallery = rng.normal(size=(300, 128)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    ids = [f"User_ID:{i:03d}" for i in range(len(gallery))]
+
+    index = IVFIndex(nlist=8, nprobe=8, train_size=200)
+    for fid, vec in zip(ids[:200], gallery[:200]):
+        index.upsert(fid, vec)
+    # The upsert that reached train_size only started the trainer
+    assert not index.is_trained and index._trainer is not None
+
+    # Changes while k-means runs on the snapshot: new, replaced and removed identities
+    for fid, vec in zip(ids[200:], gallery[200:]):
+        index.upsert(fid, vec)
+    replaced = rng.normal(size=(10, 128)).astype(np.float32)
+    replaced /= np.linalg.norm(replaced, axis=1, keepdims=True)
+    for fid, vec in zip(ids[:10], replaced):
+        index.upsert(fid, vec)
+    for fid in ids[10:20]:
+        assert index.remove(fid)
+    assert not index.is_trained and len(index.search(gallery[:1])[0]) == 1   # Exact search meanwhile
+
+    # The finished training is installed by the next index operation, on the caller's thread
+    release.set()
+    index.wait_for_training()
+    assert not index.is_trained
+    expected = replaced.tolist() + gallery[20:].tolist()
+    found, dists = index.search(np.array(expected, dtype=np.float32))
+    assert index.is_trained and len(index) == 290
+    assert found == ids[:10] + ids[20:] and np.all(dists < 1e-3)
+    for fid, vec in zip(ids[:10], replaced):
+        assert index._list_of[fid] == int(index._assign(vec[None, :])[0])
+
+    # background_training=False keeps training inside the upsert that reaches train_size
+    index = IVFIndex(nlist=8, train_size=50, background_training=False)
+    for fid, vec in zip(ids[:50], gallery[:50]):
+        index.upsert(fid, vec)
+    assert index.is_trained and index._trainer is None
+    print("✅ IVF background training verification successful")
+
+if __name__ == "__main__":
+    test_ann_index_recall_and_persistence()
+    test_ivf_background_training()
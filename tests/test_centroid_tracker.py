@@ -0,0 +1,106 @@
+import itertools
+import time
+import numpy as np
+from core.processing.assignment import optimal_assignment
+from core.processing.centroid_tracker import CentroidTracker
+from core.processing.feature_tracker import FeatureMatchTracker
+from core.processing.kalman_tracker import KalmanTracker
+
+def _boxes(centroids, half=5):
+    c = np.asarray(centroids, dtype=int).reshape(-1, 2)
+    return np.hstack([c - half, c + half])
+
+def test_optimal_assignment_matches_brute_force():
+    print("🧪 [Test] Verifying Hungarian assignment against brute force")
+    rng = np.random.default_rng(0)
+    for n, m in [(3, 3), (4, 6), (6, 4), (5, 5)]:
+        cost = rng.uniform(0, 100, size=(n, m))
+        rows, cols = optimal_assignment(cost)
+        assert len(rows) == min(n, m)
+        if n <= m:
+            best = min(sum(cost[i, p[i]] for i in range(n)) for p in itertools.permutations(range(m), n))
+        else:
+            best = min(sum(cost[p[j], j] for j in range(m)) for p in itertools.permutations(range(n), m))
+        assert np.isclose(cost[rows, cols].sum(), best)
+
+    # Gate: pairs above max_cost are never returned
+    cost = np.array([[1.0, 50.0], [60.0, 70.0]])
+    rows, cols = optimal_assignment(cost, max_cost=30.0)
+    assert rows.tolist() == [0] and cols.tolist() == [0]
+    print("✅ Assignment verification successful")
+
+def test_centroid_tracker_modes():
+    print("🧪 [Test] Verifying CentroidTracker greedy vs hungarian assignment")
+    # Two tracks; the nearer track would steal the first detection under greedy matching
+    results = {}
+    for mode in ("greedy", "hungarian"):
+        ct = CentroidTracker(max_disappeared=5, assignment=mode)
+        ct.update(_boxes([(100, 100), (110, 100)]))
+        objects = ct.update(_boxes([(106, 100), (120, 100)]))
+        results[mode] = {oid: tuple(c) for oid, c in objects.items()}
+    print(f"Greedy: {results['greedy']} / Hungarian: {results['hungarian']}")
+    assert results["hungarian"] == {0: (106, 100), 1: (120, 100)}
+    assert 2 in results["greedy"] # Greedy loses one track and spawns a new ID
+
+    # Gate: a jump beyond max_distance starts a new track instead of teleporting one
+    ct = CentroidTracker(max_disappeared=5, assignment="hungarian", max_distance=50)
+    ct.update(_boxes([(100, 100)]))
+    objects = ct.update(_boxes([(400, 100)]))
+    assert sorted(objects) == [0, 1] and ct.disappeared[0] == 1
+
+    # Disappearance bookkeeping
+    for _ in range(6):
+        objects = ct.update([])
+    assert len(objects) == 0
+    print("✅ CentroidTracker mode verification successful")
+
+def test_update_with_matches():
+    print("🧪 [Test] Verifying tracker detection indices for overlapping faces")
+    # A small face whose centroid lies inside a large overlapping face box:
+    # a point-in-rect scan would attach the large box to the small face's track
+    large, small = [100, 100, 300, 300], [230, 230, 270, 270]
+    for tracker in (CentroidTracker(), KalmanTracker(), FeatureMatchTracker()):
+        objects, matches, new = tracker.update_with_matches(np.array([large, small]))
+        assert matches.tolist() == [[0, 0], [1, 1]] and new.tolist() == [0, 1]
+
+        # Next frame: detections arrive in reverse order plus one new face
+        objects, matches, new = tracker.update_with_matches(np.array([[500, 500, 540, 540], small, large]))
+        det_of = dict(matches.tolist())
+        assert det_of == {0: 2, 1: 1, 2: 0}, f"{type(tracker).__name__}: {det_of}"
+        assert new.tolist() == [0]
+
+        # Coasting tracks keep their ID but have no detection
+        objects, matches, new = tracker.update_with_matches(np.array([small]))
+        assert sorted(objects) == [0, 1, 2] and matches.tolist() == [[1, 0]] and len(new) == 0
+    print("✅ Detection index verification successful")
+
+def test_objects_are_snapshots():
+    print("🧪 [Test] Verifying objects from a previous frame are not changed by later updates")
+    for tracker in (CentroidTracker(), KalmanTracker(), FeatureMatchTracker()):
+        previous = tracker.update(_boxes([(100, 100), (300, 100)]))
+        tracker.update(_boxes([(110, 100), (310, 100)]))
+        assert [tuple(c) for c in previous.values()] == [(100, 100), (300, 100)], type(tracker).__name__
+    print("✅ Objects snapshot verification successful")
+
+def test_centroid_tracker_speed():
+    print("🧪 [Test] Measuring CentroidTracker update cost with 120 tracks")
+    rng = np.random.default_rng(1)
+    centroids = rng.uniform(0, 1920, size=(120, 2))
+    for mode in ("greedy", "hungarian"):
+        ct = CentroidTracker(assignment=mode, max_distance=40)
+        ct.update(_boxes(centroids))
+        points = centroids.copy()
+        start = time.perf_counter()
+        for _ in range(50):
+            points += rng.normal(scale=3.0, size=points.shape)
+            objects = ct.update(_boxes(points))
+        per_frame_ms = (time.perf_counter() - start) * 1000.0 / 50
+        print(f"{mode}: {per_frame_ms:.3f} ms/frame, {len(objects)} tracks")
+        assert len(objects) == 120
+    print("✅ CentroidTracker speed measurement done")
+
+if __name__ == "__main__":
+    test_optimal_assignment_matches_brute_force()
+    test_centroid_tracker_modes()
+    test_update_with_matches()
+    test_centroid_tracker_speed()
@@ -0,0 +1,61 @@
+import numpy as np
+from core.processing.detection_scheduler import DetectionScheduler
+
+def _scene(patch_xy, size=(240, 320), seed=0):
+    """Static noise background with a textured 40x40 patch at patch_xy."""
+    rng = np.random.default_rng(seed)
+    frame = (rng.random(size) * 60).astype(np.uint8)
+    patch = (np.random.default_rng(1).random((40, 40)) * 255).astype(np.uint8)
+    x, y = patch_xy
+    frame[y:y + 40, x:x + 40] = patch
+    return frame
+
+def test_scheduler_cadence_and_triggers():
+    print("🧪 [Test] Verifying DetectionScheduler cadence, motion trigger and latency floor")
+    scheduler = DetectionScheduler(interval=3, max_interval=6)
+    boxes = np.array([[100, 100, 140, 140]])
+    frame = _scene((100, 100))
+
+    # 1. Static scene: first frame detects, then the interval grows towards max_interval
+    detected = []
+    for t in range(40):
+        if scheduler.should_detect(frame, boxes):
+            scheduler.record_detection(frame, 1, elapsed_ms=20.0)
+            detected.append(t)
+    print(f"Detections on frames: {detected}")
+    assert detected[0] == 0
+    assert scheduler.interval == 6
+    assert len(detected) <= 10 # ~4x fewer detector runs than frames
+
+    # 2. Motion outside the tracked boxes triggers detection immediately
+    assert not scheduler.should_detect(frame, boxes)
+    moved = frame.copy()
+    moved[10:80, 200:300] = 255
+    assert scheduler.should_detect(moved, boxes)
+
+    # 3. Face count change halves the interval
+    scheduler.record_detection(moved, 2, elapsed_ms=20.0)
+    assert scheduler.interval == 3
+
+    # 4. Latency budget: a 40 ms detector with a 10 ms budget needs >= 4 frames per detection
+    budgeted = DetectionScheduler(interval=2, max_interval=10, latency_budget_ms=10.0)
+    budgeted.record_detection(frame, 1, elapsed_ms=40.0)
+    budgeted.record_detection(frame, 2, elapsed_ms=40.0)
+    assert budgeted.interval >= 4
+    print("✅ DetectionScheduler cadence verification successful")
+
+def test_scheduler_flow_propagation():
+    print("🧪 [Test] Verifying LK box propagation")
+    scheduler = DetectionScheduler(interval=5)
+    first = _scene((100, 100))
+    scheduler.record_detection(first, 1, elapsed_ms=20.0)
+    boxes = np.array([[100, 100, 140, 140]])
+    for step in range(1, 4):
+        boxes = scheduler.propagate(_scene((100 + 4 * step, 100 + 2 * step)), boxes)
+        print(f"Step {step}: {boxes.tolist()}")
+    assert np.abs(boxes[0] - np.array([112, 106, 152, 146])).max() <= 1
+    print("✅ LK propagation verification successful")
+
+if __name__ == "__main__":
+    test_scheduler_cadence_and_triggers()
+    test_scheduler_flow_propagation()
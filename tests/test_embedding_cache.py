@@ -0,0 +1,73 @@
+import numpy as np
+from core.processing.embedding_cache import TrackEmbeddingCache
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+def test_embedding_cache_policy():
+    print("🧪 [Test] Verifying TrackEmbeddingCache re-verification policy and budget")
+    cache = TrackEmbeddingCache(dim=4, reverify_interval=10, improve_ratio=1.25, max_per_frame=2)
+    ids = np.array([0, 1, 2])
+    quality = np.array([0.5, 0.5, 0.5], dtype=np.float32)
+
+    # 1. New tracks are due, but at most max_per_frame per frame
+    due = cache.due(ids, quality, frame_index=1)
+    assert due.tolist() == [0, 1]
+    cache.update(ids[due], np.eye(4, dtype=np.float32)[:2], quality[due], frame_index=1)
+    assert cache.due(ids, quality, frame_index=2).tolist() == [2]
+    cache.update(ids[[2]], np.eye(4, dtype=np.float32)[[2]], quality[[2]], frame_index=2)
+
+    # 2. Nothing is due until the interval passes or the face quality improves
+    assert len(cache.due(ids, quality, frame_index=5)) == 0
+    better = np.array([0.5, 0.9, 0.5], dtype=np.float32)
+    assert cache.due(ids, better, frame_index=5).tolist() == [1]
+    assert cache.due(ids, quality, frame_index=11).tolist() == [0, 1]   # Stalest first, capped
+
+    # 3. Retain drops dead tracks; a returning ID starts over as new
+    cache.retain([1, 2])
+    assert len(cache) == 2 and cache.due(ids, quality, frame_index=6).tolist() == [0]
+    print("✅ TrackEmbeddingCache policy verification successful")
+
+def test_embedding_cache_running_mean():
+    print("🧪 [Test] Verifying TrackEmbeddingCache quality-weighted running mean")
+    cache = TrackEmbeddingCache(dim=4)
+    a, b = _unit([1, 0, 0, 0]), _unit([0, 1, 0, 0])
+    cache.update([7], a[None], [0.3], frame_index=1)
+    mean = cache.update([7], b[None], [0.9], frame_index=2)[0]
+    # The better-quality observation dominates, and the result is L2-normalized
+    assert mean[1] > mean[0] > 0
+    assert np.isclose(np.linalg.norm(mean), 1.0)
+    assert np.isclose(cache.best_quality[0], 0.9)
+
+    # The best crop is kept per track; a worse one does not replace it
+    cache.update([7], a[None], [0.5], frame_index=3, crops=[np.full((4, 4), 1, np.uint8)])
+    assert cache.best_crop(7) is None   # 0.5 < best 0.9
+    cache.update([7], a[None], [0.95], frame_index=4, crops=[np.full((4, 4), 2, np.uint8)])
+    cache.update([7], a[None], [0.6], frame_index=5, crops=[np.full((4, 4), 3, np.uint8)])
+    assert (cache.best_crop(7) == 2).all()
+    cache.retain([])
+    assert cache.best_crop(7) is None
+
+    # Low-quality faces are never due
+    gated = TrackEmbeddingCache(dim=4, min_quality=0.3)
+    assert gated.due(np.array([1, 2]), np.array([0.1, 0.4]), frame_index=1).tolist() == [1]
+    print("✅ TrackEmbeddingCache running mean verification successful")
+
+def test_embedding_cache_attributes():
+    print("🧪 [Test] Verifying TrackEmbeddingCache per-track age/gender caching")
+    cache = TrackEmbeddingCache(dim=4, improve_ratio=1.25, min_quality=0.3)
+    ids, quality = np.array([3, 4, 5]), np.array([0.5, 0.2, 0.6], dtype=np.float32)
+
+    # Only faces above min_quality are classified, and only once
+    todo = cache.attributes_due(ids, quality)
+    assert todo.tolist() == [0, 2]
+    cache.set_attributes(ids[todo], ["(25-32)", "(8-12)"], ["Male", "Female"], quality[todo])
+    assert cache.get_attributes(3) == ("(25-32)", "Male") and cache.get_attributes(4) == ("Unknown", "Unknown")
+    assert len(cache.attributes_due(ids, quality)) == 0
+
+    # A clearly better face gets reclassified; dead tracks are dropped
+    assert cache.attributes_due(ids, np.array([0.7, 0.2, 0.6])).tolist() == [0]
+    cache.retain([5])
+    assert cache.get_attributes(3) == ("Unknown", "Unknown") and cache.get_attributes(5) == ("(8-12)", "Female")
+    print("✅ TrackEmbeddingCache attribute caching verification successful")
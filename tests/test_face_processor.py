@@ -0,0 +1,35 @@
+import tempfile
+import cv2
+import numpy as np
+from core.processing.face_processor import FaceProcessor
+
+def test_face_processor_reports_gated_faces(monkeypatch):
+    print("🧪 [Test] Verifying faces below the quality gate are still reported (not embedded)")
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "memory")
+    rng = np.random.default_rng(0)
+    # Out-of-focus scene (the 80x100 face at left is blurred) with one sharp face at right
+    frame = cv2.GaussianBlur(rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8), (0, 0), 8)
+    frame[100:200, 400:480] = rng.integers(0, 256, size=(100, 80, 3), dtype=np.uint8)
+    boxes = np.array([[100, 100, 180, 200], [400, 100, 480, 200]], dtype=np.int32)
+    scores = np.ones(2, dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = FaceProcessor(gallery_path=tmp, with_attributes=False)
+        quality = processor.face_utils.quality.score(frame, boxes, scores)
+        assert quality[0] < processor.embedding_cache.min_quality <= quality[1]
+
+        embedded = []
+        def embed(frame, rects):
+            embedded.append(np.asarray(rects).tolist())
+            return rng.normal(size=(len(rects), 128)).astype(np.float32)
+        monkeypatch.setattr(processor.face_utils, "detect_face_boxes", lambda frame, return_scores=False: (boxes, scores))
+        monkeypatch.setattr(processor.face_utils, "get_face_embeddings", embed)
+
+        for _ in range(3):
+            result = processor.process_frame(frame)
+            # Both faces are reported every frame; the blurry one under its temporary tracking ID
+            assert len(result) == 2
+            assert result[0].id == "User_ID:TRK_000" and result[0].rect == (100, 100, 180, 200)
+        # Only the sharp face went through the embedding network (once, on its first frame)
+        assert embedded == [[[400, 100, 480, 200]]]
+    print("✅ Quality-gated face reporting verification successful")
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+from core.processing.face_quality import FaceQualityScorer
+
+def _textured_frame(h=480, w=640):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+
+def test_face_quality_components():
+    print("🧪 [Test] Verifying FaceQualityScorer size/blur/edge/pose/confidence components")
+    scorer = FaceQualityScorer()
+    frame = _textured_frame()
+    # Blur the right half so boxes there lose sharpness
+    frame[:, 320:] = cv2.GaussianBlur(frame[:, 320:], (31, 31), 10)
+    boxes = np.array([
+        [100, 100, 180, 200],   # sharp, large, frontal
+        [100, 300, 116, 320],   # tiny
+        [400, 100, 480, 200],   # blurred
+        [0, 100, 80, 200],      # cut off at the left border
+        [200, 100, 240, 200],   # narrow (profile-like)
+    ])
+    parts = scorer.components(frame, boxes, confidences=[0.99, 0.99, 0.99, 0.99, 0.99])
+    score = scorer.score(frame, boxes, [0.99, 0.99, 0.99, 0.99, 0.99])
+    assert parts["size"][1] < 0.3 and parts["sharpness"][2] < 0.5 * parts["sharpness"][0]
+    assert parts["edge"][3] == 0.5 and parts["frontal"][4] < parts["frontal"][0]
+    assert (score[1:] < score[0]).all()
+    passes = scorer.passes(score)
+    assert passes[0] and not passes[1] and not passes[2]
+
+    # Integral-image sharpness equals the Laplacian variance of the crop (Laplacian over the boxes' region)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    lap = cv2.Laplacian(gray[100:320, 0:480], cv2.CV_64F)
+    direct = lap[0:100, 400:480].var()   # Blurred box [400, 100, 480, 200]
+    assert np.isclose(parts["sharpness"][2], min(direct / scorer.BLUR_REFERENCE, 1.0), rtol=1e-4)
+
+    # Degenerate input
+    assert len(scorer.score(frame, np.empty((0, 4)))) == 0
+    assert scorer.score_crop(None) == 0.0 and scorer.score_crop(frame[100:200, 100:180]) > 0.5
+    print("✅ FaceQualityScorer verification successful")
+
+def test_face_quality_mid_quality_face_passes():
+    print("🧪 [Test] Verifying a face that is mediocre on every component passes the default gate")
+    scorer = FaceQualityScorer()
+    rng = np.random.default_rng(0)
+    # 60x66 face of low-contrast texture on a flat background, moderate detector confidence
+    frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+    frame[100:166, 200:260] = rng.integers(125, 131, size=(66, 60, 1), dtype=np.uint8)
+    box = np.array([[200, 100, 260, 166]])
+    parts = scorer.components(frame, box, confidences=[0.7])
+    assert all(0.55 <= parts[name][0] <= 0.9 for name in ("size", "sharpness", "frontal", "confidence"))
+    assert parts["edge"][0] == 1.0
+
+    # A product of the components (~0.29) would gate it out; the weakest component does not
+    assert np.prod([value[0] for value in parts.values()]) < scorer.min_quality
+    score = scorer.score(frame, box, [0.7])
+    assert np.isclose(score[0], min(value[0] for value in parts.values())) and scorer.passes(score)[0]
+    assert scorer.score_crop(frame[100:166, 200:260]) >= scorer.min_quality
+    print("✅ Mid-quality face gate verification successful")
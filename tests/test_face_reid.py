@@ -0,0 +1,27 @@
+import os
+import tempfile
+from core.models.model_registry import ModelRegistry
+from core.processing.reid_utils import FaceReID
+
+def test_face_reid_loads_requested_embedder(monkeypatch):
+    print("🧪 [Test] Verifying a standalone FaceReID loads only the requested .t7 embedding network")
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "memory")
+    loaded = []
+    def get_net(model, config=None, **kwargs):
+        loaded.append((model, config))
+        return object()
+    monkeypatch.setattr(ModelRegistry, "get_net", get_net)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A custom file name in a directory without the detector / age / gender models
+        model_path = os.path.join(tmp, "custom_openface.t7")
+        open(model_path, "wb").close()
+        reid = FaceReID(model_path=model_path)
+        assert loaded == [(model_path, None)]
+        assert reid.is_ready and reid.net is reid.embedder.reid_net
+        assert reid.embedder.face_net is None and reid.embedder.age_net is None
+
+        # A missing file is reported as not ready instead of silently loading the default model
+        loaded.clear()
+        assert not FaceReID(model_path=os.path.join(tmp, "missing.t7")).is_ready and loaded == []
+    print("✅ Standalone FaceReID embedder verification successful")
@@ -1,3 +1,4 @@
+import cv2
 import numpy as np
 import logging
 from core.processing.face_utils import FaceUtils
@@ -19,11 +20,107 @@ def test_face_utils_robustness():
     boxes = face_module.detect_faces(empty_frame)
     print(f"Result for empty frame input (Expected empty list): {boxes}")
 
+    box_array = face_module.detect_face_boxes(None)
+    assert box_array.shape == (0, 4) and box_array.dtype == np.int32
+    print(f"Array result for None input (Expected shape (0, 4)): {box_array.shape}")
+
     # 3. Stability test during classification
     print("\n[Case 3] Verification of classifier stability (Should return 'Unknown')")
     gender = face_module.classify_gender(None)
     age = face_module.classify_age(None)
     print(f"Result: Gender={gender}, Age={age} (Expected 'Unknown' for both)")
 
+    # 4. Batch embedding keeps one row per input box even when models are unavailable
+    print("\n[Case 4] Batch embedding shape with unavailable models (Should be all-NaN rows)")
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    embeddings = face_module.get_face_embeddings(frame, [(0, 0, 50, 50), (10, 10, 60, 60)])
+    assert embeddings.shape == (2, 128) and embeddings.dtype == np.float32
+    assert np.isnan(embeddings).all()
+    print(f"Result: shape = {embeddings.shape}")
+
+    # 5. Fused age/gender keeps one label per input box even when models are unavailable
+    print("\n[Case 5] Batched attribute classification with unavailable models (Should be all 'Unknown')")
+    ages, genders = face_module.classify_attributes(frame, [(0, 0, 50, 50), (10, 10, 60, 60)])
+    assert ages == ["Unknown", "Unknown"] and genders == ["Unknown", "Unknown"]
+    print(f"Result: ages = {ages}, genders = {genders}")
+
+class _StubNet:
+    """Stands in for a cv2.dnn.Net: records the input blobs and returns `outputs(blob)`."""
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.blobs = []
+
+    def setInput(self, blob):
+        self.blobs.append(blob)
+
+    def forward(self):
+        return self.outputs(self.blobs[-1])
+
+def _ready_face_utils():
+    face_module = FaceUtils(models_path="invalid/path")
+    face_module.is_ready = True
+    return face_module
+
+def test_detect_face_boxes_postprocessing():
+    print("🧪 [Test] Verifying vectorized SSD post-processing (mask, clip, degenerate boxes, NMS)")
+    # (1, 1, N, 7): [image_id, label, confidence, x1, y1, x2, y2], normalized coordinates
+    detections = np.array([[
+        [0, 1, 0.90, 0.125, 0.125, 0.375, 0.5],      # kept: (50, 25, 150, 100)
+        [0, 1, 0.50, 0.5, 0.5, 0.75, 0.75],          # below conf_threshold
+        [0, 1, 0.95, 0.875, 0.75, 1.25, 1.125],      # crosses the border: clipped to (350, 150, 399, 199)
+        [0, 1, 0.80, 0.5, 0.5, 0.5, 0.625],          # zero width: dropped
+        [0, 1, 0.85, 0.140625, 0.125, 0.390625, 0.5],  # overlaps the first box: removed by NMS only
+    ]], dtype=np.float32).reshape(1, 1, 5, 7)
+    face_module = _ready_face_utils()
+    face_module.face_net = _StubNet(lambda blob: detections)
+    frame = np.zeros((200, 400, 3), dtype=np.uint8)
+
+    boxes, scores = face_module.detect_face_boxes(frame, conf_threshold=0.7, return_scores=True)
+    assert face_module.face_net.blobs[-1].shape == (1, 3, 300, 300)
+    assert boxes.dtype == np.int32 and scores.dtype == np.float32
+    assert boxes.tolist() == [[50, 25, 150, 100], [350, 150, 399, 199], [56, 25, 156, 100]]
+    assert np.allclose(scores, [0.90, 0.95, 0.85])
+
+    # NMS keeps the higher-scoring box of the overlapping pair
+    boxes, scores = face_module.detect_face_boxes(frame, conf_threshold=0.7, nms_threshold=0.3, return_scores=True)
+    assert sorted(boxes.tolist()) == [[50, 25, 150, 100], [350, 150, 399, 199]]
+    assert np.allclose(np.sort(scores), [0.90, 0.95])
+    assert face_module.detect_faces(frame, 0.7, 0.3) == [tuple(b) for b in boxes.tolist()]
+    print("✅ SSD post-processing verification successful")
+
+def test_classify_attributes_batched():
+    print("🧪 [Test] Verifying batched age/gender classification (quality gate, input order)")
+    rng = np.random.default_rng(0)
+    # Out-of-focus scene with sharp faces at the first and last box; the middle one is gated out
+    frame = cv2.GaussianBlur(rng.integers(0, 256, size=(240, 480, 3), dtype=np.uint8), (0, 0), 8)
+    rects = [(20, 40, 100, 140), (180, 40, 260, 140), (340, 40, 420, 140)]
+    for x1, y1, x2, y2 in (rects[0], rects[2]):
+        frame[y1:y2, x1:x2] = rng.integers(0, 256, size=(y2 - y1, x2 - x1, 3), dtype=np.uint8)
+
+    face_module = _ready_face_utils()
+    assert face_module.quality.passes(face_module.quality.score(frame, np.array(rects))).tolist() == [True, False, True]
+    # One logit row per classified crop, in batch order
+    age_logits = np.zeros((2, len(FaceUtils.AGE_LIST)), dtype=np.float32)
+    age_logits[0, 5], age_logits[1, 1] = 1.0, 1.0
+    gender_logits = np.array([[0.2, 0.8], [0.9, 0.1]], dtype=np.float32)
+    face_module.age_net = _StubNet(lambda blob: age_logits)
+    face_module.gender_net = _StubNet(lambda blob: gender_logits)
+
+    ages, genders = face_module.classify_attributes(frame, rects)
+    assert ages == ['(38-43)', 'Unknown', '(4-6)']
+    assert genders == ['Female', 'Unknown', 'Male']
+    # A single 227x227 blob with only the two gated-in crops feeds both networks
+    assert face_module.age_net.blobs[0].shape == (2, 3, 227, 227)
+    assert face_module.gender_net.blobs[0] is face_module.age_net.blobs[0]
+
+    # Disabling the gate classifies every crop (the stubs then return 3 rows)
+    age_logits = np.repeat(age_logits[:1], 3, axis=0)
+    gender_logits = np.repeat(gender_logits[1:], 3, axis=0)
+    ages, genders = face_module.classify_attributes(frame, rects, min_quality=0)
+    assert ages == ['(38-43)'] * 3 and genders == ['Male'] * 3
+    print("✅ Batched attribute classification verification successful")
+
 if __name__ == "__main__":
     test_face_utils_robustness()
+    test_detect_face_boxes_postprocessing()
+    test_classify_attributes_batched()
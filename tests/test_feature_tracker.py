@@ -0,0 +1,76 @@
+import time
+import numpy as np
+from core.processing.feature_tracker import FeatureMatchTracker
+
+def _boxes(centroids, half=20):
+    c = np.asarray(centroids, dtype=float).reshape(-1, 2)
+    return np.hstack([c - half, c + half])
+
+def test_feature_tracker_appearance_and_momentum():
+    print("🧪 [Test] Verifying FeatureMatchTracker matrix cost, momentum and missing features")
+    rng = np.random.default_rng(0)
+    feats = rng.normal(size=(2, 128)).astype(np.float32)
+    tracker = FeatureMatchTracker(feature_weight=0.7)
+    tracker.update(_boxes([(100, 100), (160, 100)]), list(feats))
+
+    # Appearance wins over proximity: detections swap places, features follow the IDs
+    objects = tracker.update(_boxes([(160, 100), (100, 100)]), [feats[0], feats[1]])
+    assert tuple(objects[0]) == (160, 100) and tuple(objects[1]) == (100, 100)
+
+    # Momentum rule: 0.8 * old + 0.2 * new
+    new_feat = rng.normal(size=128).astype(np.float32)
+    tracker.update(_boxes([(160, 100), (100, 100)]), [new_feat, feats[1]])
+    assert np.allclose(tracker.get_feature(0), 0.8 * feats[0] + 0.2 * new_feat, atol=1e-5)
+
+    # A detection without a feature is matched on position only
+    objects = tracker.update(_boxes([(162, 100), (100, 100)]), [None, feats[1]])
+    assert tuple(objects[0]) == (162, 100)
+    print("✅ FeatureMatchTracker appearance verification successful")
+
+def test_feature_tracker_features_after_featureless_registration():
+    print("🧪 [Test] Verifying features arriving after feature-less registration")
+    rng = np.random.default_rng(2)
+    feats = rng.normal(size=(2, 128)).astype(np.float32)
+    tracker = FeatureMatchTracker()
+    boxes = np.array([[0, 0, 40, 40], [100, 100, 140, 140]])
+    tracker.update(boxes)
+    assert tracker.feature_bank is None
+
+    # The bank is allocated for the existing tracks; their first feature is taken as is (no momentum)
+    objects = tracker.update(boxes, list(feats))
+    assert list(objects) == [0, 1]
+    assert tracker.feature_bank.shape == (2, 128)
+    assert np.allclose(tracker.get_feature(0), feats[0]) and np.allclose(tracker.get_feature(1), feats[1])
+    print("✅ Late feature arrival verification successful")
+
+def test_feature_tracker_resolution_aware():
+    print("🧪 [Test] Verifying resolution-aware spatial normalization")
+    # Without features the spatial term must stay below ~0.33 of the far distance to match.
+    # A 300 px jump is "far" at 720p but acceptable on a 4K frame.
+    for shape, expected_ids in (((720, 1280, 3), [1]), ((2160, 3840, 3), [0])):
+        tracker = FeatureMatchTracker(feature_weight=0.7)
+        tracker.update(_boxes([(500, 500)]), frame_shape=shape)
+        objects = tracker.update(_boxes([(800, 500)]))
+        assert [oid for oid, c in objects.items() if tuple(c) == (800, 500)] == expected_ids
+    print("✅ Resolution-aware normalization verification successful")
+
+def test_feature_tracker_speed():
+    print("🧪 [Test] Measuring FeatureMatchTracker update cost with 100 tracks")
+    rng = np.random.default_rng(1)
+    centers = rng.uniform(0, 1900, size=(100, 2))
+    feats = rng.normal(size=(100, 128)).astype(np.float32)
+    tracker = FeatureMatchTracker()
+    tracker.update(_boxes(centers), list(feats), frame_shape=(1080, 1920))
+    start = time.perf_counter()
+    for _ in range(20):
+        centers += rng.normal(scale=3.0, size=centers.shape)
+        objects = tracker.update(_boxes(centers), list(feats))
+    per_frame_ms = (time.perf_counter() - start) * 1000.0 / 20
+    print(f"{per_frame_ms:.3f} ms/frame, {len(objects)} tracks")
+    assert len(objects) == 100
+    print("✅ FeatureMatchTracker speed measurement done")
+
+if __name__ == "__main__":
+    test_feature_tracker_appearance_and_momentum()
+    test_feature_tracker_resolution_aware()
+    test_feature_tracker_speed()
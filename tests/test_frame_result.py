@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pytest
+from core.processing.frame_result import FrameResult
+
+def _result():
+    return FrameResult(
+        ids=["User_ID:001", "User_ID:TRK_004"],
+        track_ids=[0, 4],
+        boxes=[(10, 20, 110, 140), (300, 40, 380, 130)],
+        centroids=[np.array([60, 80]), np.array([340, 85])],
+        timestamp=1_700_000_000.0,
+    )
+
+def test_frame_result_columns_and_rows():
+    print("🧪 [Test] Verifying FrameResult columns and PersonView rows")
+    result = _result()
+    assert result.boxes.dtype == np.int32 and result.boxes.flags["C_CONTIGUOUS"]
+    assert result.centroids.dtype == np.float32 and result.centroids.shape == (2, 2)
+    assert len(result) == 2 and len(FrameResult.empty()) == 0
+
+    # Row views behave like the former Person objects
+    people = list(result)
+    assert people[0].id == "User_ID:001" and people[0].rect == (10, 20, 110, 140)
+    assert people[1].track_id == 4 and people[1].centroid.tolist() == [340.0, 85.0]
+    assert people[0].age == "Unknown" and people[0].gender == "Unknown"
+    assert people[0].last_seen.timestamp() == 1_700_000_000.0
+    assert result[-1].id == "User_ID:TRK_004"
+    assert result.get("User_ID:TRK_004").rect == (300, 40, 380, 130) and result.get("missing") is None
+    with pytest.raises(AttributeError):
+        people[0].extra = 1 # __slots__: no per-row __dict__
+
+    result.set_attribute("age", ["20-30", "40-50"])
+    assert result[1].age == "40-50"
+    with pytest.raises(ValueError):
+        result.set_attribute("gender", ["M"])
+    print("✅ FrameResult row view verification successful")
+
+def test_frame_result_conversion():
+    print("🧪 [Test] Verifying FrameResult JSON/Arrow conversion")
+    result = _result()
+    records = result.to_records()
+    assert records[0] == {"id": "User_ID:001", "rect": [10, 20, 110, 140], "centroid": [60.0, 80.0],
+                          "age": "Unknown", "gender": "Unknown"}
+    json.dumps(result.to_dict())
+    json.dumps(records)
+
+    pa = pytest.importorskip("pyarrow")
+    table = result.to_arrow()
+    assert table.num_rows == 2
+    assert table.column("box").to_pylist()[1] == [300, 40, 380, 130]
+    assert table.schema.field("box").type == pa.list_(pa.int32(), 4)
+    print("✅ FrameResult conversion verification successful")
@@ -0,0 +1,36 @@
+import numpy as np
+from core.processing.reid_utils import GalleryMatrix
+
+def test_gallery_matrix_search():
+    print("🧪 [Test] Verifying GalleryMatrix incremental updates and vectorized search")
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(100, 128)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    
+    # 1. Registration grows the matrix beyond its initial capacity
+    print("[Step 1] Registering 100 identities")
+    gallery = GalleryMatrix(capacity=8)
+    for i, emb in enumerate(embeddings):
+        gallery.upsert(f"User_ID:{i:03d}", emb)
+    assert len(gallery) == 100
+    
+    # 2. Batched search agrees with brute force
+    print("[Step 2] Comparing batched search against brute force")
+    queries = embeddings[:10] + 0.01
+    rows, dists = gallery.search(queries)
+    brute = np.linalg.norm(queries[:, None] - gallery.vectors[None], axis=2)
+    assert (rows == brute.argmin(axis=1)).all()
+    assert np.allclose(dists, brute.min(axis=1), atol=1e-4)
+    
+    # 3. Removal keeps IDs and rows aligned
+    print("[Step 3] Removing identities")
+    assert gallery.remove("User_ID:000")
+    assert not gallery.remove("User_ID:000")
+    rows, _ = gallery.search(embeddings[99])
+    assert gallery.ids[rows[0]] == "User_ID:099"
+    assert "User_ID:000" not in gallery and len(gallery) == 99
+    
+    print("✅ GalleryMatrix verification successful")
+
+if __name__ == "__main__":
+    test_gallery_matrix_search()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from core.db.id_allocator import IdAllocator
+from core.db.local_gallery_store import LocalGalleryStore
+
+def _worker_allocate(path, count, block_size):
+    allocator = IdAllocator(path, block_size=block_size)
+    return [allocator.allocate() for _ in range(count)]
+
+def test_id_allocator_sequence_and_seed():
+    print("🧪 [Test] Verifying IdAllocator sequence, persistence and gallery seeding")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "face_gallery")
+
+        # 1. An existing gallery (no counter yet) continues after its highest FaceID
+        store = LocalGalleryStore(path)
+        store.upsert_many([(fid, rng.normal(size=128)) for fid in ("User_ID:001", "User_ID:007", "User_ID:TRK_050")])
+        assert store.id_allocator.allocate() == "User_ID:008"
+        assert store.id_allocator.allocate() == "User_ID:009"
+
+        # 2. The counter is persisted: a reopened store never hands out an ID twice, even after deletes
+        store.remove("User_ID:007")
+        store.wait_for_compaction()  # The delete triggers a background compaction of the store files
+        reopened = LocalGalleryStore(path)
+        assert reopened.id_allocator.allocate() == "User_ID:010"
+
+        # 3. In-memory allocator (no store) seeded from a gallery
+        allocator = IdAllocator(seed=lambda: allocator.max_index(["User_ID:041", "User_ID:TRK_999", "Other"]))
+        assert [allocator.allocate() for _ in range(2)] == ["User_ID:042", "User_ID:043"]
+        assert list(allocator.reserve(3)) == [44, 45, 46]
+    print("✅ IdAllocator sequence verification successful")
+
+def test_id_allocator_multi_process():
+    print("🧪 [Test] Verifying IdAllocator is collision-free across processes sharing one counter file")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, IdAllocator.COUNTER_FILE)
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(_worker_allocate, [path] * 4, [60] * 4, [1, 1, 8, 16]))
+        all_ids = [fid for ids in results for fid in ids]
+        assert len(all_ids) == len(set(all_ids)) == 240
+        # Each worker's IDs are increasing (ranges are handed out in order)
+        for ids in results:
+            numbers = [int(fid.split(":")[1]) for fid in ids]
+            assert numbers == sorted(numbers)
+    print("✅ IdAllocator multi-process verification successful")
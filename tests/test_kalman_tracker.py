@@ -0,0 +1,92 @@
+import time
+import numpy as np
+from core.processing.centroid_tracker import CentroidTracker
+from core.processing.kalman_tracker import KalmanTracker
+
+def _walk(start, velocity, frames, size=40):
+    """Boxes of a face moving at constant velocity (pixels/frame)."""
+    for t in range(frames):
+        cx, cy = start[0] + velocity[0] * t, start[1] + velocity[1] * t
+        yield (cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2)
+
+def test_kalman_tracker_fast_walker():
+    print("🧪 [Test] Verifying KalmanTracker keeps IDs through crossings and occlusions")
+    frames = 40
+    # Two faces crossing at 20 px/frame; the first one is occluded (not detected) for 4 frames
+    a = list(_walk((100, 200), (20, 0), frames))
+    b = list(_walk((100 + 20 * (frames - 1), 230), (-20, 0), frames))
+    occluded = range(10, 14)
+
+    ids_seen = {}
+    for name, tracker in (("centroid", CentroidTracker(max_disappeared=5, max_distance=50)),
+                          ("kalman", KalmanTracker(max_disappeared=5))):
+        all_ids = set()
+        for t in range(frames):
+            boxes = [b[t]] if t in occluded else [a[t], b[t]]
+            all_ids |= set(tracker.update(np.array(boxes)).keys())
+        ids_seen[name] = len(all_ids)
+    print(f"Distinct IDs: {ids_seen}")
+    assert ids_seen["kalman"] == 2
+    assert ids_seen["centroid"] > 2
+
+    # Velocity is learned: predicted centroid leads the last measurement
+    tracker = KalmanTracker()
+    for box in _walk((100, 100), (10, 5), 15):
+        tracker.update([box])
+    tracker.predict()
+    assert abs(tracker.centroids[0][0] - (100 + 10 * 15)) <= 2
+    assert abs(tracker.centroids[0][1] - (100 + 5 * 15)) <= 2
+    print("✅ KalmanTracker fast-walker verification successful")
+
+def test_kalman_tracker_lifecycle():
+    print("🧪 [Test] Verifying KalmanTracker register/coast/deregister")
+    tracker = KalmanTracker(max_disappeared=3)
+    objects = tracker.update(np.array([[0, 0, 50, 50], [200, 200, 260, 260]]))
+    assert sorted(objects) == [0, 1]
+    for _ in range(3):
+        objects = tracker.update(np.array([[0, 0, 50, 50]]))
+    assert sorted(objects) == [0, 1] and tracker.disappeared[1] == 3
+    objects = tracker.update(np.array([[0, 0, 50, 50]]))
+    assert sorted(objects) == [0]
+    assert len(tracker.update([])) == 1
+    print("✅ KalmanTracker lifecycle verification successful")
+
+def test_kalman_tracker_speed():
+    print("🧪 [Test] Measuring KalmanTracker update cost with 100 tracks")
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 1900, size=(100, 2))
+    velocity = rng.normal(scale=4.0, size=(100, 2))
+    tracker = KalmanTracker()
+    start = time.perf_counter()
+    for t in range(30):
+        c = centers + velocity * t
+        tracker.update(np.hstack([c - 20, c + 20]))
+    per_frame_ms = (time.perf_counter() - start) * 1000.0 / 30
+    print(f"{per_frame_ms:.3f} ms/frame, {len(tracker.ids)} tracks")
+    assert len(tracker.ids) == 100
+    print("✅ KalmanTracker speed measurement done")
+
+def test_kalman_tracker_degenerate_boxes():
+    print("🧪 [Test] Verifying KalmanTracker ignores zero-size boxes and keeps gates finite")
+    tracker = KalmanTracker()
+    tracker.update(np.array([[0, 0, 50, 50], [200, 200, 260, 260]]))
+    # A zero-height box (clipped at the border) next to the two tracked faces, the far one moved away
+    rects = np.array([[300, 479, 340, 479], [2, 1, 52, 51], [500, 100, 560, 160]])
+    objects, matches, new_detections = tracker.update_with_matches(rects)
+    assert np.isfinite(tracker.mean).all() and np.isfinite(tracker.covariance).all()
+    # Indices refer to the caller's rects: the degenerate box 0 is neither matched nor registered
+    assert 0 not in matches[:, 1] and new_detections.tolist() == [2]
+    assert matches.tolist() == [[0, 1], [2, 2]] and sorted(objects) == [0, 1, 2]
+
+    # A collapsed state still gives an invertible innovation covariance
+    tracker.covariance[:] = 0.0
+    tracker.mean[:, 3] = 0.0
+    distances = tracker._mahalanobis(np.arange(len(tracker.ids)), np.array([[25.0, 25.0, 50.0, 50.0]]))
+    assert np.isfinite(distances).all()
+    print("✅ KalmanTracker degenerate box verification successful")
+
+if __name__ == "__main__":
+    test_kalman_tracker_fast_walker()
+    test_kalman_tracker_lifecycle()
+    test_kalman_tracker_speed()
+    test_kalman_tracker_degenerate_boxes()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import numpy as np
+from core.db.local_gallery_store import LocalGalleryStore
+
+def test_local_gallery_store_persistence():
+    print("🧪 [Test] Verifying LocalGalleryStore append, delete, compaction and reopen")
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(200, 128)).astype(np.float32)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "face_gallery")
+        
+        # 1. Bulk append
+        print("[Step 1] Appending 200 identities")
+        store = LocalGalleryStore(path, compact_ratio=0.25)
+        store.upsert_many([(f"User_ID:{i:03d}", emb) for i, emb in enumerate(embeddings)])
+        assert len(store) == 200
+        
+        # 2. Deletes beyond the ratio trigger a background compaction
+        print("[Step 2] Deleting 100 identities")
+        for i in range(100):
+            assert store.remove(f"User_ID:{i:03d}")
+        store.upsert("User_ID:999", embeddings[0])
+        store.wait_for_compaction()
+        store.flush()
+        file_rows = os.path.getsize(os.path.join(path, LocalGalleryStore.EMBEDDINGS_FILE)) // (4 * 128)
+        assert file_rows < 200, f"Expected compacted file, got {file_rows} rows"
+        
+        # 3. Reopen and verify contents
+        print("[Step 3] Reopening store")
+        reopened = LocalGalleryStore(path)
+        assert len(reopened) == 101
+        assert "User_ID:050" not in reopened
+        assert np.allclose(reopened.get("User_ID:150"), embeddings[150])
+        assert np.allclose(reopened.get("User_ID:999"), embeddings[0])
+    
+    print("✅ LocalGalleryStore verification successful")
+
+if __name__ == "__main__":
+    test_local_gallery_store_persistence()
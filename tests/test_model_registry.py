@@ -0,0 +1,67 @@
+import os
+import tempfile
+import threading
+import cv2
+from core.models.model_registry import ModelRegistry
+
+def test_model_registry_missing_weights():
+    print("🧪 [Test] Verifying ModelRegistry error handling and reporting")
+    
+    # 1. Missing weights must raise instead of caching a broken handle
+    print("[Step 1] Requesting a network with an invalid path")
+    try:
+        ModelRegistry.get_net("invalid/path/model.caffemodel", "invalid/path/deploy.prototxt")
+        assert False, "Expected FileNotFoundError"
+    except FileNotFoundError as e:
+        print(f"Result: {e}")
+    
+    # 2. Nothing was registered, so the memory report has no entry for it
+    print("[Step 2] Verifying memory report")
+    report = ModelRegistry.memory_report()
+    assert all(entry["model"] != "model.caffemodel" for entry in report)
+    print(f"Report: {report}")
+    
+    print("✅ ModelRegistry verification successful")
+
+def test_model_registry_shared_and_per_thread_handles(monkeypatch):
+    print("🧪 [Test] Verifying ModelRegistry sharing, per-thread handles and clear()")
+    # Isolated registry state; the loader builds empty cv2.dnn.Net objects and counts reads
+    monkeypatch.setattr(ModelRegistry, "_entries", {})
+    reads = []
+    def read_net(model, config, backend, target):
+        reads.append(os.path.basename(model))
+        return cv2.dnn.Net()
+    monkeypatch.setattr(ModelRegistry, "_read_net", staticmethod(read_net))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = os.path.join(tmp, "tiny.caffemodel")
+        open(model, "wb").close()
+
+        # 1. Repeated requests share one network read once
+        shared = ModelRegistry.get_net(model)
+        assert isinstance(shared, cv2.dnn.Net)
+        assert ModelRegistry.get_net(model) is shared and reads == ["tiny.caffemodel"]
+
+        # 2. per_thread: one private handle per thread, stable within the thread
+        handles = {}
+        def worker(name):
+            first = ModelRegistry.get_net(model, per_thread=True)
+            handles[name] = (first, ModelRegistry.get_net(model, per_thread=True))
+        threads = [threading.Thread(target=worker, args=(name,)) for name in ("a", "b")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert all(first is second for first, second in handles.values())
+        assert len({id(shared), id(handles["a"][0]), id(handles["b"][0])}) == 3
+        report = ModelRegistry.memory_report()
+        assert len(report) == 1 and report[0]["thread_handles"] == 2 and report[0]["requests"] == 6
+
+        # 3. clear() drops the cache: the next request reads the weights again
+        ModelRegistry.clear()
+        assert ModelRegistry.memory_report() == []
+        assert ModelRegistry.get_net(model) is not shared and len(reads) == 4
+    print("✅ ModelRegistry handle sharing verification successful")
+
+if __name__ == "__main__":
+    test_model_registry_missing_weights()
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+from core.models.qwen_vl import QwenVLProcessor
+
+RECORD = {"ymin": "1", "xmin": "2", "ymax": "3", "xmax": "4", "gender": "Male", "age": "20s"}
+
+def _processor(prefix_path):
+    """QwenVLProcessor without weights: prefix path, tokenizer and generate() are stubs."""
+    processor = QwenVLProcessor.__new__(QwenVLProcessor)
+    processor.reuse_prefix_cache = True
+    processor.max_batch_size, processor.max_batch_tokens = 4, 16384
+    processor._generate_with_prefix_cache = prefix_path
+    full_prefills = []
+    def tokenize(texts, images):
+        full_prefills.append(len(images))
+        return {"input_ids": torch.zeros((len(images), 4), dtype=torch.long)}
+    processor._tokenize = tokenize
+    processor.model = SimpleNamespace(generate=lambda **kwargs: torch.zeros((kwargs["input_ids"].shape[0], 6), dtype=torch.long))
+    processor.processor = SimpleNamespace(batch_decode=lambda ids, skip_special_tokens: ["full prefill"] * len(ids))
+    return processor, full_prefills
+
+def test_prefix_cache_failure_after_record_is_not_retried():
+    print("🧪 [Test] Verifying a prefix-cache failure after a streamed record does not re-emit it")
+    def fails_after_first_record(images, prefix, grammar, on_record):
+        on_record(0, RECORD)
+        raise torch.cuda.OutOfMemoryError("CUDA out of memory")
+    processor, full_prefills = _processor(fails_after_first_record)
+    records = []
+
+    # 1. _generate re-raises instead of rerunning the batch with full prefill
+    with pytest.raises(torch.cuda.OutOfMemoryError):
+        processor._generate([None], "instruction", on_record=lambda row, record: records.append((row, record)))
+    assert records == [(0, RECORD)] and full_prefills == []
+
+    # 2. Through generate_texts: the image fails once, its callback fired exactly once
+    records.clear()
+    texts = processor.generate_texts([np.zeros((64, 64, 3), dtype=np.uint8)], "instruction",
+                                     on_record=lambda index, record: records.append((index, record)))
+    assert texts == [None] and records == [(0, RECORD)] and full_prefills == []
+    assert processor.reuse_prefix_cache
+    print("✅ No duplicate records after a prefix-cache failure")
+
+def test_prefix_cache_fallback_before_decoding():
+    print("🧪 [Test] Verifying full-prefill fallback only for OOM before any record")
+    def out_of_memory(images, prefix, grammar, on_record):
+        raise torch.cuda.OutOfMemoryError("CUDA out of memory")
+    processor, full_prefills = _processor(out_of_memory)
+    assert processor._generate([None], "instruction", on_record=lambda row, record: False) == ["full prefill"]
+    assert full_prefills == [1] and processor.reuse_prefix_cache
+
+    # Other errors are bugs in the fast path: propagated, no silent rerun
+    def broken(images, prefix, grammar, on_record):
+        raise ValueError("shape mismatch")
+    processor, full_prefills = _processor(broken)
+    with pytest.raises(ValueError):
+        processor._generate([None], "instruction")
+    assert full_prefills == [] and processor.reuse_prefix_cache
+    print("✅ Prefix-cache fallback verification successful")
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import numpy as np
+from core.models.result_cache import InferenceResultCache
+
+def test_result_cache_keys_and_tiers():
+    print("🧪 [Test] Verifying InferenceResultCache content keys and memory/disk tiers")
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    digest = InferenceResultCache.image_digest(frame)
+
+    # 1. Keys follow the content, prompt and parameters (not the object identity)
+    assert InferenceResultCache.image_digest(frame.copy()) == digest
+    changed = frame.copy()
+    changed[0, 0, 0] = 1
+    assert InferenceResultCache.image_digest(changed) != digest
+    key = InferenceResultCache.make_key(digest, task="persons", prompt="p", revision="r@1", max_new_tokens=256)
+    assert key == InferenceResultCache.make_key(digest, max_new_tokens=256, revision="r@1", prompt="p", task="persons")
+    assert key != InferenceResultCache.make_key(digest, task="persons", prompt="p", revision="r@2", max_new_tokens=256)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Paths hash the file bytes
+        path = os.path.join(tmp, "frame.raw")
+        with open(path, "wb") as f:
+            f.write(b"image-bytes")
+        assert InferenceResultCache.image_digest(path) == InferenceResultCache.image_digest(path)
+
+        # 2. Values survive a new process (disk tier) and come back as independent copies
+        cache = InferenceResultCache(os.path.join(tmp, "cache"), max_memory_entries=1)
+        people = [{"id": 1, "bbox": [10, 20, 300, 400], "gender": "Male", "age": "20s"}]
+        assert cache.get(key) is None
+        cache.put(key, people)
+        cache.get(key)[0]["id"] = 99
+        assert cache.get(key) == people
+        reopened = InferenceResultCache(os.path.join(tmp, "cache"))
+        assert reopened.get(key) == people and reopened.hits == 1
+        assert cache.get(InferenceResultCache.make_key(digest, task="objects")) is None and cache.misses == 2
+    print("✅ InferenceResultCache key/tier verification successful")
+
+def test_result_cache_disk_eviction():
+    print("🧪 [Test] Verifying InferenceResultCache size-based LRU eviction on disk")
+    with tempfile.TemporaryDirectory() as tmp:
+        value = "x" * 1000
+        cache = InferenceResultCache(tmp, max_memory_entries=1, max_disk_bytes=3500)
+        keys = [InferenceResultCache.make_key(str(i)) for i in range(4)]
+        for i, key in enumerate(keys[:3]):
+            cache.put(key, value)
+            os.utime(os.path.join(tmp, key + cache.SUFFIX), (1000 + i, 1000 + i))
+        cache.get(keys[0])   # Disk hit refreshes its recency
+
+        # The 4th entry exceeds the budget: the least recently used file (keys[1]) is evicted
+        cache.put(keys[3], value)
+        remaining = {name[:-len(cache.SUFFIX)] for name in os.listdir(tmp)}
+        assert remaining == {keys[0], keys[2], keys[3]}
+        assert sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp)) <= 3500
+        assert InferenceResultCache(tmp).get(keys[1]) is None
+
+        cache.clear()
+        assert os.listdir(tmp) == [] and cache.get(keys[0]) is None
+    print("✅ InferenceResultCache eviction verification successful")
@@ -0,0 +1,41 @@
+from core.models.structured_output import GrammarVocabulary, StreamingRecordParser, person_line_grammar
+
+GENDERS = ("Male", "Female")
+AGE_GROUPS = ("10s", "20s", "70s+")
+
+def test_person_grammar_automaton():
+    print("🧪 [Test] Verifying the person list grammar accepts only '[ymin, xmin, ymax, xmax] Gender, AgeGroup' lines")
+    grammar = person_line_grammar(GENDERS, AGE_GROUPS)
+
+    # 1. Complete lines (optional spaces) return to the line start, where the list may end
+    state = grammar.advance(grammar.start, "[150, 200,400, 300] Male, 20s\n[1,2,3,4]Female,70s+\n")
+    assert grammar.at_line_start(state)
+    assert not grammar.at_line_start(grammar.advance(grammar.start, "[1, 2, 3, 4] Male, 20s"))
+
+    # 2. Preambles, unknown labels and over-long numbers are rejected
+    assert grammar.advance(grammar.start, "Sure! [1") is None
+    assert grammar.advance(grammar.start, "[1, 2, 3, 4] Robot") is None
+    assert grammar.advance(grammar.start, "[12345") is None
+
+    # 3. Token filter: only tokens that continue the grammar from a state are allowed
+    tokens = ["[", "1", "2", ", ", "]", " Male", "Male", ",", " 20s", "\n", "\n[", "hello", "<eos>", "20"]
+    vocabulary = GrammarVocabulary(grammar, tokens)
+    assert [tokens[i] for i in vocabulary.allowed(grammar.start)] == ["["]
+    after_digit = grammar.advance(grammar.start, "[1")
+    assert [tokens[i] for i in vocabulary.allowed(after_digit)] == ["1", "2", ", ", ",", "20"]
+    after_box = grammar.advance(grammar.start, "[1, 2, 3, 4]")
+    assert [tokens[i] for i in vocabulary.allowed(after_box)] == [" Male", "Male"]
+    print("✅ Person grammar verification successful")
+
+def test_streaming_record_parser():
+    print("🧪 [Test] Verifying StreamingRecordParser emits records per completed line")
+    parser = StreamingRecordParser(person_line_grammar(GENDERS, AGE_GROUPS))
+    assert parser.feed("[1, 2, 3, 4] Male, 2") == []
+    assert parser.feed("0s\n[5") == [{"ymin": "1", "xmin": "2", "ymax": "3", "xmax": "4", "gender": "Male", "age": "20s"}]
+    records = parser.feed(", 6, 7, 8] Female, 70s+\n")
+    assert records == [{"ymin": "5", "xmin": "6", "ymax": "7", "xmax": "8", "gender": "Female", "age": "70s+"}]
+
+    # A repeated box (even with other attributes) is not emitted again and flags the model as looping
+    assert not parser.repeated
+    assert parser.feed("[1, 2, 3, 4] Female, 10s\n") == [] and parser.repeated
+    print("✅ StreamingRecordParser verification successful")
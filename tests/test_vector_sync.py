@@ -0,0 +1,184 @@
+import os
+import tempfile
+import time
+import numpy as np
+import subprocess
+import sys
+from core.db.vector_manager import VectorManager
+from core.db.vector_store import MemoryVectorStore, SQLiteVectorStore
+
+def test_vector_manager_delta_sync():
+    print("🧪 [Test] Verifying VectorManager watermark/tombstone delta sync")
+    rng = np.random.default_rng(0)
+    store = MemoryVectorStore()
+    db = store.client
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, "sync_state.json")
+        writer = VectorManager(store=store)
+        reader = VectorManager(store=store, state_path=state_path)
+
+        # 1. First sync pulls the whole collection
+        print("[Step 1] Initial full sync")
+        for i in range(50):
+            writer.push_vector(f"User_ID:{i:03d}", rng.normal(size=128).astype(np.float32))
+        assert writer.flush()
+        upserts, deleted, latest = reader.sync_gallery_delta()
+        assert len(upserts) == 50 and deleted == []
+        assert reader.watermark is None # Not advanced until the delta is applied
+        reader.commit_watermark(latest)
+        assert reader.watermark == latest
+
+        # 2. Nothing changed -> empty delta, no documents read
+        print("[Step 2] Idle sync")
+        reads_before = db.reads
+        upserts, deleted, latest = reader.sync_gallery_delta()
+        assert upserts == {} and deleted == [] and latest == reader.watermark
+        assert db.reads == reads_before
+
+        # 3. Only changed documents and tombstones come back
+        print("[Step 3] Incremental sync with one update and one deletion")
+        writer.push_vector("User_ID:007", np.zeros(128, dtype=np.float32))
+        writer.delete_vector("User_ID:010")
+        assert writer.flush()
+        upserts, deleted, latest = reader.sync_gallery_delta()
+        assert list(upserts) == ["User_ID:007"]
+        assert deleted == ["User_ID:010"]
+        assert "User_ID:010" not in reader.sync_gallery_from_cloud()
+
+        # A delta that was not applied (no commit) is fetched again
+        assert reader.sync_gallery_delta()[:2] == (upserts, deleted)
+        reader.commit_watermark(latest)
+
+        # 4. The watermark survives a restart
+        print("[Step 4] Watermark restored from disk")
+        restarted = VectorManager(store=store, state_path=state_path)
+        assert restarted.watermark == reader.watermark
+        assert restarted.sync_gallery_delta() == ({}, [], reader.watermark)
+
+    print("✅ VectorManager delta sync verification successful")
+
+def test_background_sync_retries_failed_delta():
+    print("🧪 [Test] Verifying a delta whose apply failed is delivered again")
+    store = MemoryVectorStore()
+    writer = VectorManager(store=store, write_behind=False)
+    reader = VectorManager(store=store)
+    writer.push_vector("User_ID:001", np.ones(128, dtype=np.float32))
+
+    received = []
+    def apply(upserts, deleted):
+        received.append(sorted(upserts))
+        if len(received) == 1:
+            raise RuntimeError("local store unavailable")
+
+    reader.start_background_sync(apply, interval_seconds=0.01)
+    deadline = time.time() + 5
+    while reader.watermark is None and time.time() < deadline:
+        time.sleep(0.01)
+    reader.stop_background_sync()
+    assert received[:2] == [["User_ID:001"], ["User_ID:001"]]
+    assert reader.watermark is not None
+    print("✅ Background sync retry verification successful")
+
+def test_vector_manager_write_behind():
+    print("🧪 [Test] Verifying VectorManager write-behind coalescing, retry and journal")
+    store = MemoryVectorStore()
+    db = store.client
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_path = os.path.join(tmp, "cloud_journal.json")
+        vm = VectorManager(store=store, batch_size=10, flush_interval=60.0, journal_path=journal_path)
+
+        # 1. Writes are queued and coalesced per FaceID, not sent inline
+        print("[Step 1] Coalescing 3 FaceIDs x 20 writes")
+        for _ in range(20):
+            for i in range(3):
+                vm.push_vector(f"User_ID:{i:03d}", np.full(128, i, dtype=np.float32))
+                vm.update_last_seen(f"User_ID:{i:03d}")
+        assert vm.pending_writes() == 3
+        assert db.commits == 0
+
+        # 2. Offline: the batch is kept and spilled to the journal
+        print("[Step 2] Failed flush while offline")
+        db.fail_writes = True
+        assert not vm.flush()
+        assert vm.pending_writes() == 3
+        assert os.path.exists(journal_path)
+        vm.close()
+
+        # 3. A restarted manager replays the journal once the network is back
+        print("[Step 3] Journal replay after restart")
+        db.fail_writes = False
+        restarted = VectorManager(store=store, batch_size=10, flush_interval=60.0, journal_path=journal_path)
+        assert restarted.pending_writes() == 3
+        assert restarted.flush()
+        assert db.commits == 1
+        assert not os.path.exists(journal_path)
+        docs = restarted.sync_gallery_from_cloud()
+        assert sorted(docs) == ["User_ID:000", "User_ID:001", "User_ID:002"]
+        assert docs["User_ID:002"]["vector"][0] == 2.0
+
+        # 4. Reaching batch_size wakes the background writer
+        print("[Step 4] Size-triggered background flush")
+        for i in range(10):
+            restarted.push_vector(f"User_ID:{100 + i}", np.zeros(128, dtype=np.float32))
+        deadline = time.time() + 5.0
+        while db.commits < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert restarted.pending_writes() == 0
+        assert len(restarted.sync_gallery_from_cloud()) == 13
+        restarted.close()
+
+    print("✅ VectorManager write-behind verification successful")
+
+def test_sqlite_vector_store():
+    print("🧪 [Test] Verifying SQLiteVectorStore delta sync and persistence")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "face_vectors.sqlite")
+        vm = VectorManager(backend="sqlite", store_params={"path": path}, write_behind=False)
+        assert vm.is_ready and vm.store.name == "sqlite"
+
+        # 1. Full sync, then only the changed rows
+        print("[Step 1] Upserts, touch and tombstone")
+        for i in range(5):
+            vm.push_vector(f"User_ID:{i:03d}", np.full(128, i, dtype=np.float32), {"source": "test"})
+        upserts, deleted, latest = vm.sync_gallery_delta()
+        vm.commit_watermark(latest)
+        assert len(upserts) == 5 and deleted == []
+        assert upserts["User_ID:003"]["vector"][0] == 3.0
+        assert upserts["User_ID:003"]["source"] == "test"
+
+        vm.update_last_seen("User_ID:001") # last_seen only: not part of the delta
+        vm.delete_vector("User_ID:002")
+        upserts, deleted, latest = vm.sync_gallery_delta()
+        vm.commit_watermark(latest)
+        assert upserts == {} and deleted == ["User_ID:002"]
+        vm.store.close()
+
+        # 2. Reopened database keeps vectors and the timestamp sequence
+        print("[Step 2] Reopen")
+        reopened = VectorManager(store=SQLiteVectorStore(path), write_behind=False)
+        assert sorted(reopened.sync_gallery_from_cloud()) == ["User_ID:000", "User_ID:001", "User_ID:003", "User_ID:004"]
+        reopened.watermark = vm.watermark
+        reopened.push_vector("User_ID:000", np.zeros(128, dtype=np.float32))
+        upserts, _, _ = reopened.sync_gallery_delta()
+        assert list(upserts) == ["User_ID:000"]
+        reopened.store.close()
+
+    print("✅ SQLiteVectorStore verification successful")
+
+def test_offline_backend_skips_firebase():
+    print("🧪 [Test] Verifying firebase_admin is not imported for local backends")
+    code = ("import os, sys; os.environ['VECTOR_STORE_BACKEND'] = 'memory';"
+            "from core.db.vector_manager import VectorManager; vm = VectorManager();"
+            "assert vm.is_ready and 'firebase_admin' not in sys.modules")
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0
+    print("✅ Lazy backend import verification successful")
+
+if __name__ == "__main__":
+    test_vector_manager_delta_sync()
+    test_background_sync_retries_failed_delta()
+    test_vector_manager_write_behind()
+    test_sqlite_vector_store()
+    test_offline_backend_skips_firebase()